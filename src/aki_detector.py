@@ -1,16 +1,57 @@
+import hashlib
 import joblib
 import pandas as pd
 import numpy as np
 import os
+from .svc_kernel import CompiledSVC
+
+# Model input columns, in the order the pipeline was trained on
+FEATURES = [
+    "sex",
+    "creatinine_mean",
+    "creatinine_min",
+    "creatinine_max",
+    "creatinine_median",
+    "creatinine_std",
+    "creatinine_count",
+]
 
 
 class AKIDetector:
-    def __init__(self):
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(current_dir, "../model/aki_model.pkl")
-        self.model = joblib.load(model_path)
+    def __init__(self, model_path=None):
+        if model_path is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            model_path = os.path.join(current_dir, "../model/aki_model.pkl")
+        self.model_path = model_path
+        self.version = None
+        self.reload()
 
-    def predict(self, lab_entry):
+    def reload(self):
+        """(Re)loads the model file. Returns True if its content changed.
+
+        version is a hash of the file, so anything keyed on it (the
+        prediction cache) can tell results of different models apart.
+        """
+        with open(self.model_path, "rb") as f:
+            version = hashlib.sha256(f.read()).hexdigest()[:16]
+        if version == self.version:
+            return False
+
+        model = joblib.load(self.model_path)
+        # Pure NumPy scoring when the pipeline is StandardScaler -> SVC;
+        # anything else goes through sklearn
+        kernel = CompiledSVC.from_pipeline(model)
+        self.model, self.kernel = model, kernel
+        self.features = list(getattr(model, "feature_names_in_", FEATURES))
+        # Last, so a prediction made during the swap is never filed under
+        # the new version
+        reloaded = self.version is not None
+        self.version = version
+        if reloaded:
+            print(f"Reloaded model {self.model_path} (version {version})")
+        return True
+
+    def feature_vector(self, lab_entry):
         features = {
             "sex": lab_entry["sex"],
             "creatinine_mean": lab_entry["mean"],
@@ -18,10 +59,28 @@ class AKIDetector:
             "creatinine_max": lab_entry["max"],
             "creatinine_median": lab_entry["median"],
             "creatinine_std": lab_entry["std"],
-            "creatinine_count": len(lab_entry["results"]),
+            "creatinine_count": lab_entry["count"],
         }
+        return [features[name] for name in self.features]
+
+    def predict(self, lab_entry):
+        return bool(self.predict_features(self.feature_vector(lab_entry))[0])
+
+    def predict_batch(self, lab_entries):
+        """Scores many lab entries with one vectorised call."""
+        if not lab_entries:
+            return []
+        return self.predict_features([self.feature_vector(e) for e in lab_entries]).tolist()
+
+    def predict_features(self, X):
+        """Scores one feature vector or a 2-D batch; returns a bool array."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
 
-        df = pd.DataFrame([features])
-        prediction = self.model.predict(df)
+        if self.kernel is not None:
+            prediction = self.kernel.predict(X)
+        else:
+            prediction = self.model.predict(pd.DataFrame(X, columns=self.features))
 
-        return bool(prediction)
+        return np.asarray(prediction).astype(bool)
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .hl7_scan import peek_message_type
+from .mllp_client import MMLPClient, backoff_delay, parse_addresses
+from .mllp_framer import MLLPFramer
+from .server_state import set_server_running
+from . import metrics
+
+
+class AsyncMLLPClient(threading.Thread):
+    """asyncio MLLP client that keeps one connection per configured feed.
+
+    MLLP_ADDRESS may list several comma-separated endpoints (e.g. PAS and
+    LIMS). Every endpoint gets its own framer, ACK stream and reconnect
+    loop; all of them feed the same Processor/Pipeline from one thread.
+    """
+
+    ACK = MMLPClient.ACK
+
+    def __init__(self, processor, pipeline=None, addresses=None):
+        super().__init__(daemon=True)
+        if addresses is None:
+            addresses = parse_addresses(os.environ.get("MLLP_ADDRESS", "localhost:8440"))
+        self.addresses = addresses
+        self.processor = processor
+        self.pipeline = pipeline
+        self.recv_size = int(os.environ.get("MLLP_RECV_SIZE", MMLPClient.MLLP_BUFFER_SIZE))
+        self.running = True
+        self.connected = 0
+        # Without a pipeline, messages from all feeds go through one worker
+        # thread so State sees them one at a time, in arrival order
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def run(self):
+        asyncio.run(self._run_feeds())
+
+    async def _run_feeds(self):
+        await asyncio.gather(*(self._feed(host, port) for host, port in self.addresses))
+
+    async def _feed(self, host, port):
+        # Persistent reconnect loop for one endpoint
+        attempt = 0
+        while self.running:
+            writer = None
+            try:
+                print(f"MMLP connecting to {host}:{port}")
+                reader, writer = await asyncio.open_connection(host, port)
+                sock = writer.get_extra_info("socket")
+                if sock is not None:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                attempt = 0
+                self._set_connected(+1)
+                try:
+                    await self._listen(reader, writer)
+                finally:
+                    self._set_connected(-1)
+            except Exception as e:
+                print(f"MMLP {host}:{port} disconnected: {e}")
+                metrics.MLLP_RECONNECTS.inc()
+            finally:
+                if writer is not None:
+                    writer.close()
+
+            # Backoff before reconnect
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    def _set_connected(self, delta):
+        self.connected += delta
+        set_server_running(self.connected > 0)
+
+    async def _listen(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        framer = MLLPFramer(self.recv_size)
+        failed = loop.create_future()
+
+        while self.running:
+            read = asyncio.ensure_future(reader.read(self.recv_size))
+            done, _ = await asyncio.wait({read, failed}, return_when=asyncio.FIRST_COMPLETED)
+            if failed in done:
+                read.cancel()
+                raise failed.result()
+
+            chunk = read.result()
+            if not chunk:
+                # Server closed TCP connection
+                raise ConnectionError("Server closed connection")
+            framer.feed(chunk)
+
+            started = time.perf_counter()
+            applied = []
+            for payload in framer.frames():
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="frame")
+                # Undecoded, so the processor can skip replays before parsing
+                message = bytes(payload)
+                message_type = peek_message_type(message)
+                if self.pipeline is None:
+                    await loop.run_in_executor(self._executor, self.processor.process, message)
+                    applied.append(message_type)
+                else:
+                    on_done = self._ack_callback(loop, writer, failed, message_type)
+                    try:
+                        self.pipeline.submit(message, on_done, block=False)
+                    except queue.Full:
+                        # Backpressure: wait off the event loop, other feeds keep going
+                        await loop.run_in_executor(None, self.pipeline.submit, message, on_done)
+                started = time.perf_counter()
+
+            if applied:
+                # Waited for off the processing thread, so the other feeds'
+                # messages are applied into the same pending commit meanwhile
+                await loop.run_in_executor(None, self.processor.wait_durable)
+                for message_type in applied:
+                    writer.write(self.ACK)
+                    metrics.MESSAGES_ACKED.inc(type=message_type)
+
+            await writer.drain()
+
+    def _ack_callback(self, loop, writer, failed, message_type):
+        # Called on a pipeline thread; the pipeline completes messages in
+        # order so the writes below keep this feed's ACKs in order too
+        def write_ack():
+            if not writer.is_closing():
+                writer.write(self.ACK)
+                metrics.MESSAGES_ACKED.inc(type=message_type)
+
+        def fail(error):
+            if not failed.done():
+                failed.set_result(error)
+
+        def on_done(error):
+            try:
+                if error is None:
+                    loop.call_soon_threadsafe(write_ack)
+                else:
+                    # No ACK: drop the connection so the server resends
+                    loop.call_soon_threadsafe(fail, ConnectionError(f"processing failed: {error}"))
+            except RuntimeError:
+                pass  # loop already closed
+
+        return on_done
@@ -0,0 +1,86 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from . import metrics
+
+# Queued by flush(): ends the batch being collected
+_FLUSH = object()
+
+
+class BatchScheduler:
+    """Collects pending predictions and scores them in vectorised batches.
+
+    submit() captures the patient's feature vector immediately and returns
+    a Future. A worker thread waits for the first pending item, keeps
+    collecting until max_batch items or max_wait_ms have passed, scores the
+    whole batch with one AKIDetector.predict_features call and resolves the
+    futures in submission order. A caller about to wait on its futures
+    calls flush() so the batch is scored without waiting out max_wait_ms.
+    """
+
+    def __init__(self, detector, max_batch=64, max_wait_ms=2.0):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.scored = 0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, lab_entry) -> Future:
+        future = Future()
+        self._queue.put((self.detector.feature_vector(lab_entry), future))
+        return future
+
+    def flush(self):
+        """Scores everything submitted so far without waiting for more."""
+        self._queue.put(_FLUSH)
+
+    def join(self):
+        """Blocks until everything submitted so far is scored."""
+        self._queue.join()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "scored": self.scored,
+            "mean_batch": self.scored / self.batches if self.batches else 0.0,
+            "pending": self._queue.qsize(),
+        }
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _FLUSH:
+                self._queue.task_done()
+                continue
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _FLUSH:
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            try:
+                with metrics.STAGE_SECONDS.time(stage="inference"):
+                    predictions = self.detector.predict_features([features for features, _ in batch])
+                for (_, future), prediction in zip(batch, predictions):
+                    future.set_result(bool(prediction))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batches += 1
+            self.scored += len(batch)
+            for _ in batch:
+                self._queue.task_done()
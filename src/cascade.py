@@ -0,0 +1,72 @@
+from collections import Counter
+
+
+class RuleCascade:
+    """Cheap reference-value check run before the SVC.
+
+    Follows the NHS AKI algorithm's shape: the latest creatinine result is
+    compared with the patient's baseline and only ratios in the uncertain
+    band [low, high) are passed to the model. Below the band the result is
+    treated as no AKI, at or above it as AKI. Patients without a baseline
+    always go to the model.
+
+    The baseline is the lower of the minimum over the previous 48 hours
+    and the median of the results 7 to 365 days earlier, when labs carry
+    State.window_features' "ratio"; otherwise the lower of the previous
+    lifetime minimum and the lifetime median.
+
+    decide() returns True/False for a rule decision or None when the model
+    has to score the result; `counts` records which branch was taken.
+    """
+
+    BRANCHES = ("already_paged", "no_baseline", "rule_negative", "rule_positive", "model")
+
+    def __init__(self, low=1.0, high=1.5):
+        if not 0 < low <= high:
+            raise ValueError(f"Invalid cascade band [{low}, {high})")
+        self.low = low
+        self.high = high
+        self.counts = Counter({branch: 0 for branch in self.BRANCHES})
+
+    @staticmethod
+    def ratio(latest, labs):
+        """latest / baseline, or None without a baseline."""
+        if "ratio" in labs:
+            return labs["ratio"]
+
+        series = labs["results"]
+        if labs["count"] < 2:
+            return None
+
+        # The sorted series includes the latest result; drop one copy of it
+        # from the minimum so the baseline is the previous lowest value
+        previous_min = series[1] if series[0] == latest else series[0]
+        baseline = min(previous_min, labs["median"])
+        if baseline <= 0:
+            return None
+        return latest / baseline
+
+    def decide(self, latest, labs):
+        ratio = self.ratio(latest, labs)
+        if ratio is None:
+            self.counts["no_baseline"] += 1
+            return None
+        if ratio < self.low:
+            self.counts["rule_negative"] += 1
+            return False
+        if ratio >= self.high:
+            self.counts["rule_positive"] += 1
+            return True
+        self.counts["model"] += 1
+        return None
+
+    def skip_paged(self):
+        self.counts["already_paged"] += 1
+
+    def stats(self):
+        total = sum(self.counts.values())
+        scored = self.counts["model"] + self.counts["no_baseline"]
+        return {
+            **self.counts,
+            "model_fraction": scored / total if total else 0.0,
+        }
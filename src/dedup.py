@@ -0,0 +1,93 @@
+import hashlib
+import math
+from . import metrics
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys (no deletes)."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        # Standard sizing: m = -n ln p / (ln 2)^2 bits, k = m/n ln 2 hashes
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class DedupIndex:
+    """Two-tier "seen this message id?" check.
+
+    A Bloom filter answers "definitely new" without I/O; only possible
+    hits are confirmed with lookup(message_id) against the persistent
+    store. The filter is rebuilt (at twice the size) from load_ids() once
+    it holds more ids than it was sized for, and after compaction.
+    """
+
+    MIN_CAPACITY = 100_000
+
+    def __init__(self, load_ids, lookup, error_rate=0.001):
+        self._load_ids = load_ids
+        self._lookup = lookup
+        self.error_rate = error_rate
+        self.lookups = 0
+        self.store_lookups = 0
+        self.false_positives = 0
+        self.rebuild()
+
+    def rebuild(self, capacity=None):
+        ids = list(self._load_ids())
+        if capacity is None:
+            capacity = max(self.MIN_CAPACITY, 2 * len(ids))
+        self.bloom = BloomFilter(capacity, self.error_rate)
+        for message_id in ids:
+            self.bloom.add(message_id)
+
+    def add(self, message_id):
+        self.bloom.add(message_id)
+        if self.bloom.count > self.bloom.capacity:
+            self.rebuild(2 * self.bloom.capacity)
+
+    def __contains__(self, message_id):
+        self.lookups += 1
+        if message_id not in self.bloom:
+            metrics.DEDUP_LOOKUPS.inc(result="new")
+            return False
+
+        self.store_lookups += 1
+        if self._lookup(message_id):
+            metrics.DEDUP_LOOKUPS.inc(result="duplicate")
+            return True
+        self.false_positives += 1
+        metrics.DEDUP_LOOKUPS.inc(result="false_positive")
+        return False
+
+    def stats(self):
+        negatives = self.lookups - (self.store_lookups - self.false_positives)
+        return {
+            "lookups": self.lookups,
+            "store_lookups": self.store_lookups,
+            "false_positives": self.false_positives,
+            # Share of truly new ids the filter failed to rule out
+            "false_positive_rate": self.false_positives / negatives if negatives else 0.0,
+            "bloom_ids": self.bloom.count,
+            "bloom_capacity": self.bloom.capacity,
+            "bloom_bytes": len(self.bloom.bits),
+        }
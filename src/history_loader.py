@@ -0,0 +1,119 @@
+import hashlib
+import glob
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from .history_snapshot import HistorySnapshot
+
+# Rows of the wide CSV parsed per chunk; keeps memory flat for large files
+CHUNK_ROWS = 50_000
+
+
+def find_history_file():
+    """Returns the history CSV path, or None when there is no file."""
+    # /data is mounted by the init container; data/ is the copy baked into the image
+    candidates = [os.environ.get("HISTORY_PATH", "/data/history.csv"), "data/history.csv"]
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def melt_history(chunk: pd.DataFrame):
+    """Turns wide mrn,creatinine_date_N,creatinine_result_N rows into long
+    (mrns, timestamps, values) arrays, in file order, without Python loops."""
+    dates = chunk.columns[1::2]
+    results = chunk.columns[2::2]
+    if chunk.columns[0] != "mrn" or len(dates) != len(results) or not all(
+        d.startswith("creatinine_date") and r.startswith("creatinine_result")
+        for d, r in zip(dates, results)
+    ):
+        raise ValueError("Unexpected history.csv layout")
+
+    mrns = chunk["mrn"].to_numpy(dtype=object)
+    timestamps = chunk[dates].to_numpy(dtype=object)
+    values = chunk[results].to_numpy(dtype=np.float64)
+
+    # Wide rows are padded with empty cells after the last result
+    present = ~np.isnan(values)
+    return (
+        np.broadcast_to(mrns[:, None], values.shape)[present],
+        timestamps[present],
+        values[present],
+    )
+
+
+def read_history(path, chunk_rows=CHUNK_ROWS):
+    """Yields long-form (mrns, timestamps, values) chunks of a history CSV."""
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype={"mrn": str}):
+        yield melt_history(chunk)
+
+
+def load_history(state, path, chunk_rows=CHUNK_ROWS, snapshot_root=None, keep=None):
+    """Makes history.csv available to State through a memory-mapped snapshot.
+
+    The CSV is parsed once per file content into a columnar snapshot next
+    to the database; later starts only map it. The first import of a file
+    also rebuilds the per-patient aggregates from the live results and
+    the new snapshot (which replaces any earlier one), for every patient
+    or only those keep(mrn) selects; so does the first start after the
+    snapshot format changes. Returns the number of historical results
+    seeded (0 if the same file was already imported).
+    """
+    started = time.perf_counter()
+    digest = file_hash(path)
+
+    if snapshot_root is None:
+        snapshot_root = os.path.dirname(os.path.abspath(state.db_path))
+    snapshot_dir = os.path.join(snapshot_root, f"history-v{HistorySnapshot.FORMAT}-{digest[:16]}")
+
+    storage = state.imported_storage(digest)
+    if storage == "rows":
+        # Imported by an older version as raw lab_results rows; mapping the
+        # snapshot as well would count every historical result twice
+        print(f"History {path} already imported into the database")
+        return 0
+
+    if os.path.isdir(snapshot_dir):
+        snapshot = HistorySnapshot.open(snapshot_dir)
+    else:
+        snapshot = HistorySnapshot.build(read_history(path, chunk_rows), snapshot_dir)
+        _remove_stale_snapshots(snapshot_root, snapshot_dir)
+
+    seeded = 0
+    # Also when the file was imported into an older snapshot format: its
+    # aggregates may be keyed differently (format 1 dropped leading zeros)
+    if storage != HistorySnapshot.STORAGE:
+        # Aggregates and the import record land together or not at all.
+        # A previous file's snapshot is deleted below, so its share of the
+        # aggregates has to go too
+        aggregates = snapshot.aggregates()
+        if keep is not None:
+            aggregates = [row for row in aggregates if keep(row[0])]
+        with state.transaction():
+            state.replace_history_aggregates(aggregates)
+            state.record_import(digest, path, len(snapshot), storage=HistorySnapshot.STORAGE)
+        state.wait_durable()
+        seeded = sum(row[1] for row in aggregates)
+
+    state.attach_history(snapshot)
+
+    elapsed = time.perf_counter() - started
+    print(f"History {path}: {len(snapshot)} results mapped, {seeded} seeded in {elapsed:.2f}s")
+    return seeded
+
+
+def _remove_stale_snapshots(snapshot_root, keep):
+    for old in glob.glob(os.path.join(snapshot_root, "history-*")):
+        if os.path.abspath(old) != os.path.abspath(keep):
+            shutil.rmtree(old, ignore_errors=True)
@@ -0,0 +1,109 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+
+class HistorySnapshot:
+    """Columnar, memory-mapped copy of the historical creatinine results.
+
+    Results are grouped by patient: the results of mrns[i] are
+    values[offsets[i]:offsets[i + 1]] (same for timestamps), in file order.
+    mrns is sorted, so a patient is found by binary search. MRNs are kept
+    as the CSV's strings, so "007" and "7" stay different patients (see
+    patient_store.mrn_key).
+    """
+
+    FILES = ("mrns", "offsets", "values", "timestamps")
+    # Part of the snapshot directory name and of the history_imports
+    # storage; bumped when the layout changes
+    FORMAT = 2
+    STORAGE = f"snapshot-v{FORMAT}"
+
+    def __init__(self, mrns, offsets, values, timestamps):
+        self.mrns = mrns              # str, sorted, unique
+        self.offsets = offsets        # int64, len(mrns) + 1
+        self.values = values          # float32
+        self.timestamps = timestamps  # int64 epoch seconds
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def open(cls, snapshot_dir):
+        # mmap: only the pages of patients we actually look up are read in
+        arrays = [np.load(os.path.join(snapshot_dir, f"{name}.npy"), mmap_mode="r") for name in cls.FILES]
+        return cls(*arrays)
+
+    @classmethod
+    def build(cls, chunks, snapshot_dir):
+        """Writes a snapshot from (mrns, timestamps, values) long-form chunks.
+
+        The directory is written under a temporary name and renamed into
+        place, so a crash never leaves a half-written snapshot behind.
+        """
+        mrn_parts, ts_parts, value_parts = [], [], []
+        for mrns, timestamps, values in chunks:
+            mrn_parts.append(np.asarray(mrns).astype(str))
+            ts_parts.append(_to_epoch_seconds(timestamps))
+            value_parts.append(np.asarray(values, dtype=np.float32))
+
+        mrns = np.concatenate(mrn_parts) if mrn_parts else np.empty(0, str)
+        timestamps = np.concatenate(ts_parts) if ts_parts else np.empty(0, np.int64)
+        values = np.concatenate(value_parts) if value_parts else np.empty(0, np.float32)
+
+        # Stable sort keeps each patient's results in file order
+        order = np.argsort(mrns, kind="stable")
+        mrns, timestamps, values = mrns[order], timestamps[order], values[order]
+        unique_mrns, starts = np.unique(mrns, return_index=True)
+        offsets = np.append(starts, len(mrns)).astype(np.int64)
+
+        tmp_dir = f"{snapshot_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, array in zip(cls.FILES, (unique_mrns, offsets, values, timestamps)):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        os.replace(tmp_dir, snapshot_dir)
+
+        return cls.open(snapshot_dir)
+
+    def lookup(self, mrn):
+        """Returns (values, timestamps) for a patient, or None.
+
+        Values are widened to float64, timestamps are a view of the mmap.
+        """
+        key = str(mrn)
+        i = np.searchsorted(self.mrns, key)
+        if i == len(self.mrns) or self.mrns[i] != key:
+            return None
+
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return _widen(self.values[start:end]), self.timestamps[start:end]
+
+    def aggregates(self):
+        """Per-patient (mrn, count, total, total_sq, min, max) rows."""
+        if len(self.mrns) == 0:
+            return []
+        values = _widen(self.values)
+        starts = np.asarray(self.offsets[:-1])
+        return list(zip(
+            self.mrns.tolist(),
+            np.diff(self.offsets).tolist(),
+            np.add.reduceat(values, starts).tolist(),
+            np.add.reduceat(values * values, starts).tolist(),
+            np.minimum.reduceat(values, starts).tolist(),
+            np.maximum.reduceat(values, starts).tolist(),
+        ))
+
+
+def _widen(values):
+    # Round-trip through the shortest float32 repr so a stored 126.48 comes
+    # back as 126.48 and not 126.4800033569336
+    return np.asarray(values).astype(str).astype(np.float64)
+
+
+def _to_epoch_seconds(timestamps):
+    parsed = pd.to_datetime(pd.Series(timestamps, dtype=object), errors="coerce")
+    seconds = (parsed - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    # Missing dates become 0 rather than NaT
+    return seconds.fillna(0).to_numpy(dtype=np.int64)
@@ -0,0 +1,135 @@
+import hashlib
+from datetime import datetime
+
+
+def _msh_fields(data):
+    # MSH split on '|' (MSH-1 is the separator itself, so MSH-N is item
+    # N-1), or None when the frame doesn't start with an MSH segment
+    head = data.lstrip()
+    if not head.startswith(b"MSH|"):
+        return None
+    end = head.find(b"\r")
+    segment = head if end == -1 else head[:end]
+    return segment.split(b"|", 10)
+
+
+def peek_message_id(raw):
+    """Message id straight from the raw frame, without parsing it.
+
+    Returns MSH-10, or the md5 of the whole message when MSH-10 is empty
+    (the same id Processor._parse_message derives), or None when the frame
+    doesn't start with a '|'-delimited MSH segment.
+    """
+    data = raw.encode() if isinstance(raw, str) else bytes(raw)
+
+    fields = _msh_fields(data)
+    if fields is None:
+        return None
+    if len(fields) > 9 and fields[9]:
+        return fields[9].decode("ascii")
+    return hashlib.md5(data).hexdigest()
+
+
+def peek_message_type(raw):
+    """MSH-9 of the raw frame ("unknown" if it has none)."""
+    data = raw.encode() if isinstance(raw, str) else bytes(raw)
+
+    fields = _msh_fields(data)
+    if fields is None or len(fields) <= 8 or not fields[8]:
+        return "unknown"
+    return fields[8].decode("ascii", "replace")
+
+
+def peek_mrn(raw):
+    """PID-3 of the raw frame, or None when it has no PID segment."""
+    data = raw.encode() if isinstance(raw, str) else bytes(raw)
+
+    start = data.find(b"\rPID|")
+    if start == -1:
+        return None
+    end = data.find(b"\r", start + 1)
+    fields = data[start + 1:end if end != -1 else len(data)].split(b"|", 4)
+    if len(fields) <= 3 or not fields[3]:
+        return None
+    return fields[3].decode("ascii", "replace")
+
+
+def _segment_fields(segments, name):
+    # First segment with this name, split into fields (None if absent)
+    prefix = name + b"|"
+    for segment in segments:
+        if segment.startswith(prefix):
+            return segment.split(b"|")
+    return None
+
+
+def extract_fields(raw, msg_id=None):
+    """Fast path for Processor._parse_message on ADT^A01, ADT^A03 and ORU^R01.
+
+    Splits only the MSH/PID/OBR/OBX segments of the raw frame and decodes
+    only the fields the processor reads. Returns the same dict as
+    _parse_message, or None whenever the message is anything other than
+    the plain layout handled here (other types, escapes, missing fields,
+    bad values) so the caller can fall back to the full hl7.parse path.
+    """
+    data = raw.encode() if isinstance(raw, str) else bytes(raw)
+
+    body = data.strip()
+    # hl7.parse only splits segments on <CR>; leave odd framing and escape
+    # sequences (the backslash in MSH-2 aside) to the full parser
+    if not body.startswith(b"MSH|^~\\&|") or b"\n" in body or b"\\" in body[9:]:
+        return None
+
+    segments = body.split(b"\r")
+    msh = segments[0].split(b"|")
+    pid = _segment_fields(segments, b"PID")
+    if len(msh) <= 9 or pid is None or len(pid) <= 3:
+        return None
+
+    if msg_id is None:
+        msg_id = msh[9].decode("ascii") if len(msh) > 9 and msh[9] else hashlib.md5(data).hexdigest()
+
+    message_type = msh[8]
+    result = {
+        "msg_id": msg_id,
+        "type": message_type.decode("ascii"),
+        "mrn": pid[3].decode("ascii"),
+    }
+
+    try:
+        # Admission event
+        if message_type == b"ADT^A01":
+            if len(pid) > 7 and pid[7]:
+                result["dob"] = datetime.strptime(pid[7].decode("ascii"), "%Y%m%d")
+            if len(pid) > 8:
+                result["sex"] = pid[8].decode("ascii")
+            return result
+
+        # Discharge event
+        if message_type == b"ADT^A03":
+            return result
+
+        # Lab result message
+        if message_type == b"ORU^R01":
+            obx = _segment_fields(segments, b"OBX")
+            obr = _segment_fields(segments, b"OBR")
+            if obx is None or obr is None or len(obx) <= 3:
+                return None
+
+            if obx[3] == b"CREATININE":
+                if len(obx) <= 5 or len(obr) <= 7:
+                    return None
+                result.update({
+                    "is_creatinine": True,
+                    # First repetition, as hl7's obx[5][0]
+                    "result": float(obx[5].split(b"~", 1)[0]),
+                    "time": obr[7].decode("ascii"),
+                })
+            else:
+                result["type"] = "NON_CREAT"
+            return result
+
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    return None
@@ -1,10 +1,90 @@
 import os
+import queue
+import threading
+import time
+from collections import deque
 import requests
+from requests.adapters import HTTPAdapter
+from .mllp_client import backoff_delay
+from . import metrics
+
+
+class PagerUnavailable(Exception):
+    """A page could not be delivered after all retries."""
+
+
+class CircuitBreaker:
+    """Stops the workers hammering a pager that keeps failing.
+
+    After `threshold` consecutive failures the breaker opens and wait()
+    holds every caller for `cooldown` seconds. Then a single trial request
+    is let through (half-open): success closes the breaker, failure opens
+    it again. Pages are delayed while it is open, never dropped.
+    """
+
+    def __init__(self, threshold=5, cooldown=10.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() >= self.opened_at + self.cooldown:
+                return "half-open"
+            return "open"
+
+    def wait(self):
+        """Blocks until a request may be attempted."""
+        while True:
+            with self._lock:
+                if self.opened_at is None:
+                    return
+                remaining = self.opened_at + self.cooldown - time.monotonic()
+                if remaining <= 0 and not self._probing:
+                    self._probing = True
+                    return
+            time.sleep(min(max(remaining, 0.05), 1.0))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    print(f"Pager circuit open after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self._probing = False
 
 
 class HttpHandler:
-    def __init__(self):
-        addr = os.environ.get("PAGER_ADDRESS", "http://localhost:8441/page")
+    """Pager client. send() only queues the page; worker threads deliver it.
+
+    The workers start on the first send(), so a handler only used through
+    deliver() (behind PagerOutbox) has no idle threads.
+
+    Each worker POSTs through its own keep-alive requests.Session, with a
+    bounded timeout and exponential-backoff retries on connection errors
+    and 5xx answers. A worker whose page still fails keeps retrying it
+    (behind the circuit breaker) rather than dropping it. 4xx answers mean
+    the page itself is bad and are not retried.
+    """
+
+    LATENCY_WINDOW = 1024
+
+    def __init__(self, url=None, workers=None, timeout=None, retries=None,
+                 backoff=0.2, backoff_cap=5.0, breaker=None, queue_size=1024):
+        addr = url or os.environ.get("PAGER_ADDRESS", "http://localhost:8441/page")
 
         if not addr.startswith("http"):
             addr = f"http://{addr}"
@@ -12,7 +92,124 @@ class HttpHandler:
             addr = f"{addr}/page"
 
         self.url = addr
+        self.timeout = timeout if timeout is not None else float(os.environ.get("PAGER_TIMEOUT", "2"))
+        self.retries = retries if retries is not None else int(os.environ.get("PAGER_RETRIES", "3"))
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+
+        # A full queue blocks send(); that only happens if the pager has
+        # been down long enough for queue_size pages to pile up
+        self.queue = queue.Queue(queue_size)
+        self.sent = 0
+        self.rejected = 0
+        self.failed = 0
+        self.retried = 0
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self._local = threading.local()
+
+        self.workers = workers or int(os.environ.get("PAGER_WORKERS", "2"))
+        self._workers_started = False
+        self._start_lock = threading.Lock()
 
     def send(self, payload: str):
-        requests.post(self.url, data=payload)
-        print("EVENT SENT:", payload)
+        if not self._workers_started:
+            self._start_workers()
+        self.queue.put(payload)
+
+    def _start_workers(self):
+        with self._start_lock:
+            if self._workers_started:
+                return
+            for _ in range(self.workers):
+                threading.Thread(target=self._worker, name="pager-worker", daemon=True).start()
+            self._workers_started = True
+
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def join(self):
+        """Blocks until every queued page is delivered (or rejected)."""
+        self.queue.join()
+
+    def deliver(self, payload: str) -> bool:
+        """POSTs one page on the calling thread, retrying transient errors.
+
+        Returns True once delivered, False if the pager rejected it (4xx);
+        raises PagerUnavailable when the retries run out.
+        """
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                time.sleep(backoff_delay(attempt - 1, self.backoff, self.backoff_cap))
+            self.breaker.wait()
+
+            started = time.perf_counter()
+            try:
+                response = self._session().post(self.url, data=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = e
+                metrics.PAGER_ERRORS.inc(kind="timeout" if isinstance(e, requests.Timeout) else "connection")
+            else:
+                if response.status_code < 500:
+                    # The pager answered, so it is up even if it refused this one
+                    self.breaker.record_success()
+                    if response.ok:
+                        elapsed = time.perf_counter() - started
+                        self._latencies.append(elapsed)
+                        metrics.STAGE_SECONDS.observe(elapsed, stage="page")
+                        metrics.PAGES_SENT.inc()
+                        self.sent += 1
+                        print("EVENT SENT:", payload)
+                        return True
+                    self.rejected += 1
+                    metrics.PAGER_ERRORS.inc(kind="rejected")
+                    print(f"Pager rejected {payload}: HTTP {response.status_code}")
+                    return False
+                error = f"HTTP {response.status_code}"
+                metrics.PAGER_ERRORS.inc(kind="server_error")
+
+            self.breaker.record_failure()
+            print(f"Page attempt {attempt + 1} failed for {payload}: {error}")
+
+        raise PagerUnavailable(f"{payload}: {error}")
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        return {
+            "sent": self.sent,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "retried": self.retried,
+            "queue_depth": self.queue.qsize(),
+            "breaker": self.breaker.state,
+            "latency_p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+            "latency_p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+        }
+
+    def _session(self):
+        # requests.Session isn't thread-safe; one pooled session per worker
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._local.session = session
+        return session
+
+    def _worker(self):
+        while True:
+            payload = self.queue.get()
+            try:
+                while True:
+                    try:
+                        self.deliver(payload)
+                        break
+                    except PagerUnavailable as e:
+                        self.failed += 1
+                        print(f"Page failed, will retry: {e}")
+            except Exception as e:
+                print(f"Page failed for {payload}: {e}")
+            finally:
+                self.queue.task_done()
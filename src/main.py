@@ -1,35 +1,265 @@
 from .processor import Processor
 from .http_handler import HttpHandler
+from .outbox import PagerOutbox
 from .state import State
 from .mllp_client import MMLPClient
+from .async_mllp_client import AsyncMLLPClient
+from .pipeline import Pipeline
+from .prefetch import Prefetcher
 from .aki_detector import AKIDetector
+from .prediction_cache import CachedDetector, PredictionCache
+from .batch_scheduler import BatchScheduler
+from .cascade import RuleCascade
+from .history_loader import find_history_file, load_history
+from .metrics import QUEUE_DEPTH, start_metrics_server
+from .replay import FilePager, Replayer
+from .server_state import is_server_running
+from .shards import ShardRouter, check_layout, serve, shard_db_path, shard_of
+import argparse
+import os
+import signal
 import time
 
 
 class InferenceService:
+    # /readyz fails once any internal queue backs up this far
+    READY_QUEUE_LIMIT = 1000
+
     def __init__(self):
-        self.state = State()
+        self.router = None
+        shards = int(os.environ.get("SHARDS", "1"))
+        if shards > 1:
+            # Parsing, state and inference move to one process per slice
+            # of MRNs (see ShardService); this process only does MLLP
+            state_dir = os.environ.get("STATE_DIR", "")
+            check_layout(state_dir, shards)
+            self.state = self.pager = self.prefetcher = self.cascade = None
+            self.processor = None
+            self.router = ShardRouter(shards, run_shard)
+            self.pipeline = self.router
+        else:
+            self.state = State()
+            self.setup_processing(find_history_file())
+            # Staged ingestion (paging already happens off the ingest thread)
+            use_pipeline = os.environ.get("INGEST_PIPELINE", "0") == "1"
+            self.pipeline = Pipeline(self.processor) if use_pipeline else None
+
+        # "asyncio" serves every comma-separated MLLP_ADDRESS from one thread
+        if os.environ.get("MLLP_CLIENT", "thread") == "asyncio":
+            self.mmlp_client = AsyncMLLPClient(self.processor, pipeline=self.pipeline)
+        else:
+            self.mmlp_client = MMLPClient(self.processor, pipeline=self.pipeline)
+
+    def setup_processing(self, history_path, history_keep=None, snapshot_root=None):
+        """Builds everything behind self.state: detector, pager, processor."""
+        # Seed lab history from history.csv (no-op once the file is imported)
+        if history_path:
+            load_history(self.state, history_path, snapshot_root=snapshot_root, keep=history_keep)
+
         self.aki_detector = AKIDetector()
+        self.prediction_cache, self.detector = cached_detector(self.aki_detector)
 
         self.http_handler = HttpHandler()
+
+        # Pages go through the durable outbox unless PAGER_OUTBOX=0
+        if os.environ.get("PAGER_OUTBOX", "1") == "1":
+            self.pager = PagerOutbox(self.state, self.http_handler)
+        else:
+            self.pager = self.http_handler
+
+        # No BatchScheduler here: each live message is its own unit of work
+        # and its pages are decided before it commits, so batches would
+        # never hold more than one prediction (replay batches them)
+        processor_options = {}
+
+        # Rule-based pre-filter; off unless CASCADE_LOW is set
+        self.cascade = None
+        if os.environ.get("CASCADE_LOW"):
+            self.cascade = RuleCascade(
+                low=float(os.environ["CASCADE_LOW"]),
+                high=float(os.environ.get("CASCADE_HIGH", "1.5")),
+            )
+            processor_options["cascade"] = self.cascade
+
+        # Admissions warm the patient store ahead of the first lab result
+        self.prefetcher = None
+        if os.environ.get("PREFETCH", "1") == "1":
+            self.prefetcher = Prefetcher(self.state, timeline=self.cascade is not None)
+            processor_options["prefetcher"] = self.prefetcher
+
         self.processor = Processor(
             self.state,
-            self.aki_detector,
-            self.http_handler,
+            self.detector,
+            self.pager,
+            **processor_options,
         )
 
-        self.mmlp_client = MMLPClient(self.processor)
+    def queue_depths(self):
+        if self.router is not None:
+            return self.router.depths()
+        depths = {"pager": self.pager.depth()}
+        if self.pipeline is not None:
+            depths.update(self.pipeline.depths())
+        if self.prefetcher is not None:
+            depths["prefetch"] = self.prefetcher.depth()
+        return depths
+
+    def readiness(self):
+        """(ready, detail) for /readyz: connected to MLLP, no queue backed up."""
+        connected = is_server_running()
+        depths = self.queue_depths()
+        ready = connected and all(depth < self.READY_QUEUE_LIMIT for depth in depths.values())
+        return ready, {"mllp_connected": connected, "queues": depths}
+
+    def start_metrics(self):
+        # Prometheus metrics and health checks; METRICS_PORT=0 disables
+        port = int(os.environ.get("METRICS_PORT", "8000"))
+        if not port:
+            return None
+        for name in self.queue_depths():
+            QUEUE_DEPTH.set_function(lambda name=name: self.queue_depths()[name], queue=name)
+        return start_metrics_server(port, self.readiness)
+
+    def reload_model(self):
+        """SIGHUP: reloads the model file (in every shard when sharded)."""
+        if self.router is not None:
+            for process in self.router.processes:
+                os.kill(process.pid, signal.SIGHUP)
+            return
+        try:
+            if not self.detector.reload():
+                print("Model file unchanged")
+        except Exception as e:
+            print(f"Model reload failed, keeping the current model: {e}")
 
     def start_inference_service(self):
+        signal.signal(signal.SIGHUP, lambda signum, frame: self.reload_model())
+        self.metrics_server = self.start_metrics()
         self.mmlp_client.start()   # starts background socket thread
 
         try:
+            ticks = 0
             while True:
                 time.sleep(1)
+                ticks += 1
+                if ticks % 60 == 0:
+                    if self.router is not None:
+                        print(f"Shards: {self.router.stats()} queue depths: {self.router.depths()}")
+                        continue
+                    print(f"Queue depths: {self.queue_depths()}")
+                if ticks % 3600 == 0:
+                    self.maintenance()
         except KeyboardInterrupt:
             print("Service shutting down...")
 
+    def maintenance(self):
+        # Hourly: dedup compaction and the slower-moving stats
+        self.state.compact_processed()
+        print(f"Pager: {self.pager.stats()}")
+        print(f"Dedup: {self.state.dedup_stats()}")
+        print(f"Patient store: {self.state.patient_store_stats()}")
+        if self.prefetcher is not None:
+            print(f"Prefetch: {self.prefetcher.stats()}")
+        if self.cascade is not None:
+            print(f"Cascade: {self.cascade.stats()}")
+        if self.prediction_cache is not None:
+            print(f"Prediction cache: {self.prediction_cache.stats()}")
+
+
+class ShardService(InferenceService):
+    """One SHARDS worker process: the processing half of InferenceService
+    for the MRNs shard_of() maps to `index`, fed by ShardRouter.
+
+    Each shard has its own database under STATE_DIR/shard-N, pager outbox
+    and model. The history snapshot is shared (and memory-mapped) from
+    STATE_DIR; only this shard's patients are seeded from it.
+    """
+
+    def __init__(self, index, shards):
+        self.router = None
+        self.pipeline = None
+        state_dir = os.environ.get("STATE_DIR", "")
+        db_path = shard_db_path(state_dir, index)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.state = State(db_path=db_path)
+        self.setup_processing(
+            find_history_file(),
+            history_keep=lambda mrn: shard_of(mrn, shards) == index,
+            snapshot_root=os.path.abspath(state_dir or "."),
+        )
+
+
+def run_shard(index, shards, inbox, results):
+    """ShardRouter worker entry point (runs in the child process)."""
+    service = ShardService(index, shards)
+    signal.signal(signal.SIGHUP, lambda signum, frame: service.reload_model())
+    serve(service.processor, inbox, results, index, maintenance=service.maintenance)
+
+
+def cached_detector(detector):
+    """(cache, detector to score with): AKIDetector behind a prediction
+    cache when PREDICTION_CACHE_SIZE > 0. Off by default: every new result
+    changes the patient's count and mean, so only repeated feature states
+    (not replays or re-sends, which dedup already stops) can hit."""
+    size = int(os.environ.get("PREDICTION_CACHE_SIZE", "0"))
+    if size <= 0:
+        return None, detector
+    cache = PredictionCache(size, ttl=float(os.environ.get("PREDICTION_CACHE_TTL", "0")))
+    return cache, CachedDetector(detector, cache)
+
+
+def run_replay(path, dry_run_pages=None, batch_size=500):
+    """Offline backfill: applies an MLLP file straight to the state, no ACKs.
+
+    Messages are committed batch_size at a time; each batch's predictions
+    are scored in inference batches and its pages written before it
+    commits. Already processed messages are skipped, so a replay can be
+    re-run or resumed. Pages go to the pager (via the outbox) unless
+    dry_run_pages names a file to write them to instead.
+    """
+    state = State()
+    history_path = find_history_file()
+    if history_path:
+        load_history(state, history_path)
+
+    cache, detector = cached_detector(AKIDetector())
+    if dry_run_pages:
+        pager = FilePager(dry_run_pages)
+    else:
+        pager = PagerOutbox(state, HttpHandler())
+
+    scheduler = BatchScheduler(
+        detector,
+        max_batch=int(os.environ.get("INFERENCE_BATCH_SIZE", "256")),
+        max_wait_ms=float(os.environ.get("INFERENCE_BATCH_WAIT_MS", "2")),
+    )
+    processor = Processor(state, detector, pager, scheduler=scheduler)
+
+    summary = Replayer(processor, batch_size=batch_size).run(path)
+    pager.join()
+    summary["pages"] = pager.stats()
+    if cache is not None:
+        summary["prediction_cache"] = cache.stats()
+    print(f"Replay finished: {summary}")
+    pager.close()
+    state.close()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AKI inference service")
+    parser.add_argument("--replay", metavar="PATH", help="Apply an MLLP message file offline and exit")
+    parser.add_argument("--dry-run-pages", metavar="PATH", help="With --replay: write pages here instead of paging")
+    parser.add_argument("--batch-size", type=int, default=500, help="With --replay: messages per commit")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        run_replay(args.replay, args.dry_run_pages, args.batch_size)
+        return
 
-if __name__ == "__main__":
     service = InferenceService()
     service.start_inference_service()
+
+
+if __name__ == "__main__":
+    main()
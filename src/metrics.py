@@ -0,0 +1,328 @@
+import bisect
+import http.server
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        # Latest values forwarded from other processes, by source
+        self._remote = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._merged().items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+    def snapshot(self):
+        """A copy of this process's values, for merge() in another one."""
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, source, values):
+        """Replaces what `source` last forwarded; render() adds it in."""
+        with self._lock:
+            self._remote[source] = values
+
+    def retire(self, source):
+        """Folds `source`'s last values into this process's own, so totals
+        don't drop when a restarted source starts again from zero."""
+        with self._lock:
+            values = self._remote.pop(source, None)
+            if values:
+                self._values = self._add(self._values, values)
+
+    def _merged(self):
+        # Caller holds the lock
+        merged = self._values
+        for values in self._remote.values():
+            merged = self._add(merged, values)
+        return merged
+
+    @staticmethod
+    def _add(left, right):
+        total = dict(left)
+        for key, value in right.items():
+            total[key] = total.get(key, 0) + value
+        return total
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Set directly, or computed from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, fn, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def value(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            fn = self._functions.get(key)
+            if fn is None:
+                return self._values.get(key, 0)
+        return fn()
+
+    def retire(self, source):
+        # A gauge is a current value: a restarted source reports its own
+        with self._lock:
+            self._remote.pop(source, None)
+
+    def _samples(self):
+        # Set values are summed with other processes'; callbacks are local
+        with self._lock:
+            values = dict(self._merged())
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = fn()
+            except Exception as e:
+                print(f"Gauge {self.name} callback failed: {e}")
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][index] += 1
+            counts[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            counts = self._values.get(self._key(labels))
+            return sum(counts[0]) if counts else 0
+
+    def snapshot(self):
+        with self._lock:
+            return {key: [list(c[0]), c[1]] for key, c in self._values.items()}
+
+    @staticmethod
+    def _add(left, right):
+        total = dict(left)
+        for key, (counts, value_sum) in right.items():
+            mine = total.get(key)
+            if mine is None:
+                total[key] = [list(counts), value_sum]
+            else:
+                total[key] = [[a + b for a, b in zip(mine[0], counts)], mine[1] + value_sum]
+        return total
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(c[0]), c[1])) for key, c in self._merged().items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def snapshot(self):
+        """{name: values} of every metric (gauges: set values only, not
+        callbacks), picklable, for merge() in the process that serves
+        /metrics."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def merge(self, source, snapshot):
+        """Adds another process's snapshot() to what render() reports,
+        replacing the previous one from the same source."""
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, values in snapshot.items():
+            if name in metrics:
+                metrics[name].merge(source, values)
+
+    def retire(self, source):
+        """Keeps a stopped source's last snapshot in the totals."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.retire(source)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# Ingestion
+MESSAGES_RECEIVED = Counter("aki_messages_received_total", "HL7 messages parsed, by message type", ["type"])
+MESSAGES_DEDUPED = Counter("aki_messages_deduped_total", "Messages skipped as already processed", ["type"])
+MESSAGES_ACKED = Counter("aki_messages_acked_total", "MLLP ACKs sent, by message type", ["type"])
+MLLP_RECONNECTS = Counter("aki_mllp_reconnects_total", "MLLP connection attempts after the first")
+# Dedup index: false-positive rate = false_positive / (new + false_positive)
+DEDUP_LOOKUPS = Counter(
+    "aki_dedup_lookups_total", "Processed-id lookups: new (Bloom miss), duplicate, false_positive", ["result"]
+)
+DEDUP_TABLE_ROWS = Gauge("aki_dedup_table_rows", "processed_messages rows (refreshed hourly)")
+
+# Latency per stage: frame, parse, db, inference, page
+STAGE_SECONDS = Histogram("aki_stage_seconds", "Time spent per message in each stage", ["stage"])
+DB_COMMIT_SECONDS = Histogram("aki_db_commit_seconds", "SQLite commit latency")
+# Creatinine results for admitted patients: the first one after admission
+# vs. later ones, and whether the first found the patient prefetched
+LAB_SECONDS = Histogram("aki_lab_seconds", "Time to handle a creatinine result", ["lab"])
+FIRST_LAB_CACHE = Counter("aki_first_lab_cache_total", "First results after admission, by store warmth", ["result"])
+
+# Inference
+PREDICTION_CACHE = Counter(
+    "aki_prediction_cache_total", "Prediction cache lookups (hit, miss) and removals (eviction, expired)", ["event"]
+)
+
+# Paging
+PAGES_SENT = Counter("aki_pages_sent_total", "Pages accepted by the pager")
+PAGER_ERRORS = Counter("aki_pager_errors_total", "Failed page attempts, by kind", ["kind"])
+QUEUE_DEPTH = Gauge("aki_queue_depth", "Items waiting in each internal queue", ["queue"])
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            self._reply(200, REGISTRY.render(), "text/plain; version=0.0.4")
+        elif path == "/healthz":
+            self._reply(200, "ok\n", "text/plain")
+        elif path == "/readyz":
+            try:
+                ready, detail = self.server.ready_check()
+            except Exception as e:
+                ready, detail = False, {"error": str(e)}
+            self._reply(200 if ready else 503, json.dumps(detail) + "\n", "application/json")
+        else:
+            self._reply(404, "not found\n", "text/plain")
+
+    def _reply(self, status, body, content_type):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port, ready_check=None, host="0.0.0.0"):
+    """Serves /metrics, /healthz and /readyz from a daemon thread.
+
+    ready_check() returns (ready, detail dict); without one the service is
+    always ready. Returns the server (server_address has the bound port).
+    """
+    server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.ready_check = ready_check or (lambda: (True, {}))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics on {host}:{server.server_address[1]}")
+    return server
@@ -1,8 +1,35 @@
 import socket
 import time
 import os
+import random
 import threading
+from .hl7_scan import peek_message_type
+from .mllp_framer import MLLPFramer
 from .server_state import set_server_running
+from . import metrics
+
+
+DEFAULT_MLLP_PORT = 8440
+
+
+def parse_addresses(value):
+    """Comma-separated host[:port] list -> [(host, port), ...]."""
+    addresses = []
+    for addr in value.split(","):
+        addr = addr.strip()
+        if not addr:
+            continue
+        if ":" in addr:
+            host, port = addr.rsplit(":", 1)
+            addresses.append((host, int(port)))
+        else:
+            addresses.append((addr, DEFAULT_MLLP_PORT))
+    return addresses
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Exponential backoff with full jitter for reconnect attempt N (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
 
 
 class MMLPClient(threading.Thread):
@@ -10,23 +37,28 @@ class MMLPClient(threading.Thread):
     MLLP_START_OF_BLOCK = b"\x0b"
     MLLP_END_OF_BLOCK = b"\x1c"
     MLLP_CARRIAGE_RETURN = b"\x0d"
-    MLLP_BUFFER_SIZE = 1024
+    MLLP_BUFFER_SIZE = 65536
 
-    def __init__(self, processor):
-        super().__init__(daemon=True)
-        # Expected format: host:port (defaults to localhost:8440)
-        addr = os.environ.get("MLLP_ADDRESS", "localhost:8440")
+    ACK = (
+        MLLP_START_OF_BLOCK
+        + "MSH|^~\\&|||||||ACK|||2.5\rMSA|AA\r".encode()
+        + MLLP_END_OF_BLOCK
+        + MLLP_CARRIAGE_RETURN
+    )
 
-        if ":" in addr:
-            self.host, port = addr.split(":")
-            self.port = int(port)
-        else:
-            self.host = addr
-            self.port = 8440
+    def __init__(self, processor, pipeline=None):
+        super().__init__(daemon=True)
+        # Expected format: host:port (defaults to localhost:8440); this
+        # client serves the first address, see AsyncMLLPClient for several
+        addresses = parse_addresses(os.environ.get("MLLP_ADDRESS", "localhost:8440"))
+        self.host, self.port = addresses[0]
 
         self.processor = processor
+        # Optional Pipeline: frames are queued and ACKed once recorded
+        self.pipeline = pipeline
         # Accumulates partial TCP frames until full MLLP message received
-        self.buffer = b""
+        recv_size = int(os.environ.get("MLLP_RECV_SIZE", self.MLLP_BUFFER_SIZE))
+        self.framer = MLLPFramer(recv_size)
         self.running = True
 
     def run(self):
@@ -34,11 +66,15 @@ class MMLPClient(threading.Thread):
         self._connection_manager()
 
     def _connection_manager(self):
+        attempt = 0
         while self.running:
             try:
                 print(f"MMLP connecting to {self.host}:{self.port}")
                 self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 self.sock.connect((self.host, self.port))
+                attempt = 0
+                # ACKs are tiny; don't let Nagle hold them back
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
                 set_server_running(True)
                 # Block until disconnect or error
@@ -47,48 +83,61 @@ class MMLPClient(threading.Thread):
             except Exception as e:
                 print(f"MMLP disconnected: {e}")
                 set_server_running(False)
-                self.buffer = b""
+                metrics.MLLP_RECONNECTS.inc()
+                self.framer.reset()
                 try:
                     self.sock.close()
                 except Exception:
                     pass
                 # Backoff before reconnect
-                time.sleep(5)
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
 
     def _listen(self):
         while self.running:
-            chunk = self.sock.recv(self.MLLP_BUFFER_SIZE)
-            if not chunk:
+            if self.framer.recv_into(self.sock) == 0:
                 # Server closed TCP connection
                 raise Exception("Server closed connection")
 
-            self.buffer += chunk
-
             # Extract all complete MLLP frames in buffer
-            while True:
-                start = self.buffer.find(self.MLLP_START_OF_BLOCK)
-                end = self.buffer.find(self.MLLP_END_OF_BLOCK)
-
-                if start == -1 or end == -1:
-                    break
-
-                # HL7 payload without framing bytes
-                payload = self.buffer[start + 1:end]
-                # Skip past <FS><CR>
-                self.buffer = self.buffer[end + 2:]
-
-                # Process decoded HL7 message
-                self.processor.process(payload.decode("ascii"))
-                self._send_ack()
-
-    def _send_ack(self):
-        body = "MSH|^~\\&|||||||ACK|||2.5\rMSA|AA\r".encode()
-
-        framed = (
-            self.MLLP_START_OF_BLOCK
-            + body
-            + self.MLLP_END_OF_BLOCK
-            + self.MLLP_CARRIAGE_RETURN
-        )
-
-        self.sock.send(framed)
+            # Payloads go to the processor undecoded so replayed duplicates can
+            # be recognised and ACKed straight from the bytes
+            started = time.perf_counter()
+            applied = []
+            for payload in self.framer.frames():
+                metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="frame")
+                message_type = peek_message_type(payload)
+                if self.pipeline is not None:
+                    # The view dies with this iteration; the queue needs a copy
+                    self.pipeline.submit(bytes(payload), self._ack_callback(self.sock, message_type))
+                else:
+                    self.processor.process(payload)
+                    applied.append(message_type)
+                started = time.perf_counter()
+
+            # One durable wait (and, with group commit, one commit) for
+            # every frame of this read, then their ACKs
+            if applied:
+                self.processor.wait_durable()
+                for message_type in applied:
+                    self._send_ack(message_type)
+
+    def _ack_callback(self, sock, message_type):
+        # Bound to the socket the frame arrived on: after a reconnect the
+        # server replays unacknowledged messages, so stale ACKs are dropped
+        def on_done(error):
+            try:
+                if error is None:
+                    sock.send(self.ACK)
+                    metrics.MESSAGES_ACKED.inc(type=message_type)
+                else:
+                    # No ACK: force a reconnect so the server resends
+                    sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        return on_done
+
+    def _send_ack(self, message_type):
+        self.sock.send(self.ACK)
+        metrics.MESSAGES_ACKED.inc(type=message_type)
@@ -0,0 +1,93 @@
+class MLLPFramer:
+    """Incremental MLLP frame decoder over a reusable bytearray.
+
+    Bytes are received straight into the buffer, the end-of-block scan
+    resumes where the previous one stopped, and complete payloads are
+    handed out as memoryviews into the buffer. Consumed bytes are only
+    reclaimed when the buffer runs out of room.
+    """
+
+    # MLLP framing bytes per HL7 over TCP spec
+    START_OF_BLOCK = 0x0B
+    END_OF_BLOCK = 0x1C
+    CARRIAGE_RETURN = 0x0D
+
+    def __init__(self, recv_size=65536):
+        self.recv_size = recv_size
+        self._buf = bytearray(recv_size * 2)
+        self._start = 0  # first byte not yet consumed
+        self._scan = 0   # where the next end-of-block search starts
+        self._end = 0    # end of received data
+
+    def reset(self):
+        """Drops buffered bytes, e.g. after a reconnect."""
+        self._start = self._scan = self._end = 0
+
+    def pending(self):
+        """Number of received bytes not yet returned as a frame."""
+        return self._end - self._start
+
+    def recv_into(self, sock):
+        """Reads once from sock into the buffer. Returns 0 on EOF."""
+        self._reserve(self.recv_size)
+        with memoryview(self._buf)[self._end:self._end + self.recv_size] as view:
+            n = sock.recv_into(view)
+        self._end += n
+        return n
+
+    def feed(self, data):
+        """Appends bytes obtained elsewhere (e.g. from an asyncio stream)."""
+        size = len(data)
+        self._reserve(size)
+        self._buf[self._end:self._end + size] = data
+        self._end += size
+
+    def frames(self):
+        """Yields the payload of each complete frame as a memoryview.
+
+        A view is only valid until the generator is resumed; copy it (or
+        decode it) if it has to outlive the iteration step.
+        """
+        buf = self._buf
+        while True:
+            end = buf.find(self.END_OF_BLOCK, self._scan, self._end)
+            if end == -1:
+                # Nothing before a start block can belong to a frame
+                first = buf.find(self.START_OF_BLOCK, self._start, self._end)
+                self._start = self._end if first == -1 else first
+                self._scan = self._end
+                return
+
+            start = buf.find(self.START_OF_BLOCK, self._start, end)
+            # The trailing <CR> is skipped with any other bytes before the
+            # next start block
+            self._start = self._scan = end + 1
+            if start == -1:
+                # End block without a start block: drop the garbage
+                continue
+
+            payload = memoryview(buf)[start + 1:end]
+            try:
+                yield payload
+            finally:
+                payload.release()
+
+    def _reserve(self, size):
+        if self._start == self._end:
+            # Everything consumed: rewind for free
+            self._start = self._scan = self._end = 0
+
+        if len(self._buf) - self._end >= size:
+            return
+
+        # Compact: move the unconsumed tail to the front
+        pending = self._end - self._start
+        if self._start:
+            self._buf[:pending] = self._buf[self._start:self._end]
+            self._scan -= self._start
+            self._start = 0
+            self._end = pending
+
+        # Still too small (a frame larger than the buffer): grow
+        if len(self._buf) - self._end < size:
+            self._buf.extend(bytes(max(size, len(self._buf))))
@@ -0,0 +1,89 @@
+import threading
+import time
+
+
+class PagerOutbox:
+    """Durable pager queue in front of HttpHandler.
+
+    send() only writes the page to State's pager_outbox table, inside the
+    unit of work the caller has open, so a page commits or rolls back with
+    the lab result that raised it. A dispatcher thread delivers committed
+    rows in order and marks them delivered; rows a crash left undelivered
+    are sent on the next start. Delivery is at-least-once: a crash between
+    the POST and the mark can repeat a page but never loses one. The table
+    holds at most one page per (MRN, admission).
+    """
+
+    def __init__(self, state, http_handler, poll_interval=1.0, batch_size=100):
+        self.state = state
+        self.http = http_handler
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.duplicates = 0
+        self.running = True
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+
+        pending = self.depth()
+        if pending:
+            print(f"Replaying {pending} undelivered pages from the outbox")
+        self._thread = threading.Thread(target=self._dispatcher, daemon=True)
+        self._thread.start()
+
+    def send(self, payload: str):
+        mrn = payload.split(",", 1)[0]
+        if not self.state.enqueue_page(mrn, payload):
+            self.duplicates += 1
+            print(f"Page for {mrn} already in the outbox for this admission")
+        self._idle.clear()
+        self._wake.set()
+
+    def depth(self) -> int:
+        return self.state.outbox_depth()
+
+    def join(self):
+        """Blocks until every committed page has been delivered or rejected."""
+        self._idle.clear()
+        self._wake.set()
+        while not (self._idle.wait(0.05) and self.depth() == 0):
+            self._wake.set()
+
+    def stats(self):
+        return {**self.state.outbox_stats(), "duplicates": self.duplicates}
+
+    def close(self, timeout=5.0):
+        """Stops the dispatcher (after join() if every page should go out
+        now); undelivered rows stay in the outbox for the next start."""
+        self.running = False
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _dispatcher(self):
+        while self.running:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                drained = self._dispatch()
+            except Exception as e:
+                print(f"Outbox dispatch failed: {e}")
+                time.sleep(self.poll_interval)
+                continue
+            if drained:
+                self._idle.set()
+            else:
+                self._wake.set()
+
+    def _dispatch(self):
+        # Returns True once nothing undelivered is left
+        rows = self.state.undelivered_pages(self.batch_size)
+        if not rows:
+            return True
+
+        # Never page for a unit of work that could still be lost
+        self.state.wait_durable()
+        for page_id, payload in rows:
+            # Retries and the circuit breaker live in deliver(); anything
+            # raised here leaves the row for the next pass
+            delivered = self.http.deliver(payload)
+            self.state.mark_page_delivered(page_id, "delivered" if delivered else "rejected")
+        return len(rows) < self.batch_size
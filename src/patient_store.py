@@ -0,0 +1,151 @@
+import sys
+from array import array
+from collections import OrderedDict
+
+
+def mrn_key(mrn):
+    """Dictionary key for an MRN: an int for plain numeric MRNs (smaller
+    and cheaper to hash), the string itself otherwise. MRNs with leading
+    zeros stay strings so "007" and "7" never collide."""
+    if isinstance(mrn, str) and mrn.isdigit() and (mrn[0] != "0" or mrn == "0"):
+        return int(mrn)
+    return mrn
+
+
+class PatientRecord:
+    """Everything the hot path reads about one patient.
+
+    sex is None when the patient has no row in `patients` (never
+    admitted); admission counts their admissions so far. The creatinine
+    aggregates mirror patient_stats; series is the sorted result values,
+    loaded only when a median is needed, and timeline the results in
+    clinical time order (window_features.py), loaded only for windowed
+    features.
+    """
+
+    __slots__ = (
+        "admitted", "paged", "sex", "admission",
+        "count", "total", "total_sq", "min_value", "max_value",
+        "series", "timeline",
+    )
+
+    def __init__(self, admitted=False, paged=False, sex=None, stats=None, admission=0):
+        self.admitted = admitted
+        self.paged = paged
+        self.sex = sex
+        self.admission = admission
+        self.count, self.total, self.total_sq, self.min_value, self.max_value = stats or (0, 0.0, 0.0, None, None)
+        self.series = None
+        self.timeline = None
+
+    def add(self, value):
+        if self.count:
+            self.min_value = min(self.min_value, value)
+            self.max_value = max(self.max_value, value)
+        else:
+            self.min_value = self.max_value = value
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+
+
+def sorted_series(values):
+    # Doubles, not floats: medians must match what SQLite REAL stores
+    return array("d", sorted(values))
+
+
+class PatientStore:
+    """In-memory patient index in front of the patients/patient_stats tables.
+
+    Records are loaded with load(mrn) on first use and kept in LRU order.
+    The tables stay the durable copy (State writes through to both), so a
+    record can be dropped at any time and reloaded later. Once the
+    estimated size passes budget_bytes, the least recently used discharged
+    patients are evicted; admitted patients are always kept.
+    """
+
+    # Rough per-record cost: the slotted object, its dict entry and key
+    RECORD_BYTES = sys.getsizeof(PatientRecord()) + 100
+
+    def __init__(self, load, budget_bytes):
+        self._load = load
+        self.budget_bytes = budget_bytes
+        self._records = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, mrn) -> PatientRecord:
+        key = mrn_key(mrn)
+        record = self._records.get(key)
+        if record is not None:
+            self.hits += 1
+            self._records.move_to_end(key)
+            return record
+
+        self.misses += 1
+        record = self._load(mrn)
+        self.bytes += self.RECORD_BYTES
+        self._evict()
+        self._records[key] = record
+        return record
+
+    def peek(self, mrn):
+        """The resident record, or None; doesn't load or touch LRU order."""
+        return self._records.get(mrn_key(mrn))
+
+    def set_series(self, record, values):
+        record.series = sorted_series(values)
+        self.bytes += record.series.itemsize * len(record.series)
+        self._evict()
+
+    def set_timeline(self, record, timeline):
+        record.timeline = timeline
+        self.bytes += timeline.nbytes
+        self._evict()
+
+    def grew(self, nbytes):
+        # A resident record's series or timeline gained a value
+        self.bytes += nbytes
+
+    def clear(self):
+        self._records.clear()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def _evict(self):
+        # Oldest first; admitted patients met on the way go to the back so
+        # the next pass starts at discharged ones
+        for _ in range(len(self._records)):
+            if self.bytes <= self.budget_bytes:
+                return
+            key, record = next(iter(self._records.items()))
+            if record.admitted:
+                self._records.move_to_end(key)
+                continue
+            del self._records[key]
+            self.bytes -= self._size(record)
+            self.evictions += 1
+
+    def _size(self, record):
+        size = self.RECORD_BYTES
+        if record.series is not None:
+            size += record.series.itemsize * len(record.series)
+        if record.timeline is not None:
+            size += record.timeline.nbytes
+        return size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "patients": len(self._records),
+            "bytes": self.bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
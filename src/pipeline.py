@@ -0,0 +1,92 @@
+import queue
+import threading
+
+
+class Pipeline:
+    """Staged ingestion: receive -> parse -> state+inference -> ACK.
+
+    Each stage runs on its own thread and the stages are joined by bounded
+    queues, so a full queue blocks the stage before it (and ultimately the
+    socket reader) instead of buffering without limit. One worker per
+    stage keeps messages, and therefore each MRN's messages, in arrival
+    order. The ACK stage waits for each message's commit to be durable,
+    so with GROUP_COMMIT_MS the apply stage keeps applying the next
+    messages into the pending commit meanwhile.
+    """
+
+    def __init__(self, processor, queue_size=1024):
+        self.processor = processor
+        self.parse_queue = queue.Queue(queue_size)
+        self.apply_queue = queue.Queue(queue_size)
+        self.ack_queue = queue.Queue(queue_size)
+
+        threading.Thread(target=self._parse_worker, daemon=True).start()
+        threading.Thread(target=self._apply_worker, daemon=True).start()
+        threading.Thread(target=self._ack_worker, daemon=True).start()
+
+    def submit(self, hl7_message, on_done=None, block=True):
+        """Queues a framed message. on_done(error) runs once it is durably
+        recorded (error is None) or has failed (error is the exception).
+
+        With block=False a full queue raises queue.Full instead of waiting.
+        """
+        self.parse_queue.put((hl7_message, on_done), block=block)
+
+    def depths(self) -> dict[str, int]:
+        return {
+            "parse": self.parse_queue.qsize(),
+            "apply": self.apply_queue.qsize(),
+            "ack": self.ack_queue.qsize(),
+        }
+
+    def join(self):
+        """Blocks until every submitted message is handled (pages are the
+        pager's to deliver)."""
+        self.parse_queue.join()
+        self.apply_queue.join()
+        self.ack_queue.join()
+
+    def _parse_worker(self):
+        while True:
+            hl7_message, on_done = self.parse_queue.get()
+            try:
+                parsed = self.processor.parse(hl7_message)
+            except Exception as e:
+                self._finish(on_done, e)
+            else:
+                self.apply_queue.put((parsed, on_done))
+            finally:
+                self.parse_queue.task_done()
+
+    def _apply_worker(self):
+        while True:
+            parsed, on_done = self.apply_queue.get()
+            try:
+                self.processor.apply(parsed)
+            except Exception as e:
+                print(f"Processing failed: {e}")
+                self.ack_queue.put((on_done, e))
+            else:
+                self.ack_queue.put((on_done, None))
+            finally:
+                self.apply_queue.task_done()
+
+    def _ack_worker(self):
+        while True:
+            on_done, error = self.ack_queue.get()
+            try:
+                if error is None:
+                    self.processor.wait_durable()
+            except Exception as e:
+                error = e
+            self._finish(on_done, error)
+            self.ack_queue.task_done()
+
+    @staticmethod
+    def _finish(on_done, error):
+        if on_done is None:
+            return
+        try:
+            on_done(error)
+        except Exception as e:
+            print(f"Completion callback failed: {e}")
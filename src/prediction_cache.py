@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from . import metrics
+
+
+class PredictionCache:
+    """Bounded LRU (optionally TTL) map of (model version, features) -> AKI.
+
+    Keys are the exact feature tuple the model would score, so any change
+    to a patient's history is a different key and stale answers can't be
+    served; the model version in the key does the same for a reloaded
+    model. ttl=0 keeps entries until they are the least recently used.
+    """
+
+    def __init__(self, max_size=10000, ttl=0.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """The cached prediction, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                prediction, stored_at = entry
+                if self.ttl and time.monotonic() - stored_at > self.ttl:
+                    del self._entries[key]
+                    self.expirations += 1
+                    metrics.PREDICTION_CACHE.inc(event="expired")
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+            if entry is None:
+                self.misses += 1
+                metrics.PREDICTION_CACHE.inc(event="miss")
+                return None
+            self.hits += 1
+        metrics.PREDICTION_CACHE.inc(event="hit")
+        return prediction
+
+    def put(self, key, prediction):
+        with self._lock:
+            self._entries[key] = (prediction, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                metrics.PREDICTION_CACHE.inc(event="eviction")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CachedDetector:
+    """AKIDetector with a PredictionCache in front of it.
+
+    Same interface, so Processor and BatchScheduler use it unchanged; a
+    batch only sends its uncached rows to the model.
+    """
+
+    def __init__(self, detector, cache):
+        self.detector = detector
+        self.cache = cache
+
+    def _key(self, features):
+        return (getattr(self.detector, "version", None), *features)
+
+    def feature_vector(self, lab_entry):
+        return self.detector.feature_vector(lab_entry)
+
+    def predict(self, lab_entry):
+        return bool(self.predict_features(self.feature_vector(lab_entry))[0])
+
+    def predict_batch(self, lab_entries):
+        if not lab_entries:
+            return []
+        return list(self.predict_features([self.feature_vector(e) for e in lab_entries]))
+
+    def predict_features(self, X):
+        """Like AKIDetector.predict_features; returns a list of bools."""
+        rows = X
+        if len(rows) and not hasattr(rows[0], "__len__"):
+            rows = [rows]  # a single feature vector
+        keys = [self._key(row) for row in rows]
+        predictions = [self.cache.get(key) for key in keys]
+
+        missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if missing:
+            scored = self.detector.predict_features([rows[i] for i in missing])
+            for i, prediction in zip(missing, scored):
+                predictions[i] = bool(prediction)
+                self.cache.put(keys[i], predictions[i])
+        return predictions
+
+    def reload(self):
+        # A new version makes every cached key unreachable; drop them now
+        # rather than waiting for them to age out
+        if self.detector.reload():
+            self.cache.clear()
+            return True
+        return False
@@ -0,0 +1,58 @@
+import queue
+import threading
+
+
+class Prefetcher:
+    """Warms State's patient store for newly admitted patients.
+
+    Processor submits the MRN of every ADT^A01; a background thread loads
+    the patient's record and sorted creatinine series (lab_results plus
+    any history snapshot), and with timeline=True (the rule cascade is on)
+    their Timeline too, so the first ORU^R01 after admission finds them
+    in memory instead of querying for them on the ingest thread. A full
+    queue drops the request: that patient is simply loaded on demand.
+    """
+
+    def __init__(self, state, queue_size=1024, timeline=False):
+        self.state = state
+        self.timeline = timeline
+        self.submitted = 0
+        self.loaded = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, mrn):
+        try:
+            self._queue.put_nowait(mrn)
+            self.submitted += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def join(self):
+        self._queue.join()
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "loaded": self.loaded,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pending": self.depth(),
+        }
+
+    def _worker(self):
+        while True:
+            mrn = self._queue.get()
+            try:
+                if self.state.prefetch(mrn, self.timeline):
+                    self.loaded += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Prefetch failed for {mrn}: {e}")
+            finally:
+                self._queue.task_done()
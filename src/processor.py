@@ -1,19 +1,87 @@
 import hl7
 import hashlib
+import time
+from collections import deque
+from concurrent.futures import Future
 from datetime import datetime
 from typing import Any
+from .hl7_scan import extract_fields, peek_message_id, peek_message_type
+from .window_features import hl7_timestamp
+from . import metrics
 
 
 class Processor:
-    def __init__(self, state, aki_detector, http_handler):
+    def __init__(self, state, aki_detector, http_handler, scheduler=None, cascade=None, prefetcher=None):
         self.state = state
         self.detector = aki_detector
         self.http = http_handler
+        # Optional Prefetcher: admissions warm the patient store in the
+        # background, ready for the first lab result
+        self.prefetcher = prefetcher
+        # Admitted patients whose first lab result hasn't arrived yet
+        self._awaiting_first_lab = set()
+        # Optional RuleCascade: clear-cut ratios are decided without the model
+        self.cascade = cascade
+        # Optional BatchScheduler: predictions are scored in micro-batches.
+        # Pages are still decided, in arrival order, inside the unit of work
+        # that recorded the results (see _resolve_pages)
+        self.scheduler = scheduler
+        self._pending_pages = deque()
+        self._pending_mrns = set()
+        # Replayed frames skipped before parsing (total, and current run)
+        self.fast_skipped = 0
+        self._skip_run = 0
+        # Model time inside the current apply(), kept out of the db stage
+        self._inference_seconds = 0.0
 
-    def process(self, hl7_message: str):
-        # Parse raw HL7 into normalized dict
-        parsed = self._parse_message(hl7_message)
+    def process(self, hl7_message):
+        # Parse raw HL7 into normalized dict; ACK after wait_durable()
+        self.apply(self.parse(hl7_message))
 
+    def parse(self, hl7_message) -> dict[str, Any]:
+        """Parse stage: raw HL7 (str or bytes-like) to the normalized dict.
+
+        Returns {} for unusable messages and for already processed ones,
+        which are recognised from the raw frame without decoding or parsing.
+        """
+        started = time.perf_counter()
+        msg_id = peek_message_id(hl7_message)
+        if msg_id is not None and self.state.is_processed(msg_id):
+            self._count_fast_skip()
+            metrics.MESSAGES_DEDUPED.inc(type=peek_message_type(hl7_message))
+            return {}
+        self._end_skip_run()
+
+        # Hand-rolled extractor for the hot message types; anything it
+        # doesn't recognise goes through the full hl7.parse path below
+        parsed = extract_fields(hl7_message, msg_id)
+        if parsed is None:
+            if not isinstance(hl7_message, str):
+                hl7_message = str(hl7_message, "ascii")
+            parsed = self._parse_message(hl7_message)
+
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="parse")
+        metrics.MESSAGES_RECEIVED.inc(type=parsed.get("type", "unparsed"))
+        return parsed
+
+    def _count_fast_skip(self):
+        self.fast_skipped += 1
+        self._skip_run += 1
+        if self._skip_run % 10000 == 0:
+            print(f"Fast-skipped {self._skip_run} replayed frames so far")
+
+    def _end_skip_run(self):
+        if self._skip_run:
+            print(f"Fast-skipped {self._skip_run} replayed frames ({self.fast_skipped} total)")
+            self._skip_run = 0
+
+    def apply(self, parsed: dict[str, Any]):
+        """State + inference stage for an already parsed message.
+
+        Doesn't wait for the commit to be durable: the caller does that
+        (wait_durable()) before ACKing, so with group commit the next
+        messages are applied while the commit is pending.
+        """
         if not parsed:
             return
 
@@ -22,10 +90,74 @@ class Processor:
         # Prevent reprocessing duplicate HL7 transmissions
         if self.state.is_processed(msg_id):
             print(f"Skipping duplicate {msg_id}")
+            metrics.MESSAGES_DEDUPED.inc(type=parsed["type"])
             return
 
-        if self._handle_message(parsed):
-            self.state.mark_processed(msg_id)
+        started = time.perf_counter()
+        self._inference_seconds = 0.0
+
+        # State changes, the dedup record and any page commit atomically, so
+        # a crash can never leave a message half-applied or applied but
+        # unmarked
+        try:
+            with self.state.transaction():
+                if self._handle_message(parsed):
+                    self.state.mark_processed(msg_id)
+                self._resolve_pages()
+        except BaseException:
+            self._pending_pages.clear()
+            raise
+
+        # Everything but the model counts as database time
+        elapsed = time.perf_counter() - started
+        metrics.STAGE_SECONDS.observe(elapsed - self._inference_seconds, stage="db")
+
+    def wait_durable(self):
+        """Blocks until every message applied so far is committed to disk."""
+        self.state.wait_durable()
+
+    def apply_batch(self, batch) -> int:
+        """apply() for many parsed messages at once (offline replay).
+
+        The whole batch is one unit of work with a single durable wait at
+        the end; each message still gets its own savepoint, so a failing
+        one is rolled back and logged without losing the rest. With a
+        scheduler, the batch's predictions are scored together and its
+        pages written before it commits. Pending decisions are also settled
+        before an admission or discharge of their patient, so a replay pages
+        exactly as applying the messages one at a time would. Returns the
+        number of messages that failed.
+        """
+        failed = 0
+        try:
+            with self.state.transaction():
+                for parsed in batch:
+                    if not parsed:
+                        continue
+                    msg_id = parsed["msg_id"]
+                    if self.state.is_processed(msg_id):
+                        metrics.MESSAGES_DEDUPED.inc(type=parsed["type"])
+                        continue
+                    if parsed["mrn"] in self._pending_mrns and parsed["type"] in ("ADT^A01", "ADT^A03"):
+                        self._resolve_pages()
+                    pending = len(self._pending_pages)
+                    try:
+                        with self.state.transaction():
+                            if self._handle_message(parsed):
+                                self.state.mark_processed(msg_id)
+                    except Exception as e:
+                        print(f"Failed to apply {msg_id}: {e}")
+                        failed += 1
+                        # Its predictions were rolled back with it
+                        while len(self._pending_pages) > pending:
+                            self._pending_pages.pop()
+                self._resolve_pages()
+        except BaseException:
+            self._pending_pages.clear()
+            raise
+
+        self.state.wait_durable()
+        return failed
 
     def _parse_message(self, hl7_message: str) -> dict[str, Any]:
         try:
@@ -83,32 +215,133 @@ class Processor:
 
         if m_type == "ADT^A01":
             self.state.admit(mrn, message.get("sex"))
+            self._awaiting_first_lab.add(mrn)
+            if self.prefetcher is not None:
+                self.prefetcher.submit(mrn)
             print(f"Admitted {mrn}")
             return True
 
         if m_type == "ADT^A03":
             self.state.discharge(mrn)
+            self._awaiting_first_lab.discard(mrn)
             print(f"Discharged {mrn}")
             return True
 
         if m_type == "ORU^R01" and message.get("is_creatinine"):
+            started = time.perf_counter()
+            # With the cascade on the first result also needs the Timeline
+            warm = self.state.is_warm(mrn, timeline=self.cascade is not None)
+
             # Ignore labs for patients not currently admitted
             if not self.state.has_patient(mrn):
                 print("Ignoring lab — patient not admitted")
                 return False
 
-            self.state.add_creatinine(mrn, message["result"])
+            first = mrn in self._awaiting_first_lab
+            if first:
+                self._awaiting_first_lab.discard(mrn)
+                metrics.FIRST_LAB_CACHE.inc(result="hit" if warm else "miss")
+            try:
+                self._handle_lab(message, mrn)
+            finally:
+                metrics.LAB_SECONDS.observe(time.perf_counter() - started, lab="first" if first else "later")
+            return True
+
+        return False
 
-            labs = self.state.get_lab_history(mrn)
+    def _handle_lab(self, message, mrn):
+        # Clinical time of the result (OBR-7); None falls back to now
+        observed_at = hl7_timestamp(message.get("time"))
 
-            if labs:
-                aki = self.detector.predict(labs)
-                # Page once per admission if AKI detected
-                if aki and not self.state.has_paged_patient(mrn):
-                    payload = f"{mrn},{message['time']}"
-                    self.http.send(payload)
-                    self.state.paged_patient(mrn)
+        # The cascade compares the result with the ones before it in time,
+        # so its reference values are taken before it is recorded
+        window = None
+        if self.cascade is not None:
+            at = observed_at if observed_at is not None else time.time()
+            window = self.state.window_features(mrn, at, message["result"])
 
-            return True
+        self.state.add_creatinine(mrn, message["result"], observed_at)
+
+        # Already paged this admission: nothing left to decide
+        if self.state.has_paged_patient(mrn):
+            if self.cascade is not None:
+                self.cascade.skip_paged()
+            return
+
+        labs = self.state.get_lab_history(mrn)
+        if not labs:
+            return
+
+        decision = None
+        if self.cascade is not None:
+            labs.update(window)
+            decision = self.cascade.decide(message["result"], labs)
+
+        if self.scheduler is not None:
+            self._schedule_page(labs, decision, mrn, message["time"])
+        elif decision is None:
+            if self._predict(labs):
+                self._page(mrn, message["time"])
+        elif decision:
+            self._page(mrn, message["time"])
+
+    def _predict(self, labs):
+        started = time.perf_counter()
+        try:
+            return self.detector.predict(labs)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._inference_seconds += elapsed
+            metrics.STAGE_SECONDS.observe(elapsed, stage="inference")
+
+    def _schedule_page(self, labs, decision, mrn, time):
+        # The lab is recorded now; the page decision follows once the batch
+        # holding this prediction is scored. Rule decisions queue behind
+        # pending predictions so pages still go out in arrival order
+        if decision is None or self._pending_pages:
+            if decision is None:
+                future = self.scheduler.submit(labs)
+            else:
+                future = Future()
+                future.set_result(decision)
+            # The admission the result belongs to, so a late decision can't
+            # page (or mark paged) a later one
+            self._pending_pages.append((future, mrn, time, self.state.admission(mrn)))
+            self._pending_mrns.add(mrn)
+            return
+
+        if decision:
+            self._page(mrn, time)
+
+    def _page(self, mrn, time, admission=None):
+        # Page once per admission if AKI detected
+        if admission is not None and self.state.admission(mrn) != admission:
+            print(f"Dropping page for {mrn}: admitted again since the result")
+            return
+        if not self.state.has_paged_patient(mrn):
+            payload = f"{mrn},{time}"
+            self.http.send(payload)
+            self.state.paged_patient(mrn)
+
+    def _resolve_pages(self):
+        # Runs inside the unit of work holding the pending results, so their
+        # pages (outbox rows) commit or roll back with them and are written
+        # before the message is ACKed. A failed prediction fails the unit
+        if not self._pending_pages:
+            return
+        self.scheduler.flush()
+        try:
+            while self._pending_pages:
+                future, mrn, time, admission = self._pending_pages[0]
+                if future.result():
+                    self._page(mrn, time, admission)
+                self._pending_pages.popleft()
+        finally:
+            self._pending_pages.clear()
+            self._pending_mrns.clear()
 
-        return False
\ No newline at end of file
+    def flush(self):
+        """Scores and pages every pending prediction in one unit of work."""
+        if self._pending_pages:
+            with self.state.transaction():
+                self._resolve_pages()
@@ -0,0 +1,86 @@
+import threading
+import time
+from .mllp_framer import MLLPFramer
+
+
+class FilePager:
+    """Dry-run pager: appends each page payload as a line to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.sent = 0
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def send(self, payload: str):
+        with self._lock:
+            self._file.write(payload + "\n")
+            self.sent += 1
+
+    def depth(self) -> int:
+        return 0
+
+    def join(self):
+        with self._lock:
+            self._file.flush()
+
+    def stats(self):
+        return {"sent": self.sent, "path": self.path}
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Replayer:
+    """Runs an MLLP file through Processor without a socket or ACKs.
+
+    The file is streamed through MLLPFramer, parsed message by message and
+    applied batch_size messages per unit of work (Processor.apply_batch).
+    Pass the Processor a BatchScheduler to batch inference as well.
+    """
+
+    READ_SIZE = 1 << 20
+
+    def __init__(self, processor, batch_size=500):
+        self.processor = processor
+        self.batch_size = batch_size
+
+    def run(self, path):
+        """Replays every frame in `path`; returns a summary dict."""
+        started = time.perf_counter()
+        framer = MLLPFramer(self.READ_SIZE)
+        messages = skipped = failed = 0
+        batch = []
+
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(self.READ_SIZE)
+                if not chunk:
+                    break
+                framer.feed(chunk)
+                for payload in framer.frames():
+                    messages += 1
+                    parsed = self.processor.parse(payload)
+                    if not parsed:
+                        skipped += 1
+                        continue
+                    batch.append(parsed)
+                    if len(batch) >= self.batch_size:
+                        failed += self.processor.apply_batch(batch)
+                        batch = []
+
+        if batch:
+            failed += self.processor.apply_batch(batch)
+        self.processor.flush()
+        if framer.pending():
+            print(f"Ignoring {framer.pending()} trailing bytes without a complete frame")
+
+        elapsed = time.perf_counter() - started
+        return {
+            "messages": messages,
+            "skipped": skipped,
+            "failed": failed,
+            "seconds": round(elapsed, 3),
+            "messages_per_sec": round(messages / elapsed, 1) if elapsed else 0.0,
+        }
@@ -1,7 +1,7 @@
 import threading
 
-# Thread-safe global flag
-_server_running = True
+# Thread-safe global flag; False until the first MLLP connection
+_server_running = False
 _lock = threading.Lock()
 
 
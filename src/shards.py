@@ -0,0 +1,264 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from . import metrics
+from .hl7_scan import peek_mrn
+
+# _in_flight result of a message its shard has not reported yet
+_PENDING = object()
+
+
+def shard_of(mrn, shards):
+    """Shard index for an MRN. crc32 rather than hash(): string hashes are
+    salted per process, and the mapping has to survive restarts."""
+    return zlib.crc32(str(mrn).encode()) % shards
+
+
+def shard_db_path(state_dir, index):
+    return os.path.join(state_dir, f"shard-{index}", "state.db")
+
+
+def check_layout(state_dir, shards):
+    """Records the shard count in state_dir, refusing to start with a
+    different one: patients would be routed to databases without them."""
+    os.makedirs(state_dir or ".", exist_ok=True)
+    path = os.path.join(state_dir, "shards")
+    if os.path.exists(path):
+        with open(path) as f:
+            recorded = int(f.read().strip() or 1)
+    elif os.path.exists(os.path.join(state_dir, "state.db")):
+        recorded = 1
+    else:
+        recorded = shards
+    if recorded != shards:
+        raise RuntimeError(f"{state_dir or '.'} holds state for {recorded} shard(s), not SHARDS={shards}")
+    with open(path, "w") as f:
+        f.write(f"{shards}\n")
+
+
+class ShardRouter:
+    """Fans framed messages out to SHARDS worker processes by MRN.
+
+    Drop-in for Pipeline on the MLLP clients: submit(message, on_done)
+    peeks PID-3 from the raw frame and queues the frame for the process
+    owning that MRN, which parses and applies it against its own State.
+    One process per MRN keeps each patient's messages in order. on_done
+    runs on the collector thread once the worker reports the message
+    durably recorded (or failed), so ACKs still follow the commit, and in
+    submission order like Pipeline's: the ACKs carry no control id, so
+    the sender matches them by position. A message finished by one shard
+    waits for every earlier message on the others.
+
+    target(index, shards, inbox, results) is the worker entry point (see
+    serve()). Workers start one at a time, so shared start-up work (the
+    history snapshot) is done once; one that dies fails its in-flight
+    messages, which are then resent by the server, and is restarted.
+    The metrics workers report are merged into this process's registry,
+    so /metrics covers every shard.
+    """
+
+    def __init__(self, shards, target, queue_size=1024, start_timeout=300):
+        self.shards = shards
+        self.target = target
+        self.start_timeout = start_timeout
+        self.restarts = 0
+        self._closed = False
+        self._ctx = multiprocessing.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._inboxes = [self._ctx.Queue(queue_size) for _ in range(shards)]
+        # seq -> [shard, on_done, error or _PENDING], released in seq order
+        self._in_flight = {}
+        self._next_seq = 0
+        self._released = 0
+        self._lock = threading.Lock()
+        self._release_lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+        self.processes = [None] * shards
+        for index in range(shards):
+            self._start(index)
+        threading.Thread(target=self._collector, daemon=True).start()
+
+    def _start(self, index):
+        process = self._ctx.Process(
+            target=self.target,
+            args=(index, self.shards, self._inboxes[index], self._results),
+            name=f"shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            try:
+                kind, *rest = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"Shard {index} exited during start-up (code {process.exitcode})")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Shard {index} not ready after {self.start_timeout}s")
+                continue
+            if kind == "ready" and rest[0] == index:
+                print(f"Shard {index}/{self.shards} ready (pid {process.pid})")
+                return
+            self._handle(kind, rest)
+
+    def submit(self, hl7_message, on_done=None, block=True):
+        """Same contract as Pipeline.submit."""
+        mrn = peek_mrn(hl7_message)
+        # Frames without a patient are rejected by whichever shard gets them
+        index = shard_of(mrn, self.shards) if mrn is not None else 0
+
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._in_flight[seq] = [index, on_done, _PENDING]
+        try:
+            self._inboxes[index].put((seq, bytes(hl7_message)), block=block)
+        except BaseException:
+            # The caller gets the exception instead of a callback; later
+            # messages must not wait for this one
+            with self._lock:
+                self._in_flight[seq][1:] = [None, None]
+            self._release()
+            raise
+
+    def depths(self) -> dict[str, int]:
+        return {f"shard-{index}": inbox.qsize() for index, inbox in enumerate(self._inboxes)}
+
+    def join(self):
+        """Blocks until every submitted message is handled."""
+        with self._idle:
+            while self._in_flight:
+                self._idle.wait()
+
+    def close(self):
+        """Stops the workers (after join() if nothing should be lost)."""
+        self._closed = True
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join(10)
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {"shards": self.shards, "in_flight": in_flight, "restarts": self.restarts}
+
+    def _collector(self):
+        while True:
+            try:
+                kind, *rest = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not self._closed:
+                    self._check_workers()
+                continue
+            self._handle(kind, rest)
+
+    def _handle(self, kind, rest):
+        if kind == "done":
+            self._complete(*rest)
+        elif kind == "metrics":
+            index, snapshot = rest
+            metrics.REGISTRY.merge(f"shard-{index}", snapshot)
+
+    def _complete(self, seq, error):
+        with self._lock:
+            entry = self._in_flight.get(seq)
+            if entry is None or entry[2] is not _PENDING:
+                return  # already failed when its worker died
+            entry[2] = error
+        self._release()
+
+    def _release(self):
+        # Runs the callbacks of the finished messages at the head of the
+        # submission order
+        with self._release_lock:
+            while True:
+                with self._lock:
+                    entry = self._in_flight.get(self._released)
+                    if entry is None or entry[2] is _PENDING:
+                        return
+                    del self._in_flight[self._released]
+                    self._released += 1
+                    self._idle.notify_all()
+                _, on_done, error = entry
+                if on_done is None:
+                    continue
+                try:
+                    on_done(None if error is None else RuntimeError(error))
+                except Exception as e:
+                    print(f"Completion callback failed: {e}")
+
+    def _check_workers(self):
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            print(f"Shard {index} exited (code {process.exitcode}); restarting")
+            with self._lock:
+                lost = [
+                    seq for seq, (owner, _, error) in self._in_flight.items()
+                    if owner == index and error is _PENDING
+                ]
+            for seq in lost:
+                self._complete(seq, f"shard {index} exited")
+            self.restarts += 1
+            metrics.REGISTRY.retire(f"shard-{index}")
+            try:
+                self._start(index)
+            except RuntimeError as e:
+                print(f"Shard {index} restart failed: {e}")
+
+
+def serve(processor, inbox, results, index, maintenance=None, interval=3600, max_group=256,
+          metrics_interval=1.0):
+    """Worker loop: applies frames from inbox and reports ("done", seq,
+    error) on results once they are durable. Frames already queued are
+    applied before the durable wait, so they share it (and, with group
+    commit, the commit). Every metrics_interval seconds it also reports
+    ("metrics", index, snapshot) of this process's metrics registry.
+    Exits once the parent process is gone."""
+    parent = os.getppid()
+    results.put(("ready", index))
+    next_maintenance = time.monotonic() + interval
+    next_report = time.monotonic() + metrics_interval
+
+    while True:
+        try:
+            seq, message = inbox.get(timeout=1.0)
+        except queue.Empty:
+            if os.getppid() != parent:
+                return
+        else:
+            done = [(seq, _apply(processor, message))]
+            while len(done) < max_group:
+                try:
+                    seq, message = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                done.append((seq, _apply(processor, message)))
+            processor.wait_durable()
+            for seq, error in done:
+                results.put(("done", seq, error))
+
+        if time.monotonic() >= next_report:
+            results.put(("metrics", index, metrics.REGISTRY.snapshot()))
+            next_report = time.monotonic() + metrics_interval
+
+        if maintenance is not None and time.monotonic() >= next_maintenance:
+            maintenance()
+            next_maintenance = time.monotonic() + interval
+
+
+def _apply(processor, message):
+    # The error text for the router, or None
+    try:
+        processor.process(message)
+    except Exception as e:
+        print(f"Processing failed: {e}")
+        return str(e)
+    return None
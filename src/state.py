@@ -1,10 +1,42 @@
 import sqlite3
-import numpy as np
+import threading
+import time
+import bisect
+import math
+from contextlib import contextmanager
 import os
+from .dedup import DedupIndex
+from .patient_store import PatientRecord, PatientStore
+from .window_features import Timeline, db_timestamp, parse_db_timestamp
+from . import metrics
+
+
+UPSERT_PATIENT_STATS = """
+    INSERT INTO patient_stats (mrn, count, total, total_sq, min_value, max_value)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(mrn) DO UPDATE SET
+        count = count + excluded.count,
+        total = total + excluded.total,
+        total_sq = total_sq + excluded.total_sq,
+        min_value = MIN(min_value, excluded.min_value),
+        max_value = MAX(max_value, excluded.max_value)
+"""
+
+# patient_stats from the live results alone (without any history snapshot)
+SEED_PATIENT_STATS = """
+    INSERT INTO patient_stats (mrn, count, total, total_sq, min_value, max_value)
+    SELECT mrn, COUNT(*), SUM(value), SUM(value * value), MIN(value), MAX(value)
+    FROM lab_results GROUP BY mrn
+"""
 
 
 class State:
-    def __init__(self, db_path=None):
+    # Statement cache per connection; every query below is a fixed SQL string
+    # so sqlite3 reuses the compiled statement across calls
+    CACHED_STATEMENTS = 256
+
+    def __init__(self, db_path=None, group_commit_ms=None, dedup_retention_days=None, dedup_max_rows=None,
+                 patient_store_mb=None):
         if db_path is None:
             state_dir = os.environ.get("STATE_DIR", "")
             if state_dir:
@@ -13,11 +45,166 @@ class State:
             else:
                 db_path = "state.db"
         self.db_path = db_path
+
+        # Group commit: units of work are left in one open transaction and
+        # flushed together at most every group_commit_ms (0 disables)
+        if group_commit_ms is None:
+            group_commit_ms = float(os.environ.get("GROUP_COMMIT_MS", "0"))
+        self.group_commit_ms = group_commit_ms
+
+        # processed_messages retention; 0 keeps every id forever. Ids older
+        # than the retention would be reprocessed if the feed replayed them
+        if dedup_retention_days is None:
+            dedup_retention_days = float(os.environ.get("DEDUP_RETENTION_DAYS", "0"))
+        if dedup_max_rows is None:
+            dedup_max_rows = int(os.environ.get("DEDUP_MAX_ROWS", "0"))
+        self.dedup_retention_days = dedup_retention_days
+        self.dedup_max_rows = dedup_max_rows
+
+        # One long-lived connection shared by every thread, serialised by a
+        # re-entrant lock so nested State calls from the same thread are fine
+        self._lock = threading.RLock()
+        self._durable = threading.Condition(self._lock)
+        self._tx_depth = 0
+        self._batch_started = 0.0
+        # Units of work released so far vs. the ones known to be committed
+        self._written_seq = 0
+        self._durable_seq = 0
+        # In-memory patient records (flags, aggregates and the sorted
+        # creatinine series for the median), loaded lazily and written
+        # through alongside the tables; see patient_store.py
+        if patient_store_mb is None:
+            patient_store_mb = float(os.environ.get("PATIENT_STORE_MB", "256"))
+        self._patients = PatientStore(self._load_patient, int(patient_store_mb * 1024 * 1024))
+        # Optional memory-mapped history (see history_snapshot.py)
+        self._history = None
+        # Bloom-fronted index over processed_messages (see dedup.py); ids
+        # marked inside an open unit of work wait in an insertion-ordered
+        # dict (set lookups, truncated on rollback) until it is released
+        self._dedup = None
+        self._pending_processed = {}
+        self._conn = self._open_connection()
         self._setup_database()
+        self._dedup = DedupIndex(self._processed_ids, self._lookup_processed)
+        self.compact_processed()
+        self.dedup_stats()  # sets the table size gauge
 
-    def _get_connection(self):
+        if self.group_commit_ms > 0:
+            threading.Thread(target=self._group_commit_loop, daemon=True).start()
+
+    def _open_connection(self):
         # sqlite3.connect creates the file if it doesn't exist
-        return sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None,  # autocommit; transactions are explicit
+            cached_statements=self.CACHED_STATEMENTS,
+        )
+        # WAL avoids the rollback-journal fsync on every commit and lets
+        # readers run alongside the writer
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across application crashes in WAL mode; only an
+        # OS crash / power loss can drop the last few commits. Group commit
+        # holds ACKs until their commit, so each commit is synced (FULL):
+        # one fsync per group instead of one per message
+        if self.group_commit_ms > 0:
+            conn.execute("PRAGMA synchronous=FULL")
+        else:
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-16000")  # ~16MB page cache
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def _get_connection(self):
+        with self._lock:
+            yield self._conn
+
+    @contextmanager
+    def transaction(self):
+        """Unit of work: everything inside commits or rolls back together.
+
+        Nested calls become savepoints of the outer unit. With group commit
+        enabled the outermost unit is only released into the shared open
+        transaction; use wait_durable() to block until it is on disk.
+        """
+        with self._lock:
+            conn = self._conn
+            if self._tx_depth == 0 and self.group_commit_ms > 0 and not conn.in_transaction:
+                conn.execute("BEGIN")
+                self._batch_started = time.monotonic()
+
+            # A savepoint outside a transaction opens one, and releasing the
+            # outermost savepoint commits it
+            savepoint = f"uow{self._tx_depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            self._tx_depth += 1
+            marked_before = len(self._pending_processed)
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+                # In-memory records may hold changes that were just rolled
+                # back; drop them and reload from the database on demand
+                self._patients.clear()
+                # So may the dedup ids marked since the savepoint
+                for message_id in list(self._pending_processed)[marked_before:]:
+                    del self._pending_processed[message_id]
+                raise
+            else:
+                if self._tx_depth == 1 and self.group_commit_ms <= 0:
+                    # Releasing the outermost savepoint is the commit
+                    with metrics.DB_COMMIT_SECONDS.time():
+                        conn.execute(f"RELEASE {savepoint}")
+                else:
+                    conn.execute(f"RELEASE {savepoint}")
+            finally:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    for message_id in self._pending_processed:
+                        self._dedup.add(message_id)
+                    self._pending_processed.clear()
+                    self._written_seq += 1
+                    if not conn.in_transaction:
+                        self._mark_durable()
+                    elif time.monotonic() - self._batch_started >= self.group_commit_ms / 1000:
+                        self._commit_pending()
+
+    def wait_durable(self):
+        """Blocks until every unit of work released so far is committed;
+        with group commit, until that commit is fsynced as well."""
+        with self._durable:
+            target = self._written_seq
+            while self._durable_seq < target:
+                self._durable.wait()
+
+    def _mark_durable(self):
+        self._durable_seq = self._written_seq
+        self._durable.notify_all()
+
+    def _commit_pending(self):
+        # Caller holds the lock and no unit of work is open
+        if self._conn.in_transaction:
+            with metrics.DB_COMMIT_SECONDS.time():
+                self._conn.commit()
+        self._mark_durable()
+
+    def _group_commit_loop(self):
+        interval = self.group_commit_ms / 1000
+        while self._conn is not None:
+            time.sleep(interval)
+            with self._lock:
+                if self._conn is not None and self._tx_depth == 0:
+                    self._commit_pending()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                if self._tx_depth == 0:
+                    self._commit_pending()
+                self._conn.close()
+                self._conn = None
 
     def _setup_database(self):
         """Initializes tables in the local SQLite file."""
@@ -29,9 +216,13 @@ class State:
                     mrn TEXT PRIMARY KEY,
                     sex INTEGER,
                     is_admitted INTEGER DEFAULT 1,
-                    paged INTEGER DEFAULT 0
+                    paged INTEGER DEFAULT 0,
+                    admissions INTEGER DEFAULT 0
                 )
             """)
+            columns = [r[1] for r in cursor.execute("PRAGMA table_info(patients)")]
+            if "admissions" not in columns:
+                cursor.execute("ALTER TABLE patients ADD COLUMN admissions INTEGER DEFAULT 0")
             # Table for lab results
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS lab_results (
@@ -42,91 +233,395 @@ class State:
                     FOREIGN KEY (mrn) REFERENCES patients(mrn)
                 )
             """)
+            # Results by patient in clinical time order; the old mrn-only
+            # index is a prefix of this one
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_lab_results_mrn_ts ON lab_results(mrn, timestamp)")
+            cursor.execute("DROP INDEX IF EXISTS idx_lab_results_mrn")
+
+            # Running creatinine aggregates per patient, updated on every insert
+            has_stats = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'patient_stats'"
+            ).fetchone()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS patient_stats (
+                    mrn TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    total REAL NOT NULL,
+                    total_sq REAL NOT NULL,
+                    min_value REAL NOT NULL,
+                    max_value REAL NOT NULL
+                )
+            """)
+            if not has_stats:
+                # Databases created before patient_stats existed: seed it once
+                cursor.execute(SEED_PATIENT_STATS)
+
+            # Imported history files, keyed by content hash so restarts skip them
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS history_imports (
+                    file_hash TEXT PRIMARY KEY,
+                    path TEXT,
+                    rows INTEGER,
+                    storage TEXT DEFAULT 'rows',
+                    imported_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            columns = [r[1] for r in cursor.execute("PRAGMA table_info(history_imports)")]
+            if "storage" not in columns:
+                cursor.execute("ALTER TABLE history_imports ADD COLUMN storage TEXT DEFAULT 'rows'")
+
             # Table for message tracking
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS processed_messages (
-                    message_id TEXT PRIMARY KEY
+                    message_id TEXT PRIMARY KEY,
+                    processed_at INTEGER DEFAULT 0
                 )
             """)
-            conn.commit()
+            columns = [r[1] for r in cursor.execute("PRAGMA table_info(processed_messages)")]
+            if "processed_at" not in columns:
+                cursor.execute("ALTER TABLE processed_messages ADD COLUMN processed_at INTEGER DEFAULT 0")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_processed_messages_at ON processed_messages(processed_at)"
+            )
 
-    def is_processed(self, message_id: str) -> bool:
+            # Pages waiting for (or past) delivery; one per patient admission
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS pager_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    mrn TEXT NOT NULL,
+                    admission INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at INTEGER NOT NULL,
+                    delivered_at INTEGER,
+                    outcome TEXT,
+                    UNIQUE (mrn, admission)
+                )
+            """)
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_pager_outbox_pending ON pager_outbox(id) WHERE delivered_at IS NULL"
+            )
+
+    def _processed_ids(self):
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1 FROM processed_messages WHERE message_id = ?", (message_id,))
+            return [r[0] for r in conn.execute("SELECT message_id FROM processed_messages")]
+
+    def _lookup_processed(self, message_id):
+        with self._get_connection() as conn:
+            cursor = conn.execute("SELECT 1 FROM processed_messages WHERE message_id = ?", (message_id,))
             return cursor.fetchone() is not None
 
+    def is_processed(self, message_id: str) -> bool:
+        with self._lock:
+            return message_id in self._pending_processed or message_id in self._dedup
+
     def mark_processed(self, message_id: str):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO processed_messages (message_id, processed_at) VALUES (?, ?)",
+                (message_id, int(time.time())),
+            )
+            self._pending_processed[message_id] = None
+
+    def compact_processed(self):
+        """Applies the dedup retention limits. Returns the rows deleted."""
+        if not self.dedup_retention_days and not self.dedup_max_rows:
+            return 0
+
+        deleted = 0
+        with self.transaction() as conn:
+            if self.dedup_retention_days:
+                cutoff = int(time.time() - self.dedup_retention_days * 86400)
+                deleted += conn.execute(
+                    "DELETE FROM processed_messages WHERE processed_at < ?", (cutoff,)
+                ).rowcount
+            if self.dedup_max_rows:
+                # Oldest first; freed pages are reused by later inserts so
+                # the file stops growing
+                deleted += conn.execute("""
+                    DELETE FROM processed_messages WHERE rowid IN (
+                        SELECT rowid FROM processed_messages ORDER BY processed_at
+                        LIMIT MAX(0, (SELECT COUNT(*) FROM processed_messages) - ?)
+                    )
+                """, (self.dedup_max_rows,)).rowcount
+
+        if deleted:
+            # Deleted ids would otherwise all turn into false positives
+            with self._lock:
+                self._dedup.rebuild()
+            print(f"Compacted {deleted} processed message ids")
+        return deleted
+
+    def dedup_stats(self):
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT OR IGNORE INTO processed_messages (message_id) VALUES (?)", (message_id,))
-            conn.commit()
+            rows = conn.execute("SELECT COUNT(*) FROM processed_messages").fetchone()[0]
+            stats = self._dedup.stats()
+        stats["table_rows"] = rows
+        metrics.DEDUP_TABLE_ROWS.set(rows)
+        return stats
 
     def admit(self, mrn, sex_str):
         sex = 0 if sex_str == "F" else 1
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
+        with self.transaction() as conn:
             # SQLite 'REPLACE' or 'INSERT OR REPLACE' handles the update logic
-            cursor.execute("""
-                INSERT INTO patients (mrn, sex, is_admitted, paged) 
-                VALUES (?, ?, 1, 0)
-                ON CONFLICT(mrn) DO UPDATE SET is_admitted=1, paged=0
+            conn.execute("""
+                INSERT INTO patients (mrn, sex, is_admitted, paged, admissions)
+                VALUES (?, ?, 1, 0, 1)
+                ON CONFLICT(mrn) DO UPDATE SET is_admitted=1, paged=0, admissions=admissions + 1
             """, (mrn, sex))
-            conn.commit()
+            record = self._patients.peek(mrn)
+            if record is not None:
+                # A readmission keeps the sex recorded first, as the upsert does
+                record.admitted, record.paged = True, False
+                record.admission += 1
+                if record.sex is None:
+                    record.sex = sex
 
     def discharge(self, mrn):
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE patients SET is_admitted = 0 WHERE mrn = ?", (mrn,))
-            conn.commit()
+        with self.transaction() as conn:
+            conn.execute("UPDATE patients SET is_admitted = 0 WHERE mrn = ?", (mrn,))
+            record = self._patients.peek(mrn)
+            if record is not None:
+                record.admitted = False
 
     def has_patient(self, mrn):
+        with self._lock:
+            return self._patients.get(mrn).admitted
+
+    def admission(self, mrn):
+        """Number of the patient's current (or last) admission; 0 if never admitted."""
+        with self._lock:
+            return self._patients.get(mrn).admission
+
+    def add_creatinine(self, mrn, value, observed_at=None):
+        """Records a result taken at observed_at (epoch seconds; the
+        insertion time when None)."""
+        if observed_at is None:
+            observed_at = float(int(time.time()))
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO lab_results (mrn, value, timestamp) VALUES (?, ?, ?)",
+                (mrn, value, db_timestamp(observed_at)),
+            )
+            conn.execute(UPSERT_PATIENT_STATS, (mrn, 1, value, value * value, value, value))
+
+            record = self._patients.peek(mrn)
+            if record is not None:
+                record.add(value)
+                if record.series is not None:
+                    bisect.insort(record.series, value)
+                    self._patients.grew(record.series.itemsize)
+                if record.timeline is not None:
+                    self._patients.grew(record.timeline.add(observed_at, value))
+
+    def bulk_add_creatinine(self, rows, stats):
+        """Inserts many (mrn, value, timestamp) rows and merges per-patient
+        (mrn, count, total, total_sq, min, max) aggregates in one go."""
+        with self.transaction() as conn:
+            conn.executemany("INSERT INTO lab_results (mrn, value, timestamp) VALUES (?, ?, ?)", rows)
+            conn.executemany(UPSERT_PATIENT_STATS, stats)
+            # Cached records no longer match the tables
+            self._patients.clear()
+
+    def replace_history_aggregates(self, stats):
+        """Rebuilds patient_stats from lab_results plus a new history
+        snapshot's (mrn, count, total, total_sq, min, max) aggregates, so
+        those of an earlier snapshot are dropped rather than added to."""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM patient_stats")
+            conn.execute(SEED_PATIENT_STATS)
+            conn.executemany(UPSERT_PATIENT_STATS, stats)
+            self._patients.clear()
+
+    def imported_storage(self, file_hash):
+        """How a history file was imported: 'rows', a snapshot format
+        ('snapshot' for the first, then HistorySnapshot.STORAGE) or None."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT is_admitted FROM patients WHERE mrn = ?", (mrn,))
-            result = cursor.fetchone()
-            return result is not None and result[0] == 1
+            cursor = conn.execute("SELECT storage FROM history_imports WHERE file_hash = ?", (file_hash,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def has_imported(self, file_hash):
+        return self.imported_storage(file_hash) is not None
+
+    def record_import(self, file_hash, path, rows, storage="rows"):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO history_imports (file_hash, path, rows, storage) VALUES (?, ?, ?, ?)",
+                (file_hash, path, rows, storage),
+            )
+
+    def attach_history(self, snapshot):
+        """Serves historical results from a HistorySnapshot instead of lab_results."""
+        with self._lock:
+            self._history = snapshot
+            self._patients.clear()
 
-    def add_creatinine(self, mrn, value):
+    def patient_store_stats(self):
+        with self._lock:
+            return self._patients.stats()
+
+    def _load_patient(self, mrn):
+        # Caller holds the lock
+        conn = self._conn
+        patient = conn.execute(
+            "SELECT is_admitted, paged, sex, admissions FROM patients WHERE mrn = ?", (mrn,)
+        ).fetchone()
+        stats = conn.execute(
+            "SELECT count, total, total_sq, min_value, max_value FROM patient_stats WHERE mrn = ?",
+            (mrn,),
+        ).fetchone()
+        if patient is None:
+            return PatientRecord(stats=stats)
+        return PatientRecord(patient[0] == 1, patient[1] == 1, patient[2], stats, patient[3])
+
+    def prefetch(self, mrn, timeline=False):
+        """Loads a patient's record and creatinine series (and, with
+        timeline, their Timeline) into the store ahead of their first
+        result. Returns False if already resident."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO lab_results (mrn, value) VALUES (?, ?)", (mrn, value))
-            conn.commit()
+            if self.is_warm(mrn, timeline):
+                return False
+            record = self._patients.get(mrn)
+            self._get_series(conn, mrn, record)
+            if timeline:
+                self._get_timeline(conn, mrn, record)
+            return True
+
+    def is_warm(self, mrn, timeline=False):
+        """True if get_lab_history(mrn) (and, with timeline,
+        window_features) needs no database reads."""
+        with self._lock:
+            record = self._patients.peek(mrn)
+            if record is None or record.series is None:
+                return False
+            return not timeline or record.timeline is not None
+
+    def _get_series(self, conn, mrn, record):
+        # Caller holds the lock
+        if record.series is None:
+            cursor = conn.execute("SELECT value FROM lab_results WHERE mrn = ?", (mrn,))
+            values = [r[0] for r in cursor]
+            if self._history is not None:
+                historic = self._history.lookup(mrn)
+                if historic is not None:
+                    values.extend(historic[0].tolist())
+            self._patients.set_series(record, values)
+        return record.series
+
+    def _get_timeline(self, conn, mrn, record):
+        # Caller holds the lock
+        if record.timeline is None:
+            cursor = conn.execute("SELECT timestamp, value FROM lab_results WHERE mrn = ?", (mrn,))
+            pairs = [(parse_db_timestamp(ts), value) for ts, value in cursor]
+            if self._history is not None:
+                historic = self._history.lookup(mrn)
+                if historic is not None:
+                    values, timestamps = historic
+                    pairs.extend(zip(timestamps.astype(float).tolist(), values.tolist()))
+            self._patients.set_timeline(record, Timeline(pairs))
+        return record.timeline
+
+    def window_features(self, mrn, at, latest):
+        """Time-windowed reference values for a result of `latest` taken at
+        `at` (epoch seconds), from the results already recorded; see
+        Timeline.features. Call before add_creatinine for that result."""
+        with self._get_connection() as conn:
+            record = self._patients.get(mrn)
+            timeline = self._get_timeline(conn, mrn, record)
+            # The timeline keeps its last baseline window sorted
+            before = timeline.nbytes
+            features = timeline.features(at, latest)
+            self._patients.grew(timeline.nbytes - before)
+            return features
 
     def get_lab_history(self, mrn):
         with self._get_connection() as conn:
-            conn.row_factory = sqlite3.Row  # Allows accessing columns by name
-            cursor = conn.cursor()
+            record = self._patients.get(mrn)
+            if not record.count or record.sex is None:
+                return None
 
-            cursor.execute("SELECT sex FROM patients WHERE mrn = ?", (mrn,))
-            patient = cursor.fetchone()
+            series = self._get_series(conn, mrn, record)
+            sex = record.sex
+            count, total, total_sq = record.count, record.total, record.total_sq
+            min_value, max_value = record.min_value, record.max_value
 
-            cursor.execute("SELECT value FROM lab_results WHERE mrn = ?", (mrn,))
-            rows = cursor.fetchall()
+        mean = total / count
+        # Population std from the running sums (clamped against rounding)
+        std = math.sqrt(max(total_sq / count - mean * mean, 0.0))
 
-        if not rows or not patient:
-            return None
+        middle = count // 2
+        if count % 2:
+            median = series[middle]
+        else:
+            median = (series[middle - 1] + series[middle]) / 2
 
-        results = [r['value'] for r in rows]
         return {
-            "sex": patient['sex'],
-            "min": min(results),
-            "max": max(results),
-            "mean": np.mean(results),
-            "median": np.median(results),
-            "std": np.std(results),
-            "results": results
+            "sex": sex,
+            "min": min_value,
+            "max": max_value,
+            "mean": mean,
+            "median": median,
+            "std": std,
+            "count": count,
+            # Sorted ascending array('d'); shared with the store, treat as read-only
+            "results": series,
         }
 
     def paged_patient(self, mrn):
+        with self.transaction() as conn:
+            conn.execute("UPDATE patients SET paged = 1 WHERE mrn = ?", (mrn,))
+            record = self._patients.peek(mrn)
+            if record is not None and record.sex is not None:
+                record.paged = True
+
+    def enqueue_page(self, mrn, payload, admission=None):
+        """Adds a page to the outbox in the current unit of work. Returns
+        False if that admission of the patient already has one.
+
+        admission defaults to the patient's current one. Processor pages
+        from inside the unit of work that recorded the result, after
+        checking the admission is still the result's, so that is the one
+        the page belongs to.
+        """
+        with self.transaction() as conn:
+            if admission is None:
+                admission = self.admission(mrn)
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO pager_outbox (mrn, admission, payload, created_at) VALUES (?, ?, ?, ?)",
+                (mrn, admission, payload, int(time.time())),
+            )
+            return cursor.rowcount > 0
+
+    def undelivered_pages(self, limit=100):
+        """Oldest undelivered outbox rows as (id, payload)."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE patients SET paged = 1 WHERE mrn = ?", (mrn,))
-            conn.commit()
+            return conn.execute(
+                "SELECT id, payload FROM pager_outbox WHERE delivered_at IS NULL ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
 
-    def has_paged_patient(self, mrn):
+    def mark_page_delivered(self, page_id, outcome="delivered"):
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE pager_outbox SET delivered_at = ?, outcome = ? WHERE id = ?",
+                (int(time.time()), outcome, page_id),
+            )
+
+    def outbox_depth(self):
+        """Pages not yet delivered or rejected (served by the partial index)."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT paged FROM patients WHERE mrn = ?", (mrn,))
-            result = cursor.fetchone()
-            return result is not None and result[0] == 1
\ No newline at end of file
+            return conn.execute("SELECT COUNT(*) FROM pager_outbox WHERE delivered_at IS NULL").fetchone()[0]
+
+    def outbox_stats(self):
+        """Pages per outcome; scans the whole outbox, so hourly only."""
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                "SELECT outcome, COUNT(*) FROM pager_outbox GROUP BY outcome"
+            ).fetchall()
+        counts = {outcome or "undelivered": count for outcome, count in rows}
+        counts.setdefault("undelivered", 0)
+        return counts
+
+    def has_paged_patient(self, mrn):
+        with self._lock:
+            return self._patients.get(mrn).paged
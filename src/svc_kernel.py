@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class CompiledSVC:
+    """NumPy-only decision function of a StandardScaler -> SVC pipeline.
+
+    The scaler statistics, support vectors, dual coefficients and kernel
+    parameters are copied into contiguous float64 arrays once, so scoring
+    is a few vectorised operations with no DataFrame or sklearn input
+    validation. Accepts one feature vector or a 2-D batch.
+    """
+
+    def __init__(self, mean, scale, support_vectors, dual_coef, intercept,
+                 classes, kernel="rbf", gamma=1.0, coef0=0.0, degree=3):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float64)
+        self.scale = np.ascontiguousarray(scale, dtype=np.float64)
+        self.support_vectors = np.ascontiguousarray(support_vectors, dtype=np.float64)
+        self.dual_coef = np.ascontiguousarray(dual_coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.classes = np.asarray(classes)
+        self.kernel = kernel
+        self.gamma = float(gamma)
+        self.coef0 = float(coef0)
+        self.degree = degree
+        # ||sv||^2 for the RBF expansion ||x - sv||^2 = ||x||^2 - 2 x.sv + ||sv||^2
+        self._sv_sq = np.einsum("ij,ij->i", self.support_vectors, self.support_vectors)
+
+    @classmethod
+    def from_pipeline(cls, model):
+        """Builds the kernel from a fitted pipeline, or returns None when the
+        pipeline isn't a (StandardScaler, binary SVC) pair we can reproduce."""
+        steps = getattr(model, "steps", None)
+        if not steps or len(steps) != 2:
+            return None
+        scaler, svc = steps[0][1], steps[1][1]
+        if type(scaler).__name__ != "StandardScaler" or type(svc).__name__ != "SVC":
+            return None
+        if len(svc.classes_) != 2 or svc.kernel not in ("rbf", "linear", "poly", "sigmoid"):
+            return None
+
+        n_features = svc.support_vectors_.shape[1]
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+
+        return cls(
+            mean=mean,
+            scale=scale,
+            support_vectors=svc.support_vectors_,
+            # Public dual_coef_/intercept_ are already sign-adjusted so that a
+            # positive decision value means classes_[1]
+            dual_coef=svc.dual_coef_[0],
+            intercept=svc.intercept_[0],
+            classes=svc.classes_,
+            kernel=svc.kernel,
+            gamma=svc._gamma,
+            coef0=svc.coef0,
+            degree=svc.degree,
+        )
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        Z = (X - self.mean) / self.scale
+        dot = Z @ self.support_vectors.T
+
+        if self.kernel == "rbf":
+            sq_dist = np.einsum("ij,ij->i", Z, Z)[:, None] - 2 * dot + self._sv_sq
+            K = np.exp(-self.gamma * np.maximum(sq_dist, 0.0))
+        elif self.kernel == "linear":
+            K = dot
+        elif self.kernel == "poly":
+            K = (self.gamma * dot + self.coef0) ** self.degree
+        else:  # sigmoid
+            K = np.tanh(self.gamma * dot + self.coef0)
+
+        return K @ self.dual_coef + self.intercept
+
+    def predict(self, X):
+        return self.classes[(self.decision_function(X) > 0).astype(int)]
@@ -0,0 +1,156 @@
+import bisect
+import calendar
+import time
+from array import array
+from datetime import datetime, timezone
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Reference windows before a result: the lowest value in the last 48h and
+# the median of the results 7 to 365 days earlier
+RECENT_WINDOW = 48 * HOUR
+BASELINE_WINDOW = (7 * DAY, 365 * DAY)
+
+_HL7_FORMATS = {8: "%Y%m%d", 10: "%Y%m%d%H", 12: "%Y%m%d%H%M", 14: "%Y%m%d%H%M%S"}
+
+
+def hl7_timestamp(text):
+    """Epoch seconds of an HL7 TS such as OBR-7 ("202401202243"), or None.
+
+    Times without a zone are read as UTC, like the history snapshot's;
+    fractional seconds and a trailing +/-ZZZZ offset are ignored.
+    """
+    if not text:
+        return None
+    digits = text.split(".", 1)[0].split("+", 1)[0].split("-", 1)[0]
+    fmt = _HL7_FORMATS.get(len(digits))
+    if fmt is None:
+        return None
+    try:
+        return float(calendar.timegm(time.strptime(digits, fmt)))
+    except ValueError:
+        return None
+
+
+def db_timestamp(epoch):
+    """lab_results.timestamp text for epoch seconds (CURRENT_TIMESTAMP's format)."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+
+def parse_db_timestamp(text):
+    if not text:
+        return 0.0
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _median(ordered):
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+class Timeline:
+    """A patient's creatinine results ordered by clinical time.
+
+    Parallel arrays of times and values. A result is inserted at its own
+    time (binary search), so late and out-of-order messages land where
+    they belong; each window is found with two binary searches.
+
+    Results mostly arrive in time order, so add() is an append and the
+    7-365 day window only slides forward: its values are kept sorted
+    between calls and updated with the results that entered and left it,
+    instead of sorting the whole window for every result. A late result
+    costs an O(n) array insert and, if it moves the window backwards, one
+    re-sort of the window; the 48 hour minimum is a scan of that window
+    only.
+    """
+
+    __slots__ = ("times", "values", "_baseline")
+
+    def __init__(self, pairs=()):
+        pairs = sorted(pairs)
+        self.times = array("d", [t for t, _ in pairs])
+        self.values = array("d", [v for _, v in pairs])
+        # (lo, hi, sorted values[lo:hi]) of the last baseline window
+        self._baseline = None
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self):
+        size = (self.times.itemsize + self.values.itemsize) * len(self.times)
+        if self._baseline is not None:
+            size += self._baseline[2].itemsize * len(self._baseline[2])
+        return size
+
+    def add(self, at, value):
+        """Inserts a result; returns the bytes it added to nbytes."""
+        times = self.times
+        if not times or at >= times[-1]:
+            i = len(times)
+            times.append(at)
+            self.values.append(value)
+        else:
+            i = bisect.bisect_right(times, at)
+            times.insert(i, at)
+            self.values.insert(i, value)
+
+        # Keep the cached window pointing at the same results
+        added = times.itemsize + self.values.itemsize
+        if self._baseline is not None:
+            lo, hi, ordered = self._baseline
+            if i <= lo:
+                self._baseline = (lo + 1, hi + 1, ordered)
+            elif i < hi:
+                bisect.insort(ordered, value)
+                self._baseline = (lo, hi + 1, ordered)
+                added += ordered.itemsize
+        return added
+
+    def _window(self, start, end):
+        lo = bisect.bisect_left(self.times, start)
+        hi = bisect.bisect_right(self.times, end)
+        return lo, hi
+
+    def between(self, start, end):
+        """Values with start <= time <= end, in time order."""
+        lo, hi = self._window(start, end)
+        return self.values[lo:hi]
+
+    def _sorted_between(self, start, end):
+        lo, hi = self._window(start, end)
+        cached = self._baseline
+        if cached is not None and cached[0] <= lo < cached[1] and cached[1] <= hi:
+            old_lo, old_hi, ordered = cached
+            for value in self.values[old_lo:lo]:
+                del ordered[bisect.bisect_left(ordered, value)]
+            for value in self.values[old_hi:hi]:
+                bisect.insort(ordered, value)
+        else:
+            ordered = array("d", sorted(self.values[lo:hi]))
+        self._baseline = (lo, hi, ordered)
+        return ordered
+
+    def features(self, at, latest):
+        """Reference values for a result of `latest` taken at `at`, from
+        the results recorded before it (call before adding it).
+
+        baseline is the lower of the two reference values; ratio is
+        latest / baseline, None when neither window has a result.
+        """
+        recent = self.between(at - RECENT_WINDOW, at)
+        older = self._sorted_between(at - BASELINE_WINDOW[1], at - BASELINE_WINDOW[0])
+
+        min_48h = min(recent) if recent else None
+        median_7_365d = _median(older) if older else None
+        references = [v for v in (min_48h, median_7_365d) if v is not None]
+        baseline = min(references) if references else None
+        return {
+            "min_48h": min_48h,
+            "median_7_365d": median_7_365d,
+            "baseline": baseline,
+            "ratio": latest / baseline if baseline and baseline > 0 else None,
+        }
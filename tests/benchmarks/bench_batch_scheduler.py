@@ -0,0 +1,49 @@
+"""Throughput: per-row AKIDetector.predict vs. the micro-batching scheduler.
+
+    python tests/benchmarks/bench_batch_scheduler.py
+"""
+import os
+import sys
+import time
+import warnings
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+warnings.filterwarnings("ignore")
+from src.aki_detector import AKIDetector  # noqa: E402
+from src.batch_scheduler import BatchScheduler  # noqa: E402
+
+
+def lab_entries(n):
+    rng = np.random.default_rng(0)
+    values = rng.uniform(40, 400, (n, 5))
+    return [
+        {"sex": int(i % 2), "mean": v[0], "min": v[1], "max": v[2], "median": v[3], "std": v[4], "count": 5}
+        for i, v in enumerate(values)
+    ]
+
+
+def main(n=20000):
+    detector = AKIDetector()
+    entries = lab_entries(n)
+
+    started = time.perf_counter()
+    for entry in entries:
+        detector.predict(entry)
+    per_row = n / (time.perf_counter() - started)
+    print(f"{'per-row predict':<32} {per_row:>10.0f} predictions/s")
+
+    for max_batch, wait_ms in ((16, 1), (64, 2), (256, 5)):
+        scheduler = BatchScheduler(detector, max_batch=max_batch, max_wait_ms=wait_ms)
+        started = time.perf_counter()
+        futures = [scheduler.submit(entry) for entry in entries]
+        scheduler.join()
+        rate = n / (time.perf_counter() - started)
+        assert all(f.done() for f in futures)
+        stats = scheduler.stats()
+        print(f"{f'scheduler batch={max_batch} wait={wait_ms}ms':<32} {rate:>10.0f} predictions/s "
+              f"({rate / per_row:.1f}x, mean batch {stats['mean_batch']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""End-to-end benchmark: simulator -> src.main -> pager, as subprocesses.
+
+Generates (or reuses) an MLLP message file, starts timed_simulator.py and
+`python -m src.main` against it with a fresh STATE_DIR, waits until every
+message is ACKed and pages stop arriving, then reports JSON:
+
+    messages_per_sec   sustained rate from first send to last ACK
+    ack_rtt_ms         p50/p99/max send -> ACK round trip
+    lab_to_page_ms     p50/p99/max from sending a lab to its page arriving
+    peak_rss_mb        src.main's VmHWM (Linux only)
+
+Environment variables not set by the harness (GROUP_COMMIT_MS,
+INGEST_PIPELINE, ...) pass through to src.main, so configurations can be
+compared run against run:
+
+    python tests/benchmarks/bench_e2e.py --count 100000 --output run.json
+    INGEST_PIPELINE=1 python tests/benchmarks/bench_e2e.py --count 100000 --output pipeline.json
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return None
+    samples = np.asarray(samples_ms)
+    return {
+        "p50": round(float(np.percentile(samples, 50)), 3),
+        "p99": round(float(np.percentile(samples, 99)), 3),
+        "max": round(float(samples.max()), 3),
+        "count": len(samples),
+    }
+
+
+def peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def wait_for(path, process, timeout):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if process.poll() is not None:
+            raise RuntimeError(f"src.main exited early with code {process.returncode}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Not every message was ACKed within {timeout}s")
+        time.sleep(0.2)
+
+
+def summarise(timings, count):
+    acks = timings["acks"]
+    first_sent = min(sent for sent, _ in acks)
+    last_acked = max(acked for _, acked in acks)
+    labs, pages = timings["labs"], timings["pages"]
+    return {
+        "messages": count,
+        "duration_s": round(last_acked - first_sent, 3),
+        "messages_per_sec": round(count / (last_acked - first_sent), 1),
+        "ack_rtt_ms": percentiles([(acked - sent) * 1000 for sent, acked in acks]),
+        "pages": len(pages),
+        "lab_to_page_ms": percentiles([
+            (received - labs[payload]) * 1000 for payload, received in pages.items() if payload in labs
+        ]),
+    }
+
+
+def run(args, messages_path, workdir):
+    mllp_port, pager_port = free_port(), free_port()
+    timings_path = os.path.join(workdir, "timings.json")
+    logs = open(os.path.join(workdir, "logs.txt"), "wb")
+
+    simulator = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "timed_simulator.py"), "--timings", timings_path,
+         "--messages", messages_path, "--mllp", str(mllp_port), "--pager", str(pager_port)],
+        cwd=ROOT, stdout=logs, stderr=subprocess.STDOUT,
+    )
+    env = dict(
+        os.environ,
+        MLLP_ADDRESS=f"127.0.0.1:{mllp_port}",
+        PAGER_ADDRESS=f"127.0.0.1:{pager_port}",
+        STATE_DIR=os.path.join(workdir, "state"),
+        HISTORY_PATH=os.path.abspath(args.history),
+        METRICS_PORT=os.environ.get("METRICS_PORT", "0"),
+        PYTHONUNBUFFERED="1",
+    )
+    service = None
+    try:
+        time.sleep(0.5)
+        service = subprocess.Popen(
+            [sys.executable, "-m", "src.main"], cwd=ROOT, env=env, stdout=logs, stderr=subprocess.STDOUT,
+        )
+        wait_for(timings_path + ".done", service, args.timeout)
+        # Let the last pages drain before stopping anything
+        time.sleep(args.drain)
+        rss = peak_rss_mb(service.pid)
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait(10)
+        simulator.terminate()
+        simulator.wait(30)
+        logs.close()
+
+    with open(timings_path) as f:
+        timings = json.load(f)
+    return {**summarise(timings, args.count), "peak_rss_mb": rss}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", default=os.path.join(ROOT, "data", "history.csv"))
+    parser.add_argument("--messages", help="Existing MLLP file (otherwise one is generated)")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--labs-per-admission", type=float, default=4.0)
+    parser.add_argument("--aki-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=3600)
+    parser.add_argument("--drain", type=float, default=3.0, help="Seconds to wait for pages after the last ACK")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    parser.add_argument("--keep", action="store_true", help="Keep the work directory (logs, state)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-e2e-")
+    messages_path = args.messages
+    if messages_path is None:
+        messages_path = os.path.join(workdir, "messages.mllp")
+        subprocess.run(
+            [sys.executable, os.path.join(BENCH_DIR, "gen_messages.py"), "--history", args.history,
+             "--output", messages_path, "--count", str(args.count), "--seed", str(args.seed),
+             "--labs-per-admission", str(args.labs_per_admission), "--aki-rate", str(args.aki_rate)],
+            check=True, stdout=subprocess.DEVNULL,
+        )
+    else:
+        sys.path.append(ROOT)
+        import simulator
+        args.count = len(simulator.read_hl7_messages(messages_path))
+
+    try:
+        report = run(args, messages_path, workdir)
+    finally:
+        if not args.keep:
+            import shutil
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"Work directory: {workdir}", file=sys.stderr)
+
+    report["config"] = {
+        key: value for key, value in os.environ.items()
+        if key in ("GROUP_COMMIT_MS", "INGEST_PIPELINE", "MLLP_CLIENT", "INFERENCE_BATCH_SIZE",
+                   "INFERENCE_BATCH_WAIT_MS", "CASCADE_LOW", "CASCADE_HIGH", "PAGER_OUTBOX", "PAGER_WORKERS",
+                   "PREFETCH", "SHARDS")
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Microbenchmark: hl7.parse path vs. the hand-rolled extractor.
+
+    python tests/benchmarks/bench_hl7_parse.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from src.hl7_scan import extract_fields  # noqa: E402
+from src.processor import Processor  # noqa: E402
+
+MESSAGES = {
+    "ADT^A01": b"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401201630||ADT^A01|||2.5\r"
+               b"PID|1||478237423||ELIZABETH HOLMES||19840203|F\r"
+               b"NK1|1|SUNNY BALWANI|PARTNER\r",
+    "ADT^A03": b"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401221000||ADT^A03|||2.5\r"
+               b"PID|1||478237423\r",
+    "ORU^R01": b"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401201800||ORU^R01|||2.5\r"
+               b"PID|1||478237423\r"
+               b"OBR|1||||||202401202243\r"
+               b"OBX|1|SN|CREATININE||103.4\r",
+}
+
+
+def main(number=20000):
+    processor = Processor(None, None, None)
+    print(f"{'type':<8} {'hl7.parse':>12} {'extractor':>12} {'speedup':>8}")
+    for name, raw in MESSAGES.items():
+        full = timeit.timeit(lambda: processor._parse_message(str(raw, "ascii")), number=number)
+        fast = timeit.timeit(lambda: extract_fields(raw), number=number)
+        print(f"{name:<8} {full / number * 1e6:>10.2f}us {fast / number * 1e6:>10.2f}us {full / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
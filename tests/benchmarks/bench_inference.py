@@ -0,0 +1,53 @@
+"""Microbenchmark: AKIDetector scoring latency.
+
+Compares the old per-row path (one-row DataFrame through the sklearn
+Pipeline) with the compiled NumPy kernel, single and batched.
+
+    python tests/benchmarks/bench_inference.py
+"""
+import os
+import sys
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+warnings.filterwarnings("ignore")
+from src.aki_detector import AKIDetector  # noqa: E402
+
+
+def latencies(fn, rows):
+    out = np.empty(len(rows))
+    for i, row in enumerate(rows):
+        started = time.perf_counter()
+        fn(row)
+        out[i] = time.perf_counter() - started
+    return out * 1e6
+
+
+def report(name, us):
+    print(f"{name:<28} p50 {np.percentile(us, 50):>9.1f}us   p99 {np.percentile(us, 99):>9.1f}us")
+
+
+def main(n=2000):
+    detector = AKIDetector()
+    rng = np.random.default_rng(0)
+    rows = np.column_stack([
+        rng.integers(0, 2, n), rng.uniform(40, 400, (n, 5)), rng.integers(1, 40, n)
+    ]).astype(np.float64)
+
+    report("sklearn Pipeline (DataFrame)",
+           latencies(lambda r: detector.model.predict(pd.DataFrame([r], columns=detector.features)), rows[:500]))
+    report("NumPy kernel, single", latencies(detector.predict_features, rows))
+
+    for batch in (32, 256):
+        started = time.perf_counter()
+        for i in range(0, n, batch):
+            detector.predict_features(rows[i:i + batch])
+        per_row = (time.perf_counter() - started) / n * 1e6
+        print(f"{f'NumPy kernel, batch {batch}':<28} {per_row:>13.1f}us per row")
+
+
+if __name__ == "__main__":
+    main()
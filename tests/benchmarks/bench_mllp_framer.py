@@ -0,0 +1,95 @@
+"""Microbenchmark: MLLP framing of multi-megabyte bursts.
+
+Compares the old bytes-concatenation loop from MMLPClient._listen with
+MLLPFramer. Run from the repository root:
+
+    python tests/benchmarks/bench_mllp_framer.py
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from src.mllp_framer import MLLPFramer  # noqa: E402
+
+MESSAGE = (
+    b"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401201800||ORU^R01|||2.5\r"
+    b"PID|1||478237423\r"
+    b"OBR|1||||||202401202243\r"
+    b"OBX|1|SN|CREATININE||103.4\r"
+)
+FRAME = b"\x0b" + MESSAGE + b"\x1c\x0d"
+
+
+class BurstSocket:
+    """Serves a pre-built byte stream in recv-sized pieces."""
+
+    def __init__(self, data):
+        self.view = memoryview(data)
+        self.pos = 0
+
+    def recv(self, size):
+        chunk = self.view[self.pos:self.pos + size]
+        self.pos += len(chunk)
+        return bytes(chunk)
+
+    def recv_into(self, buffer):
+        chunk = self.view[self.pos:self.pos + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self.pos += len(chunk)
+        return len(chunk)
+
+
+def legacy_frames(sock, recv_size):
+    # Verbatim framing loop of the original MMLPClient._listen
+    buffer = b""
+    count = 0
+    while True:
+        chunk = sock.recv(recv_size)
+        if not chunk:
+            return count
+        buffer += chunk
+        while True:
+            start = buffer.find(b"\x0b")
+            end = buffer.find(b"\x1c")
+            if start == -1 or end == -1:
+                break
+            payload = buffer[start + 1:end]
+            buffer = buffer[end + 2:]
+            payload.decode("ascii")
+            count += 1
+
+
+def framer_frames(sock, recv_size):
+    framer = MLLPFramer(recv_size)
+    count = 0
+    while framer.recv_into(sock):
+        for payload in framer.frames():
+            str(payload, "ascii")
+            count += 1
+    return count
+
+
+def timed(fn, data, recv_size):
+    started = time.perf_counter()
+    count = fn(BurstSocket(data), recv_size)
+    return time.perf_counter() - started, count
+
+
+def main():
+    print(f"{'burst':>8} {'frames':>8} {'legacy 1K':>10} {'legacy 1M':>10} {'framer 64K':>11} {'framer MB/s':>12}")
+    for megabytes in (1, 2, 4, 8):
+        data = FRAME * (megabytes * 1024 * 1024 // len(FRAME))
+        legacy_small, expected = timed(legacy_frames, data, 1024)
+        # A large recv leaves many frames in the buffer: the quadratic case
+        legacy_large, _ = timed(legacy_frames, data, 1024 * 1024)
+        framer, count = timed(framer_frames, data, 65536)
+        assert count == expected
+        print(
+            f"{megabytes:>6}MB {count:>8} {legacy_small:>9.3f}s {legacy_large:>9.3f}s "
+            f"{framer:>10.3f}s {len(data) / framer / 1e6:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Throughput of SHARDS=N sharded processing against N.
+
+Generates messages (gen_messages.generate), then for each N starts a
+ShardRouter with the service's real worker (src.main.run_shard) on a fresh
+STATE_DIR and pushes every message through it, keeping up to --window
+messages in flight (a lockstep MLLP feed is --window 1; several feeds or
+a pipelining sender are more). Start-up is not timed. Reports JSON:
+
+    {"cpus": ..., "results": {"1": {"messages_per_sec": ...}, "2": ...}}
+
+Scaling needs as many free cores as shards: on a single core the workers
+only add IPC overhead.
+
+    python tests/benchmarks/bench_shards.py --count 20000 --shards 1,2,4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+warnings.filterwarnings("ignore")
+from gen_messages import generate, patient_means  # noqa: E402
+from src.main import run_shard  # noqa: E402
+from src.shards import ShardRouter, check_layout  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def run(messages, shards, window):
+    workdir = tempfile.mkdtemp(prefix=f"bench-shards-{shards}-")
+    os.environ["STATE_DIR"] = workdir
+    check_layout(workdir, shards)
+    router = ShardRouter(shards, run_shard)
+    slots = threading.BoundedSemaphore(window)
+    failed = []
+
+    def on_done(error):
+        if error is not None:
+            failed.append(error)
+        slots.release()
+
+    try:
+        started = time.perf_counter()
+        for message in messages:
+            slots.acquire()
+            router.submit(message, on_done)
+        router.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        router.close()
+    return {
+        "messages": len(messages),
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(len(messages) / elapsed, 1),
+        "failed": len(failed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", default=os.path.join(ROOT, "data", "history.csv"))
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--shards", default="1,2,4")
+    parser.add_argument("--window", type=int, default=256, help="Messages in flight at once")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    os.environ["HISTORY_PATH"] = os.path.abspath(args.history)
+    # Pages stay in the outbox; nothing listens here
+    os.environ.setdefault("PAGER_ADDRESS", "http://127.0.0.1:9/page")
+    means = patient_means(args.history)
+    # Workers get the payload, as from MLLPFramer
+    messages = [frame[1:-2] for frame in generate(means, args.count, seed=args.seed)]
+
+    results = {}
+    for shards in (int(n) for n in args.shards.split(",")):
+        results[str(shards)] = run(messages, shards, args.window)
+        print(f"SHARDS={shards}: {results[str(shards)]}", file=sys.stderr)
+
+    report = {"cpus": os.cpu_count(), "window": args.window, "results": results}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Offline evaluation: RuleCascade in front of the SVC vs. the SVC alone.
+
+Replays creatinine results in arrival order, the way the Processor sees
+them, and pages a patient the first time a result is called AKI. Patients
+listed in aki.csv are the positives. Reports recall/precision against
+aki.csv, how many of the model's own pages the cascade keeps, and the
+share of results the model still has to score, for a few bands. The
+cascade's ratio comes from the same 48 hour / 7-365 day windows
+(Timeline.features) the service uses, on each result's clinical time.
+
+With --messages (the simulator's MLLP file) history.csv only seeds the
+baselines and the live ORU^R01 results are scored, which is where the
+aki.csv events are. Without it every history.csv result is scored in turn;
+history.csv carries no sex, so that replay runs once per value.
+
+    python tests/benchmarks/eval_cascade.py [--messages messages.mllp]
+"""
+import argparse
+import bisect
+import math
+import os
+import sys
+import time
+import warnings
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+warnings.filterwarnings("ignore")
+from src.aki_detector import AKIDetector  # noqa: E402
+from src.cascade import RuleCascade  # noqa: E402
+from src.history_loader import read_history  # noqa: E402
+from src.hl7_scan import extract_fields  # noqa: E402
+from src.mllp_framer import MLLPFramer  # noqa: E402
+from src.window_features import Timeline, hl7_timestamp  # noqa: E402
+
+BANDS = [(0.7, 1.5), (1.0, 1.5), (1.0, 2.0), (1.1, 2.0), (1.2, 2.0), (1.3, 3.0)]
+
+
+class Series:
+    """Per-patient sorted results plus running sums, as State keeps them,
+    and the results in clinical time order for the cascade's windows."""
+
+    def __init__(self):
+        self.results, self.total, self.total_sq = [], 0.0, 0.0
+        self.timeline = Timeline()
+
+    def add(self, value, at):
+        bisect.insort(self.results, value)
+        self.total += value
+        self.total_sq += value * value
+        self.timeline.add(at, value)
+
+    def step(self, value, at, sex):
+        """Records a result and returns its labs, as Processor builds them:
+        window features from the results before it, aggregates after it."""
+        window = self.timeline.features(at, value)
+        self.add(value, at)
+        labs = self.labs(sex)
+        labs.update(window)
+        return labs
+
+    def labs(self, sex):
+        series, count = self.results, len(self.results)
+        mean = self.total / count
+        middle = count // 2
+        return {
+            "sex": sex, "min": series[0], "max": series[-1], "mean": mean,
+            "median": series[middle] if count % 2 else (series[middle - 1] + series[middle]) / 2,
+            "std": math.sqrt(max(self.total_sq / count - mean * mean, 0.0)),
+            "count": count, "results": list(series),
+        }
+
+
+def history_rows(path):
+    rows = pd.concat(
+        pd.DataFrame({"mrn": mrns, "timestamp": pd.to_datetime(timestamps), "value": values})
+        for mrns, timestamps, values in read_history(path)
+    )
+    return rows.sort_values(["mrn", "timestamp"], kind="stable")
+
+
+def replay_history(path, sex):
+    """(mrn, latest, labs) for every history.csv result."""
+    patients = {}
+    for row in history_rows(path).itertuples(index=False):
+        series = patients.setdefault(row.mrn, Series())
+        yield row.mrn, row.value, series.step(row.value, row.timestamp.timestamp(), sex)
+
+
+def replay_messages(messages, history_path):
+    """(mrn, latest, labs) for every live creatinine result of an admitted patient."""
+    patients = {}
+    for row in history_rows(history_path).itertuples(index=False):
+        patients.setdefault(row.mrn, Series()).add(row.value, row.timestamp.timestamp())
+
+    framer = MLLPFramer()
+    with open(messages, "rb") as f:
+        framer.feed(f.read())
+
+    sexes = {}
+    for frame in framer.frames():
+        message = extract_fields(bytes(frame))
+        if not message:
+            continue
+        mrn = message["mrn"]
+        if message["type"] == "ADT^A01":
+            sexes[mrn] = 0 if message.get("sex") == "F" else 1
+        elif message["type"] == "ADT^A03":
+            sexes.pop(mrn, None)
+        elif message.get("is_creatinine") and mrn in sexes:
+            # OBR-7, falling back to now like Processor
+            at = hl7_timestamp(message.get("time"))
+            if at is None:
+                at = time.time()
+            series = patients.setdefault(mrn, Series())
+            yield mrn, message["result"], series.step(message["result"], at, sexes[mrn])
+
+
+def evaluate(steps, model_calls, positives, cascade=None):
+    paged = set()
+    scored = 0
+    for (mrn, latest, labs), model_says in zip(steps, model_calls):
+        if mrn in paged:
+            if cascade is not None:
+                cascade.skip_paged()
+            continue
+        decision = cascade.decide(latest, labs) if cascade is not None else None
+        if decision is None:
+            scored += 1
+            decision = model_says
+        if decision:
+            paged.add(mrn)
+    return paged, scored
+
+
+def report(name, steps, detector, positives):
+    model_calls = detector.predict_batch([labs for _, _, labs in steps])
+    model_paged, model_scored = evaluate(steps, model_calls, positives)
+
+    def line(label, paged, scored, extra=""):
+        hits = len(paged & positives)
+        kept = len(paged & model_paged) / len(model_paged) if model_paged else 1.0
+        print(f"  {label:<18} recall {hits / len(positives) if positives else 0:.3f}"
+              f"  precision {hits / len(paged) if paged else 0:.3f}"
+              f"  model pages kept {kept:.3f}  model calls {scored}"
+              f" ({1 - scored / model_scored if model_scored else 0:.0%} fewer){extra}")
+
+    print(f"{name}: {len(steps)} results, {len(positives)} aki.csv patients")
+    line("model only", model_paged, model_scored)
+    for low, high in BANDS:
+        cascade = RuleCascade(low, high)
+        paged, scored = evaluate(steps, model_calls, positives, cascade)
+        line(f"cascade [{low}, {high})", paged, scored, f"  {dict(cascade.counts)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", default="data/history.csv")
+    parser.add_argument("--aki", default="aki.csv")
+    parser.add_argument("--messages", help="MLLP file of live messages (simulator format)")
+    args = parser.parse_args()
+
+    detector = AKIDetector()
+    aki = set(pd.read_csv(args.aki, dtype={"mrn": str})["mrn"])
+
+    if args.messages:
+        steps = list(replay_messages(args.messages, args.history))
+        report(args.messages, steps, detector, aki & {mrn for mrn, _, _ in steps})
+        return
+
+    history_mrns = set(history_rows(args.history)["mrn"])
+    for sex in (0, 1):
+        steps = list(replay_history(args.history, sex))
+        report(f"history.csv, sex={sex}", steps, detector, aki & history_mrns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Generates a synthetic MLLP message file for load tests.
+
+Patients are drawn from history.csv. Each admission is an ADT^A01, a run
+of creatinine ORU^R01 results around the patient's historical mean (a
+fraction of admissions spike to trigger AKI) and, usually, an ADT^A03.
+Admissions of many patients are interleaved, like a real feed.
+
+    python tests/benchmarks/gen_messages.py --count 100000 --output /tmp/messages.mllp
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from src.history_loader import read_history  # noqa: E402
+
+START, END = b"\x0b", b"\x1c\r"
+
+
+def patient_means(history_path):
+    totals = {}
+    for mrns, _, values in read_history(history_path):
+        for mrn, value in zip(mrns, values):
+            total, count = totals.get(mrn, (0.0, 0))
+            totals[mrn] = (total + float(value), count + 1)
+    return {mrn: total / count for mrn, (total, count) in totals.items()}
+
+
+def frame(*segments):
+    return START + "\r".join(segments).encode("ascii") + END
+
+
+def msh(clock, message_type):
+    return f"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||{clock:%Y%m%d%H%M%S}||{message_type}|||2.5"
+
+
+def generate(means, count, labs_per_admission=4.0, discharge_rate=0.9, aki_rate=0.1,
+             concurrent=200, seed=0):
+    """Yields `count` framed messages.
+
+    labs_per_admission is the mean number of results per stay; aki_rate
+    is the share of stays whose later results jump to 2-3x baseline.
+    """
+    rng = random.Random(seed)
+    mrns = list(means)
+    clock = datetime.datetime(2024, 6, 1)
+    # mrn -> [labs left, spiking]
+    active = {}
+    produced = 0
+
+    while produced < count:
+        clock += datetime.timedelta(seconds=rng.randint(1, 120))
+
+        if len(active) < concurrent and (not active or rng.random() < 0.3):
+            mrn = rng.choice(mrns)
+            if mrn in active:
+                continue
+            labs = max(1, int(rng.expovariate(1 / labs_per_admission)))
+            active[mrn] = [labs, rng.random() < aki_rate]
+            sex = rng.choice("MF")
+            yield frame(
+                msh(clock, "ADT^A01"),
+                f"PID|1||{mrn}||PATIENT^SYNTHETIC||19700101|{sex}",
+            )
+            produced += 1
+            continue
+
+        mrn = rng.choice(list(active))
+        labs, spiking = active[mrn]
+        if labs > 0:
+            active[mrn][0] -= 1
+            value = means[mrn] * rng.uniform(0.85, 1.15)
+            if spiking and labs <= 2:
+                value *= rng.uniform(2.0, 3.0)
+            yield frame(
+                msh(clock, "ORU^R01"),
+                f"PID|1||{mrn}",
+                f"OBR|1||||||{clock:%Y%m%d%H%M%S}",
+                f"OBX|1|SN|CREATININE||{value:.2f}",
+            )
+        else:
+            del active[mrn]
+            if rng.random() >= discharge_rate:
+                continue
+            yield frame(msh(clock, "ADT^A03"), f"PID|1||{mrn}")
+        produced += 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", default="data/history.csv")
+    parser.add_argument("--output", default="messages.mllp")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--labs-per-admission", type=float, default=4.0)
+    parser.add_argument("--discharge-rate", type=float, default=0.9)
+    parser.add_argument("--aki-rate", type=float, default=0.1)
+    parser.add_argument("--concurrent", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    means = patient_means(args.history)
+    with open(args.output, "wb") as f:
+        for message in generate(
+            means, args.count, args.labs_per_admission, args.discharge_rate,
+            args.aki_rate, args.concurrent, args.seed,
+        ):
+            f.write(message)
+    print(f"Wrote {args.count} messages to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
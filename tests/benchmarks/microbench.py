@@ -0,0 +1,306 @@
+"""Component microbenchmarks with a stored baseline and a regression gate.
+
+Every hot path gets a named benchmark reporting microseconds per operation
+(best of several repeats, so one noisy repeat doesn't count):
+
+    framing.*       MMLPClient._listen over fragmented / coalesced chunks
+    parse.*         Processor._parse_message (hl7.parse) and Processor.parse
+                    (fast path) per message type
+    state.*[N]      State methods with N stored lab rows
+    predict.*       AKIDetector.predict, and predict_batch per row
+
+    python tests/benchmarks/microbench.py run [--filter state] [--sizes 1000,100000]
+    python tests/benchmarks/microbench.py baseline --rounds 3   # writes baseline.json
+    python tests/benchmarks/microbench.py compare --threshold 25
+
+compare re-runs the benchmarks in the baseline and exits 1 if any is more
+than --threshold percent slower. A benchmark that looks slower is measured
+again (--retries) and keeps its best time, so a single noisy run doesn't
+fail the gate. The baseline stores each benchmark's median over --rounds
+runs. Baselines are machine-specific: record one on the machine that runs
+the gate.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+warnings.filterwarnings("ignore")
+from src.mllp_client import MMLPClient  # noqa: E402
+from src.mllp_framer import MLLPFramer  # noqa: E402
+from src.processor import Processor  # noqa: E402
+from src.state import State  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SIZES = (1000, 100000, 1000000)
+
+MESSAGES = {
+    "ADT^A01": b"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401201630||ADT^A01|||2.5\r"
+               b"PID|1||478237423||ELIZABETH HOLMES||19840203|F\r"
+               b"NK1|1|SUNNY BALWANI|PARTNER\r",
+    "ADT^A03": b"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401221000||ADT^A03|||2.5\r"
+               b"PID|1||478237423\r",
+    "ORU^R01": b"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401201800||ORU^R01|||2.5\r"
+               b"PID|1||478237423\r"
+               b"OBR|1||||||202401202243\r"
+               b"OBX|1|SN|CREATININE||103.4\r",
+}
+
+
+def measure(fn, ops=1, repeat=7, min_time=0.05):
+    """Best time per operation in microseconds; fn() performs `ops` operations."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number *= 2
+    best = elapsed
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - started)
+    return best / (number * ops) * 1e6
+
+
+# Framing ------------------------------------------------------------------
+
+class ChunkSocket:
+    """Replays a byte stream in fixed-size recv_into chunks, then EOF."""
+
+    def __init__(self, data, chunk):
+        self.data = memoryview(data)
+        self.chunk = chunk
+        self.pos = 0
+
+    def recv_into(self, buffer):
+        piece = self.data[self.pos:self.pos + min(self.chunk, len(buffer))]
+        buffer[:len(piece)] = piece
+        self.pos += len(piece)
+        return len(piece)
+
+    def send(self, data):
+        return len(data)
+
+
+class NullProcessor:
+    def process(self, message):
+        pass
+
+
+def bench_framing(sizes, wanted):
+    frame = b"\x0b" + MESSAGES["ORU^R01"] + b"\x1c\r"
+    count = 2000
+    stream = frame * count
+    client = MMLPClient(NullProcessor())
+
+    def listen(chunk):
+        def run():
+            client.framer = MLLPFramer()
+            client.sock = ChunkSocket(stream, chunk)
+            try:
+                client._listen()
+            except Exception:
+                pass  # EOF ends the stream
+        return run
+
+    # Frames split over several reads vs. many frames per read
+    yield "framing.fragmented", lambda: measure(listen(37), ops=count)
+    yield "framing.coalesced", lambda: measure(listen(65536), ops=count)
+
+
+# Parsing ------------------------------------------------------------------
+
+class UnseenState:
+    def is_processed(self, message_id):
+        return False
+
+
+def bench_parse(sizes, wanted):
+    processor = Processor(UnseenState(), None, None)
+    for name, raw in MESSAGES.items():
+        text = str(raw, "ascii")
+        yield f"parse.hl7[{name}]", lambda: measure(lambda: processor._parse_message(text))
+        yield f"parse.fast[{name}]", lambda: measure(lambda: processor.parse(raw))
+
+
+# State --------------------------------------------------------------------
+
+def seeded_state(path, rows, probes=1000):
+    """State with `rows` lab results over rows/10 patients; the first
+    `probes` patients are admitted."""
+    state = State(db_path=path)
+    patients = max(rows // 10, probes)
+    rng = random.Random(0)
+    batch = []
+    stats = {}
+    for i in range(rows):
+        mrn = str(100000000 + i % patients)
+        value = rng.uniform(50, 200)
+        batch.append((mrn, value, "2024-01-01 00:00:00"))
+        count, total, total_sq, low, high = stats.get(mrn, (0, 0.0, 0.0, value, value))
+        stats[mrn] = (count + 1, total + value, total_sq + value * value, min(low, value), max(high, value))
+        if len(batch) == 100000:
+            state.bulk_add_creatinine(batch, [(m, *s) for m, s in stats.items()])
+            batch, stats = [], {}
+    if batch:
+        state.bulk_add_creatinine(batch, [(m, *s) for m, s in stats.items()])
+
+    mrns = [str(100000000 + i) for i in range(probes)]
+    with state.transaction():
+        for mrn in mrns:
+            state.admit(mrn, "F")
+        for i in range(rows):
+            state.mark_processed(f"seed-{i}")
+    return state, mrns
+
+
+STATE_BENCHMARKS = (
+    "get_lab_history", "has_patient", "has_paged_patient", "is_processed", "add_creatinine", "mark_processed",
+)
+
+
+def bench_state(sizes, wanted):
+    for rows in sizes:
+        names = {method: f"state.{method}[{rows}]" for method in STATE_BENCHMARKS}
+        if not any(wanted(name) for name in names.values()):
+            continue  # seeding 10^6 rows takes a while
+
+        with tempfile.TemporaryDirectory() as tmp:
+            state, mrns = seeded_state(os.path.join(tmp, "bench.db"), rows)
+            cycle = iter(range(10 ** 12))
+
+            def next_mrn():
+                return mrns[next(cycle) % len(mrns)]
+
+            def add():
+                with state.transaction():
+                    state.add_creatinine(next_mrn(), 120.0)
+
+            def mark():
+                with state.transaction():
+                    state.mark_processed(f"new-{next(cycle)}")
+
+            calls = {
+                "get_lab_history": lambda: state.get_lab_history(next_mrn()),
+                "has_patient": lambda: state.has_patient(next_mrn()),
+                "has_paged_patient": lambda: state.has_paged_patient(next_mrn()),
+                "is_processed": lambda: state.is_processed(f"seed-{next(cycle) % rows}"),
+                "add_creatinine": add,
+                "mark_processed": mark,
+            }
+            for method, name in names.items():
+                yield name, lambda fn=calls[method]: measure(fn)
+            state.close()
+
+
+# Inference ----------------------------------------------------------------
+
+def bench_predict(sizes, wanted):
+    from src.aki_detector import AKIDetector
+
+    detector = AKIDetector()
+    rng = random.Random(0)
+    entries = [
+        {"sex": i % 2, "mean": rng.uniform(50, 300), "min": rng.uniform(40, 100), "max": rng.uniform(100, 400),
+         "median": rng.uniform(50, 300), "std": rng.uniform(0, 50), "count": rng.randint(1, 30)}
+        for i in range(256)
+    ]
+    yield "predict.single", lambda: measure(lambda: detector.predict(entries[0]))
+    for size in (32, 256):
+        batch = entries[:size]
+        yield f"predict.batch[{size}]", lambda: measure(lambda: detector.predict_batch(batch), ops=size)
+
+
+SUITES = (bench_framing, bench_parse, bench_state, bench_predict)
+
+
+def run(name_filter=None, sizes=SIZES, only=None):
+    def wanted(name):
+        return (not name_filter or name_filter in name) and (only is None or name in only)
+
+    results = {}
+    for suite in SUITES:
+        # Suites yield (name, thunk) so skipped benchmarks never run
+        for name, bench in suite(sizes, wanted):
+            if not wanted(name):
+                continue
+            us = bench()
+            results[name] = round(us, 3)
+            print(f"{name:<36} {us:>12.3f} us/op", file=sys.stderr)
+    return results
+
+
+def compare(baseline, current, threshold):
+    """Rows of (name, baseline, current, change %, regressed)."""
+    rows = []
+    for name, before in sorted(baseline.items()):
+        after = current.get(name)
+        if after is None:
+            continue
+        change = (after - before) / before * 100
+        rows.append((name, before, after, change, change > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=("run", "baseline", "compare"))
+    parser.add_argument("--filter", help="Only benchmarks whose name contains this")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="State sizes (stored lab rows)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--output", help="Where `run` writes its results (JSON)")
+    parser.add_argument("--threshold", type=float, default=25.0, help="Allowed slowdown in percent")
+    parser.add_argument("--retries", type=int, default=2, help="Re-measurements of suspected regressions")
+    parser.add_argument("--rounds", type=int, default=3, help="Runs whose median `baseline` stores")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)["benchmarks"]
+        current = run(args.filter, sizes, only=set(baseline))
+        for _ in range(args.retries):
+            suspects = {row[0] for row in compare(baseline, current, args.threshold) if row[4]}
+            if not suspects:
+                break
+            for name, us in run(sizes=sizes, only=suspects).items():
+                current[name] = min(current[name], us)
+        rows = compare(baseline, current, args.threshold)
+        print(f"{'benchmark':<36} {'baseline':>10} {'current':>10} {'change':>8}")
+        for name, before, after, change, regressed in rows:
+            flag = "  REGRESSED" if regressed else ""
+            print(f"{name:<36} {before:>10.3f} {after:>10.3f} {change:>+7.1f}%{flag}")
+        regressions = [row for row in rows if row[4]]
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) more than {args.threshold:.0f}% slower than the baseline")
+            sys.exit(1)
+        return
+
+    rounds = [run(args.filter, sizes) for _ in range(args.rounds if args.command == "baseline" else 1)]
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": {name: round(statistics.median(r[name] for r in rounds), 3) for name in rounds[0]},
+    }
+    output = args.baseline if args.command == "baseline" else args.output
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
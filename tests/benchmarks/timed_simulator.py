@@ -0,0 +1,89 @@
+"""simulator.py with timestamps, for bench_e2e.py.
+
+Runs the unmodified simulator main() but wraps the MLLP client socket and
+the pager handler to record when each message was sent, when its ACK came
+back and when each page arrived. Writes them as JSON to --timings when
+the simulator shuts down (SIGTERM), and touches --timings.done once every
+message has been ACKed. The simulator replays the whole file to every new
+connection, so only the first full pass is timed.
+
+    python tests/benchmarks/timed_simulator.py --timings t.json --messages m.mllp --mllp 8440 --pager 8441
+"""
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+import simulator  # noqa: E402
+
+
+class TimedSocket:
+    """Proxy for the accepted MLLP socket recording send/ACK times."""
+
+    def __init__(self, sock, timings):
+        self._sock = sock
+        self._timings = timings
+        self._sent_at = None
+
+    def sendall(self, data):
+        self._sent_at = time.perf_counter()
+        if b"ORU^R01" in data:
+            # Key labs like their page payload: "mrn,OBR-7"
+            segments = data.split(b"\r")
+            mrn = segments[1].split(b"|")[3]
+            observed = segments[2].split(b"|")[7]
+            self._timings["labs"].setdefault(f"{mrn.decode()},{observed.decode()}", self._sent_at)
+        return self._sock.sendall(data)
+
+    def recv(self, size):
+        data = self._sock.recv(size)
+        if data and self._sent_at is not None:
+            now = time.perf_counter()
+            self._timings["acks"].append((self._sent_at, now))
+            self._sent_at = None
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def main():
+    timings_path = sys.argv[sys.argv.index("--timings") + 1]
+    del sys.argv[sys.argv.index("--timings"):sys.argv.index("--timings") + 2]
+
+    timings = {"acks": [], "labs": {}, "pages": {}}
+    lock = threading.Lock()
+    serve = simulator.serve_mllp_client
+
+    def timed_serve(client, source, messages, shutdown_mllp, short_messages):
+        if os.path.exists(timings_path + ".done"):
+            return serve(client, source, messages, shutdown_mllp, short_messages)
+        serve(TimedSocket(client, timings), source, messages, shutdown_mllp, short_messages)
+        if len(timings["acks"]) >= len(messages):
+            open(timings_path + ".done", "w").close()
+
+    handle_page = simulator.PagerRequestHandler.do_POST_page
+
+    def timed_page(handler):
+        received = time.perf_counter()
+        length = int(handler.headers.get("Content-Length", 0))
+        body = handler.rfile.read(length)
+        handler.rfile = io.BytesIO(body)
+        with lock:
+            timings["pages"].setdefault(body.decode("ascii", "replace"), received)
+        handle_page(handler)
+
+    simulator.serve_mllp_client = timed_serve
+    simulator.PagerRequestHandler.do_POST_page = timed_page
+    try:
+        simulator.main()
+    finally:
+        with open(timings_path, "w") as f:
+            json.dump(timings, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.aki_detector import AKIDetector  # noqa: E402
+from src.history_loader import read_history  # noqa: E402
+
+HISTORY = os.path.join(os.path.dirname(__file__), "..", "data", "history.csv")
+
+
+@pytest.fixture(scope="module")
+def detector():
+    return AKIDetector()
+
+
+@pytest.fixture(scope="module")
+def history_features(detector):
+    """One feature row per history.csv patient, for each sex."""
+    frames = []
+    for mrns, _, values in read_history(HISTORY):
+        frames.append(pd.DataFrame({"mrn": mrns, "value": values}))
+    grouped = pd.concat(frames).groupby("mrn")["value"]
+    stats = pd.DataFrame({
+        "creatinine_mean": grouped.mean(),
+        "creatinine_min": grouped.min(),
+        "creatinine_max": grouped.max(),
+        "creatinine_median": grouped.median(),
+        "creatinine_std": grouped.std(ddof=0),
+        "creatinine_count": grouped.count(),
+    })
+    rows = pd.concat([stats.assign(sex=0), stats.assign(sex=1)], ignore_index=True)
+    return rows[detector.features]
+
+
+def test_kernel_matches_sklearn_on_every_history_patient(detector, history_features):
+    assert detector.kernel is not None
+
+    expected = detector.model.predict(history_features).astype(bool)
+    actual = detector.predict_features(history_features.to_numpy())
+
+    assert len(actual) == 4400
+    assert (actual == expected).all()
+    np.testing.assert_allclose(
+        detector.kernel.decision_function(history_features.to_numpy()),
+        detector.model.decision_function(history_features),
+        atol=1e-9,
+    )
+
+
+def test_predict_single_lab_entry(detector):
+    lab_entry = {
+        "sex": 1, "min": 183.61, "mean": 216.39, "max": 392.63,
+        "median": 201.03, "std": 54.22, "count": 12,
+    }
+    row = pd.DataFrame([detector.feature_vector(lab_entry)], columns=detector.features)
+
+    assert detector.predict(lab_entry) == bool(detector.model.predict(row)[0])
+
+
+def test_sklearn_fallback_without_kernel(detector, history_features):
+    fallback = AKIDetector.__new__(AKIDetector)
+    fallback.model = detector.model
+    fallback.features = detector.features
+    fallback.kernel = None
+
+    batch = history_features.to_numpy()[:50]
+    assert (fallback.predict_features(batch) == detector.predict_features(batch)).all()
+
+
+def test_predict_batch_matches_single_predictions(detector, history_features):
+    entries = [
+        {"sex": r.sex, "mean": r.creatinine_mean, "min": r.creatinine_min, "max": r.creatinine_max,
+         "median": r.creatinine_median, "std": r.creatinine_std, "count": r.creatinine_count}
+        for r in history_features.head(200).itertuples()
+    ]
+
+    assert detector.predict_batch(entries) == [detector.predict(e) for e in entries]
+    assert detector.predict_batch([]) == []
@@ -0,0 +1,104 @@
+import sys
+import os
+import socket
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.async_mllp_client import AsyncMLLPClient  # noqa: E402
+from src.mllp_client import backoff_delay, parse_addresses  # noqa: E402
+from src.pipeline import Pipeline  # noqa: E402
+
+
+class RecordingProcessor:
+    def __init__(self):
+        self.seen = []
+        self.lock = threading.Lock()
+
+    def process(self, hl7_message):
+        with self.lock:
+            self.seen.append(bytes(hl7_message).decode("ascii"))
+
+    def parse(self, hl7_message):
+        return hl7_message
+
+    def apply(self, parsed):
+        self.process(parsed)
+
+    def wait_durable(self):
+        pass
+
+
+def frame(msg: str) -> bytes:
+    return b"\x0b" + msg.encode("ascii") + b"\x1c\x0d"
+
+
+class FeedServer:
+    """Sends each message and waits for its ACK, like the simulator."""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.acks = 0
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        client, _ = self.listener.accept()
+        with client:
+            for message in self.messages:
+                client.sendall(frame(message))
+                received = b""
+                while not received.endswith(b"\x1c\x0d"):
+                    received += client.recv(1024)
+                if b"MSA|AA" in received:
+                    self.acks += 1
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def run_feeds(pipeline_factory):
+    pas = FeedServer([f"MSH|PAS{i}\r" for i in range(5)])
+    lims = FeedServer([f"MSH|LIMS{i}\r" for i in range(5)])
+    processor = RecordingProcessor()
+    pipeline = pipeline_factory(processor)
+
+    client = AsyncMLLPClient(
+        processor,
+        pipeline=pipeline,
+        addresses=[("127.0.0.1", pas.port), ("127.0.0.1", lims.port)],
+    )
+    client.start()
+
+    assert wait_for(lambda: pas.acks == 5 and lims.acks == 5)
+    client.running = False
+    return processor.seen
+
+
+def test_multiple_feeds_are_framed_and_acked_independently():
+    seen = run_feeds(lambda processor: None)
+
+    assert [m for m in seen if "PAS" in m] == [f"MSH|PAS{i}\r" for i in range(5)]
+    assert [m for m in seen if "LIMS" in m] == [f"MSH|LIMS{i}\r" for i in range(5)]
+
+
+def test_multiple_feeds_share_one_pipeline():
+    seen = run_feeds(lambda processor: Pipeline(processor))
+
+    assert sorted(seen) == sorted([f"MSH|PAS{i}\r" for i in range(5)] + [f"MSH|LIMS{i}\r" for i in range(5)])
+
+
+def test_parse_addresses_and_backoff():
+    assert parse_addresses("pas:8440, lims:8442,localhost") == [
+        ("pas", 8440), ("lims", 8442), ("localhost", 8440)
+    ]
+    assert all(0 <= backoff_delay(n) <= min(30.0, 0.5 * 2 ** n) for n in range(12))
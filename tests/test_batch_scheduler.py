@@ -0,0 +1,112 @@
+import sys
+import os
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.batch_scheduler import BatchScheduler  # noqa: E402
+from src.processor import Processor  # noqa: E402
+from src.state import State  # noqa: E402
+
+
+class ThresholdDetector:
+    """AKI when the latest mean exceeds 150; records batch sizes."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def feature_vector(self, lab_entry):
+        return [lab_entry["mean"]]
+
+    def predict_features(self, X):
+        X = np.asarray(X)
+        self.batch_sizes.append(len(X))
+        return X[:, 0] > 150
+
+
+class RecordingHttp:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, payload):
+        self.sent.append(payload)
+
+
+def test_futures_resolve_in_batches():
+    detector = ThresholdDetector()
+    scheduler = BatchScheduler(detector, max_batch=16, max_wait_ms=50)
+
+    futures = [scheduler.submit({"mean": float(v)}) for v in range(100, 200)]
+    scheduler.join()
+
+    assert [f.result() for f in futures] == [v > 150 for v in range(100, 200)]
+    assert sum(detector.batch_sizes) == 100
+    assert max(detector.batch_sizes) == 16
+    assert scheduler.stats()["batches"] < 100
+
+
+def test_processor_pages_in_order_from_batched_predictions(tmp_path):
+    state = State(db_path=str(tmp_path / "test_batched.db"))
+    http = RecordingHttp()
+    scheduler = BatchScheduler(ThresholdDetector(), max_batch=8, max_wait_ms=20)
+    processor = Processor(state, None, http, scheduler=scheduler)
+
+    for mrn in ("1", "2", "3"):
+        processor._handle_message({"type": "ADT^A01", "mrn": mrn, "sex": "F"})
+    for mrn, value, time in [("1", 200.0, "T1"), ("2", 90.0, "T2"), ("3", 300.0, "T3"), ("1", 250.0, "T4")]:
+        processor._handle_message({
+            "type": "ORU^R01", "mrn": mrn, "is_creatinine": True, "result": value, "time": time,
+        })
+    processor.flush()
+
+    # Patient 1 is paged once per admission, patient 2 never
+    assert http.sent == ["1,T1", "3,T3"]
+    assert state.has_paged_patient("1") and not state.has_paged_patient("2")
+
+
+def test_flush_scores_without_waiting_for_the_batch():
+    scheduler = BatchScheduler(ThresholdDetector(), max_batch=16, max_wait_ms=10000)
+    future = scheduler.submit({"mean": 200.0})
+    scheduler.flush()
+
+    assert future.result(timeout=5) is True
+
+
+class SlowDetector(ThresholdDetector):
+    def predict_features(self, X):
+        time.sleep(0.05)
+        return super().predict_features(X)
+
+
+def test_pages_commit_with_the_message(tmp_path):
+    state = State(db_path=str(tmp_path / "test_batched.db"))
+    http = RecordingHttp()
+    processor = Processor(state, None, http, scheduler=BatchScheduler(SlowDetector(), max_wait_ms=1000))
+
+    processor.apply({"msg_id": "m1", "type": "ADT^A01", "mrn": "1", "sex": "F"})
+    processor.apply({"msg_id": "m2", "type": "ORU^R01", "mrn": "1", "is_creatinine": True, "result": 200.0, "time": "T1"})
+
+    # Decided before apply() returned, not later on the scheduler thread
+    assert http.sent == ["1,T1"]
+    assert state.has_paged_patient("1")
+
+
+def test_late_decision_never_pages_a_readmission(tmp_path):
+    state = State(db_path=str(tmp_path / "test_batched.db"))
+    http = RecordingHttp()
+    processor = Processor(state, None, http, scheduler=BatchScheduler(SlowDetector(), max_wait_ms=20))
+
+    processor._handle_message({"type": "ADT^A01", "mrn": "1", "sex": "F"})
+    processor._handle_message({"type": "ORU^R01", "mrn": "1", "is_creatinine": True, "result": 200.0, "time": "T1"})
+    processor._handle_message({"type": "ADT^A03", "mrn": "1"})
+    processor._handle_message({"type": "ADT^A01", "mrn": "1", "sex": "F"})
+    processor.flush()
+
+    # The first admission's AKI doesn't mark the second one paged...
+    assert not state.has_paged_patient("1")
+    processor._handle_message({"type": "ORU^R01", "mrn": "1", "is_creatinine": True, "result": 250.0, "time": "T2"})
+    processor.flush()
+
+    # ...so its own AKI still pages
+    assert http.sent[-1] == "1,T2"
+    assert state.has_paged_patient("1")
@@ -0,0 +1,79 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.cascade import RuleCascade  # noqa: E402
+from src.processor import Processor  # noqa: E402
+from src.state import State  # noqa: E402
+
+
+def labs_for(results):
+    series = sorted(results)
+    middle = len(series) // 2
+    median = series[middle] if len(series) % 2 else (series[middle - 1] + series[middle]) / 2
+    return {"count": len(series), "median": median, "results": series}
+
+
+class CountingDetector:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def predict(self, lab_entry):
+        self.calls += 1
+        return self.value
+
+
+class MockHttp:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, payload):
+        self.sent.append(payload)
+
+
+def test_ratio_uses_previous_minimum():
+    # Latest 150 against the earlier low of 100
+    assert RuleCascade.ratio(150.0, labs_for([100.0, 120.0, 150.0])) == pytest.approx(1.5)
+    # A new low is compared with the previous one, not itself
+    assert RuleCascade.ratio(80.0, labs_for([80.0, 100.0, 120.0])) == pytest.approx(0.8)
+    assert RuleCascade.ratio(100.0, labs_for([100.0])) is None
+
+
+@pytest.mark.parametrize("latest, decision, branch", [
+    (90.0, False, "rule_negative"),
+    (130.0, None, "model"),
+    (200.0, True, "rule_positive"),
+])
+def test_decide_branches(latest, decision, branch):
+    cascade = RuleCascade(low=1.0, high=1.5)
+    assert cascade.decide(latest, labs_for([100.0, 110.0, latest])) is decision
+    assert cascade.counts[branch] == 1
+
+
+def test_invalid_band():
+    with pytest.raises(ValueError):
+        RuleCascade(low=2.0, high=1.5)
+
+
+def test_processor_uses_model_only_in_uncertain_band(tmp_path):
+    state = State(db_path=str(tmp_path / "test_cascade.db"))
+    http = MockHttp()
+    detector = CountingDetector(False)
+    cascade = RuleCascade(low=1.0, high=1.5)
+    processor = Processor(state, detector, http, cascade=cascade)
+
+    processor._handle_message({"type": "ADT^A01", "mrn": "1", "sex": "M"})
+    for value, time in [(100.0, "T1"), (90.0, "T2"), (120.0, "T3"), (200.0, "T4"), (300.0, "T5")]:
+        processor._handle_message({
+            "type": "ORU^R01", "mrn": "1", "is_creatinine": True, "result": value, "time": time,
+        })
+
+    # T1 has no baseline and T3 is in the band: only those reach the model.
+    # T4 pages on the rule, so T5 is skipped without scoring
+    assert detector.calls == 2
+    assert http.sent == ["1,T4"]
+    assert cascade.counts == {
+        "already_paged": 1, "no_baseline": 1, "rule_negative": 1, "rule_positive": 1, "model": 1,
+    }
@@ -0,0 +1,104 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import metrics  # noqa: E402
+from src.dedup import BloomFilter, DedupIndex  # noqa: E402
+from src.state import State  # noqa: E402
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(10_000, error_rate=0.01)
+    for i in range(10_000):
+        bloom.add(f"seen-{i}")
+
+    assert all(f"seen-{i}" in bloom for i in range(10_000))
+    false_positives = sum(f"new-{i}" in bloom for i in range(10_000))
+    assert false_positives < 300  # ~1% expected
+
+
+def test_new_ids_never_reach_the_store():
+    store = {"a", "b"}
+    lookups = []
+
+    def lookup(message_id):
+        lookups.append(message_id)
+        return message_id in store
+
+    index = DedupIndex(lambda: store, lookup)
+    new = metrics.DEDUP_LOOKUPS.value(result="new")
+    false_positives = metrics.DEDUP_LOOKUPS.value(result="false_positive")
+
+    assert "a" in index
+    assert all(f"new-{i}" not in index for i in range(1000))
+    # Only the real hit (plus the odd false positive) went to the store
+    assert lookups.count("a") == 1
+    assert len(lookups) < 10
+    assert index.stats()["false_positives"] == len(lookups) - 1
+    # Exported for the false-positive rate
+    assert metrics.DEDUP_LOOKUPS.value(result="false_positive") - false_positives == len(lookups) - 1
+    assert metrics.DEDUP_LOOKUPS.value(result="new") - new == 1000 - (len(lookups) - 1)
+
+
+def test_filter_grows_past_its_capacity():
+    ids = []
+    index = DedupIndex(lambda: ids, lambda m: m in ids)
+    index.rebuild(capacity=10)
+
+    for i in range(50):
+        ids.append(f"id-{i}")
+        index.add(f"id-{i}")
+
+    assert index.bloom.capacity >= 50
+    assert all(f"id-{i}" in index for i in range(50))
+
+
+def test_max_rows_compaction_keeps_newest_ids(tmp_path):
+    db_file = str(tmp_path / "test_compact.db")
+    state = State(db_path=db_file)
+    with state._get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO processed_messages (message_id, processed_at) VALUES (?, ?)",
+            [(f"M{i}", 1000 + i) for i in range(10)],
+        )
+
+    compacted = State(db_path=db_file, dedup_max_rows=4)
+
+    assert compacted.dedup_stats()["table_rows"] == 4
+    assert metrics.DEDUP_TABLE_ROWS.value() == 4
+    assert compacted.is_processed("M9") is True
+    assert compacted.is_processed("M0") is False
+
+
+def test_retention_drops_old_ids(tmp_path):
+    db_file = str(tmp_path / "test_retention.db")
+    state = State(db_path=db_file)
+    state.mark_processed("RECENT")
+    with state._get_connection() as conn:
+        conn.execute("INSERT INTO processed_messages (message_id, processed_at) VALUES ('OLD', 0)")
+
+    restarted = State(db_path=db_file, dedup_retention_days=30)
+
+    assert restarted.is_processed("RECENT") is True
+    assert restarted.is_processed("OLD") is False
+
+
+def test_ids_marked_in_an_open_unit_are_seen_and_rolled_back(tmp_path):
+    state = State(db_path=str(tmp_path / "test_pending.db"))
+    try:
+        with state.transaction():
+            state.mark_processed("KEPT")
+            try:
+                with state.transaction():
+                    state.mark_processed("UNDONE")
+                    assert state.is_processed("UNDONE") is True
+                    raise ValueError("rolled back")
+            except ValueError:
+                pass
+            assert state.is_processed("KEPT") is True
+            assert state.is_processed("UNDONE") is False
+            raise KeyError("outer")
+    except KeyError:
+        pass
+
+    assert state.is_processed("KEPT") is False
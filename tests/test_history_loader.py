@@ -0,0 +1,159 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.history_loader import load_history  # noqa: E402
+from src.state import State  # noqa: E402
+
+HISTORY = (
+    "mrn,creatinine_date_0,creatinine_result_0,creatinine_date_1,creatinine_result_1,"
+    "creatinine_date_2,creatinine_result_2\n"
+    "100,2024-01-01 10:00:00,80.5,2024-01-02 10:00:00,95.0,2024-01-03 10:00:00,120.25\n"
+    "200,2024-02-01 09:30:00,60.0,,,,\n"
+    "300,2024-03-01 08:00:00,150.0,2024-03-05 08:00:00,75.0,,\n"
+)
+
+
+@pytest.fixture
+def history_file(tmp_path):
+    path = tmp_path / "history.csv"
+    path.write_text(HISTORY)
+    return str(path)
+
+
+def test_history_is_melted_into_lab_history(tmp_path, history_file):
+    state = State(db_path=str(tmp_path / "test_history.db"))
+
+    # chunk_rows=2 forces the patients to be split over several chunks
+    assert load_history(state, history_file, chunk_rows=2) == 6
+
+    state.admit("100", "F")
+    history = state.get_lab_history("100")
+    assert history["count"] == 3
+    assert history["min"] == 80.5
+    assert history["max"] == 120.25
+    assert history["median"] == 95.0
+    assert history["std"] == pytest.approx(np.std([80.5, 95.0, 120.25]))
+
+    state.admit("200", "M")
+    assert list(state.get_lab_history("200")["results"]) == [60.0]
+
+
+def test_history_import_is_idempotent(tmp_path, history_file):
+    db_file = str(tmp_path / "test_history_restart.db")
+    load_history(State(db_path=db_file), history_file)
+
+    # Restarted pod sees the same file again
+    restarted = State(db_path=db_file)
+    assert load_history(restarted, history_file) == 0
+
+    restarted.admit("300", "M")
+    assert restarted.get_lab_history("300")["count"] == 2
+
+
+def test_live_results_extend_history(tmp_path, history_file):
+    state = State(db_path=str(tmp_path / "test_history_live.db"))
+    load_history(state, history_file)
+
+    state.admit("300", "M")
+    state.add_creatinine("300", 300.0)
+
+    history = state.get_lab_history("300")
+    assert history["count"] == 3
+    assert history["max"] == 300.0
+    assert history["median"] == 150.0
+
+
+def test_restart_maps_snapshot_without_parsing_csv(tmp_path, history_file, monkeypatch):
+    db_file = str(tmp_path / "test_history_snapshot.db")
+    load_history(State(db_path=db_file), history_file)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("CSV parsed again on restart")
+
+    monkeypatch.setattr("src.history_loader.read_history", fail)
+
+    restarted = State(db_path=db_file)
+    assert load_history(restarted, history_file) == 0
+
+    # History is served from the snapshot, not copied into lab_results
+    with restarted._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM lab_results").fetchone()[0] == 0
+
+    restarted.admit("100", "M")
+    assert list(restarted.get_lab_history("100")["results"]) == [80.5, 95.0, 120.25]
+
+
+def test_snapshot_lookup_uses_sorted_mrns(tmp_path, history_file):
+    from src.history_loader import read_history
+    from src.history_snapshot import HistorySnapshot
+
+    snapshot_dir = str(tmp_path / "snapshot")
+    HistorySnapshot.build(read_history(history_file, chunk_rows=1), snapshot_dir)
+    snapshot = HistorySnapshot.open(snapshot_dir)
+
+    assert isinstance(snapshot.values, np.memmap)
+    values, timestamps = snapshot.lookup("300")
+    assert values.tolist() == [150.0, 75.0]
+    assert timestamps[1] - timestamps[0] == 4 * 24 * 3600
+    assert snapshot.lookup("999") is None
+    assert snapshot.lookup("not-an-mrn") is None
+
+
+def test_changed_history_file_replaces_the_old_aggregates(tmp_path, history_file):
+    db_file = str(tmp_path / "test_history_changed.db")
+    state = State(db_path=db_file)
+    load_history(state, history_file)
+    state.admit("200", "F")
+    state.add_creatinine("200", 70.0)
+    state.close()
+
+    # One value corrected in a new copy of the file
+    with open(history_file, "w") as f:
+        f.write(HISTORY.replace("80.5", "82.5"))
+    restarted = State(db_path=db_file)
+    assert load_history(restarted, history_file) == 6
+
+    restarted.admit("100", "F")
+    history = restarted.get_lab_history("100")
+    assert history["count"] == 3
+    assert list(history["results"]) == [82.5, 95.0, 120.25]
+    # Live results are kept
+    assert list(restarted.get_lab_history("200")["results"]) == [60.0, 70.0]
+    assert len(list(tmp_path.glob("history-*"))) == 1
+
+
+def test_leading_zero_mrns_keep_their_own_history(tmp_path):
+    path = tmp_path / "history.csv"
+    path.write_text(
+        "mrn,creatinine_date_0,creatinine_result_0,creatinine_date_1,creatinine_result_1\n"
+        "007,2024-01-01 10:00:00,50.0,2024-01-02 10:00:00,60.0\n"
+        "7,2024-01-01 10:00:00,90.0,,\n"
+    )
+    state = State(db_path=str(tmp_path / "test_history_zeros.db"))
+    load_history(state, str(path))
+
+    state.admit("007", "F")
+    state.add_creatinine("007", 200.0)
+    history = state.get_lab_history("007")
+    assert list(history["results"]) == [50.0, 60.0, 200.0]
+    assert (history["count"], history["min"], history["max"]) == (3, 50.0, 200.0)
+
+    state.admit("7", "M")
+    assert state.get_lab_history("7")["count"] == 1
+
+
+def test_older_snapshot_format_is_reimported(tmp_path, history_file):
+    db_file = str(tmp_path / "test_history_format.db")
+    state = State(db_path=db_file)
+    load_history(state, history_file)
+    with state.transaction() as conn:
+        conn.execute("UPDATE history_imports SET storage = 'snapshot'")
+    state.close()
+
+    restarted = State(db_path=db_file)
+    assert load_history(restarted, history_file) == 6
+    assert load_history(restarted, history_file) == 0
@@ -0,0 +1,78 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.hl7_scan import extract_fields  # noqa: E402
+from src.processor import Processor  # noqa: E402
+
+class EmptyState:
+    def is_processed(self, message_id):
+        return False
+
+
+# Messages the fast path must handle itself
+HOT_MESSAGES = [
+    # Simulator layout: empty MSH-10, NK1 segment
+    "MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401201630||ADT^A01|||2.5\r"
+    "PID|1||478237423||ELIZABETH HOLMES||19840203|F\r"
+    "NK1|1|SUNNY BALWANI|PARTNER\r",
+    "MSH|^~\\&|SIM|HOSP|||202402011200||ADT^A01|MSG001|2.5\r"
+    "PID|1||81299001||NAME||19910517|M\r",
+    # No DOB / no sex
+    "MSH|^~\\&|SIM|HOSP|||202402011200||ADT^A01|MSG006|2.5\r"
+    "PID|1||81299001||NAME|||M\r",
+    "MSH|^~\\&|SIM|HOSP|||202402011200||ADT^A01|MSG007|2.5\r"
+    "PID|1||81299001||NAME||19910517\r",
+    "MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401221000||ADT^A03|||2.5\r"
+    "PID|1||478237423\r",
+    "MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401201800||ORU^R01|||2.5\r"
+    "PID|1||478237423\r"
+    "OBR|1||||||202401202243\r"
+    "OBX|1|SN|CREATININE||103.4\r",
+    # Repeated result, components in the MRN
+    "MSH|^~\\&|SIM|HOSP|||202401201800||ORU^R01|MSG008|2.5\r"
+    "PID|1||4567^^^HOSP^MR\r"
+    "OBR|1||||||20240201201530\r"
+    "OBX|1|SN|CREATININE||88.9~91.2\r",
+    "MSH|^~\\&|SIM|HOSP|||202401201800||ORU^R01|MSG004|2.5\r"
+    "PID|1||4567\r"
+    "OBR|1||||||20240201201530\r"
+    "OBX|1|SN|POTASSIUM||4.1\r",
+    # Leading/trailing whitespace around the frame
+    "  MSH|^~\\&|SIM|HOSP|||202402011300||ADT^A03|MSG002|2.5\rPID|1||77788\r\r",
+]
+
+# Messages the fast path must leave to hl7.parse
+FALLBACK_MESSAGES = [
+    "MSH|BAD|DATA",
+    "MSH|^~\\&|SIM|HOSP|||202402011200||ADT^A08|MSG009|2.5\rPID|1||1\r",
+    "MSH|^~\\&|SIM|HOSP|||202402011200||ADT^A01|MSG010|2.5\rPID|1||1||N||1991-05-17|M\r",
+    "MSH|^~\\&|SIM|HOSP|||202401201800||ORU^R01|MSG011|2.5\rPID|1||4567\rOBX|1|SN|CREATININE||88.9\r",
+    "MSH|^~\\&|SIM|HOSP|||202401201800||ORU^R01|MSG012|2.5\rPID|1||4567\r"
+    "OBR|1||||||20240201201530\rOBX|1|SN|CREATININE||88.9^mg\r",
+    "MSH|^~\\&|SIM|HOSP|||202401201800||ORU^R01|MSG013|2.5\rPID|1||4567\r"
+    "OBR|1||||||20240201201530\rOBX|1|SN|CREATININE||\\H\\88.9\r",
+    "MSH|^~\\&|SIM|HOSP|||202402011300||ADT^A03|MSG014|2.5\nPID|1||77788\n",
+]
+
+
+@pytest.mark.parametrize("msg", HOT_MESSAGES)
+def test_fast_path_matches_hl7_parse(msg):
+    expected = Processor(None, None, None)._parse_message(msg)
+
+    assert expected
+    assert extract_fields(msg) == expected
+    assert extract_fields(msg.encode("ascii")) == expected
+    assert extract_fields(memoryview(msg.encode("ascii"))) == expected
+
+
+@pytest.mark.parametrize("msg", FALLBACK_MESSAGES)
+def test_unusual_messages_fall_back(msg):
+    assert extract_fields(msg) is None
+
+
+@pytest.mark.parametrize("msg", HOT_MESSAGES + FALLBACK_MESSAGES)
+def test_processor_parse_is_unchanged(msg):
+    processor = Processor(EmptyState(), None, None)
+    assert processor.parse(msg) == processor._parse_message(msg)
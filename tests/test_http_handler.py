@@ -0,0 +1,153 @@
+import sys
+import os
+import threading
+import time
+import http.server
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.http_handler import CircuitBreaker, HttpHandler, PagerUnavailable  # noqa: E402
+
+
+class Pager(http.server.ThreadingHTTPServer):
+    """Local pager answering with scripted statuses (200 once exhausted)."""
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.pages = []
+        self.client_ports = set()
+        super().__init__(("127.0.0.1", 0), PagerRequestHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/page"
+
+
+class PagerRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        self.server.client_ports.add(self.client_address[1])
+        time.sleep(self.server.delay)
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        if status == 200:
+            self.server.pages.append(body)
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def pager():
+    servers = []
+
+    def start(*args, **kwargs):
+        servers.append(Pager(*args, **kwargs))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def handler(pager, **kwargs):
+    kwargs.setdefault("workers", 1)
+    kwargs.setdefault("timeout", 1.0)
+    kwargs.setdefault("retries", 3)
+    kwargs.setdefault("backoff", 0.001)
+    return HttpHandler(url=pager.url, **kwargs)
+
+
+def test_pages_reuse_one_keep_alive_connection(pager):
+    server = pager()
+    http = handler(server)
+
+    for mrn in range(5):
+        http.send(f"{mrn},20240101000000")
+    http.join()
+
+    assert server.pages == [f"{mrn},20240101000000" for mrn in range(5)]
+    assert len(server.client_ports) == 1
+    assert http.stats()["sent"] == 5
+    assert http.stats()["latency_p50_ms"] is not None
+
+
+def test_retries_server_errors_but_not_rejections(pager):
+    server = pager(statuses=[503, 500, 200, 400])
+    http = handler(server)
+
+    assert http.deliver("1,20240101000000") is True
+    assert http.deliver("bad") is False
+    assert http.stats()["retried"] == 2
+    assert http.stats()["rejected"] == 1
+
+
+def test_deliver_gives_up_after_retries(pager):
+    server = pager(statuses=[500] * 10)
+    http = handler(server, retries=2, breaker=CircuitBreaker(threshold=100))
+
+    with pytest.raises(PagerUnavailable):
+        http.deliver("1,20240101000000")
+    assert server.statuses == [500] * 7
+
+
+def test_workers_start_on_first_send(pager):
+    def workers():
+        return sum(thread.name == "pager-worker" for thread in threading.enumerate())
+
+    before = workers()
+    http = handler(pager(), workers=2)
+    http.deliver("1,20240101000000")
+    assert workers() == before
+
+    http.send("2,20240101000000")
+    http.join()
+    assert workers() == before + 2
+
+
+def test_send_returns_while_pager_is_slow(pager):
+    server = pager(delay=0.5)
+    http = handler(server)
+
+    started = time.perf_counter()
+    http.send("1,20240101000000")
+    http.send("2,20240101000000")
+    assert time.perf_counter() - started < 0.1
+    assert http.stats()["queue_depth"] >= 1
+
+    http.join()
+    assert server.pages == ["1,20240101000000", "2,20240101000000"]
+
+
+def test_breaker_opens_then_recovers():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.1)
+
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    started = time.perf_counter()
+    breaker.wait()
+    assert time.perf_counter() - started >= 0.05
+    assert breaker.state == "half-open"
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker(threshold=5, cooldown=0.05)
+    for _ in range(5):
+        breaker.record_failure()
+    breaker.wait()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
@@ -2,6 +2,7 @@
 
 import sys
 import os
+import pytest
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from src.main import InferenceService  # noqa: E402
@@ -11,6 +12,26 @@ class FakeState:
     pass
 
 
+@pytest.fixture(autouse=True)
+def no_history(monkeypatch):
+    monkeypatch.setattr("src.main.find_history_file", lambda: None)
+
+
+@pytest.fixture(autouse=True)
+def no_metrics_server(monkeypatch):
+    monkeypatch.setenv("METRICS_PORT", "0")
+
+
+@pytest.fixture(autouse=True)
+def no_prefetch(monkeypatch):
+    monkeypatch.setenv("PREFETCH", "0")
+
+
+@pytest.fixture(autouse=True)
+def fake_outbox(monkeypatch):
+    monkeypatch.setattr("src.main.PagerOutbox", FakeOutbox)
+
+
 class FakeDetector:
     pass
 
@@ -19,6 +40,15 @@ class FakeHttp:
     pass
 
 
+class FakeOutbox:
+    def __init__(self, state, http):
+        self.state = state
+        self.http = http
+
+    def depth(self):
+        return 0
+
+
 class FakeProcessor:
     def __init__(self, state, detector, http):
         self.state = state
@@ -27,8 +57,9 @@ class FakeProcessor:
 
 
 class FakeMMLPClient:
-    def __init__(self, processor):
+    def __init__(self, processor, pipeline=None):
         self.processor = processor
+        self.pipeline = pipeline
         self.started = False
 
     def start(self):
@@ -51,12 +82,44 @@ def test_inference_service_wires_dependencies(monkeypatch):
     assert isinstance(service.processor, FakeProcessor)
     assert service.processor.state is service.state
     assert service.processor.detector is service.aki_detector
-    assert service.processor.http is service.http_handler
+    assert isinstance(service.pager, FakeOutbox)
+    assert service.pager.state is service.state
+    assert service.pager.http is service.http_handler
+    assert service.processor.http is service.pager
 
     assert isinstance(service.mmlp_client, FakeMMLPClient)
     assert service.mmlp_client.processor is service.processor
 
 
+def test_outbox_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("PAGER_OUTBOX", "0")
+    monkeypatch.setattr("src.main.State", FakeState)
+    monkeypatch.setattr("src.main.AKIDetector", FakeDetector)
+    monkeypatch.setattr("src.main.HttpHandler", FakeHttp)
+    monkeypatch.setattr("src.main.Processor", FakeProcessor)
+    monkeypatch.setattr("src.main.MMLPClient", FakeMMLPClient)
+
+    service = InferenceService()
+
+    assert service.processor.http is service.http_handler
+
+
+def test_not_ready_before_the_first_mllp_connection(monkeypatch):
+    from src.server_state import set_server_running
+
+    monkeypatch.setattr("src.server_state._server_running", False)
+    monkeypatch.setattr("src.main.State", FakeState)
+    monkeypatch.setattr("src.main.AKIDetector", FakeDetector)
+    monkeypatch.setattr("src.main.HttpHandler", FakeHttp)
+    monkeypatch.setattr("src.main.Processor", FakeProcessor)
+    monkeypatch.setattr("src.main.MMLPClient", FakeMMLPClient)
+    service = InferenceService()
+
+    assert service.readiness() == (False, {"mllp_connected": False, "queues": {"pager": 0}})
+    set_server_running(True)
+    assert service.readiness()[0] is True
+
+
 def test_start_inference_service_starts_mllp_client(monkeypatch):
     monkeypatch.setattr("src.main.State", FakeState)
     monkeypatch.setattr("src.main.AKIDetector", FakeDetector)
@@ -0,0 +1,117 @@
+import sys
+import os
+import urllib.error
+import urllib.request
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import metrics  # noqa: E402
+from src.metrics import Counter, Gauge, Histogram, Registry, start_metrics_server  # noqa: E402
+from src.processor import Processor  # noqa: E402
+from src.state import State  # noqa: E402
+
+
+def test_text_format():
+    registry = Registry()
+    received = Counter("test_received_total", "Messages", ["type"], registry=registry)
+    depth = Gauge("test_depth", "Queue depth", ["queue"], registry=registry)
+    latency = Histogram("test_seconds", "Latency", buckets=(0.1, 1.0), registry=registry)
+
+    received.inc(type="ADT^A01")
+    received.inc(2, type="ORU^R01")
+    depth.set_function(lambda: 7, queue="pager")
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5.0)
+
+    text = registry.render()
+    assert "# TYPE test_received_total counter" in text
+    assert 'test_received_total{type="ORU^R01"} 2' in text
+    assert 'test_depth{queue="pager"} 7' in text
+    assert 'test_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_seconds_bucket{le="1.0"} 2' in text
+    assert 'test_seconds_bucket{le="+Inf"} 3' in text
+    assert "test_seconds_count 3" in text
+    assert "test_seconds_sum 5.55" in text
+
+
+def test_snapshots_from_other_processes_are_merged():
+    worker, parent = Registry(), Registry()
+    sent = Counter("test_sent_total", "x", ["type"], registry=worker)
+    latency = Histogram("test_lag_seconds", "x", buckets=(1.0,), registry=worker)
+    rows = Gauge("test_rows", "x", registry=worker)
+    Counter("test_sent_total", "x", ["type"], registry=parent).inc(type="A")
+    Histogram("test_lag_seconds", "x", buckets=(1.0,), registry=parent)
+    Gauge("test_rows", "x", registry=parent).set(5)
+
+    sent.inc(2, type="A")
+    latency.observe(0.5)
+    rows.set(7)
+    parent.merge("shard-0", worker.snapshot())
+    # A newer snapshot replaces the previous one from the same source
+    sent.inc(type="B")
+    parent.merge("shard-0", worker.snapshot())
+
+    text = parent.render()
+    assert 'test_sent_total{type="A"} 3' in text
+    assert 'test_sent_total{type="B"} 1' in text
+    assert 'test_lag_seconds_bucket{le="1.0"} 1' in text
+    assert "test_rows 12" in text
+
+    # A restarted worker starts from zero; the totals keep what it sent,
+    # gauges only what is current
+    parent.retire("shard-0")
+    parent.merge("shard-0", Registry().snapshot())
+    text = parent.render()
+    assert 'test_sent_total{type="A"} 3' in text
+    assert "test_rows 5" in text
+
+
+def test_labels_must_match():
+    counter = Counter("test_labelled_total", "x", ["type"], registry=Registry())
+    with pytest.raises(ValueError):
+        counter.inc(kind="oops")
+
+
+def fetch(server, path):
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+
+
+def test_endpoints():
+    ready = {"value": True}
+    server = start_metrics_server(0, lambda: (ready["value"], {"queues": {}}), host="127.0.0.1")
+    try:
+        status, body = fetch(server, "/metrics")
+        assert status == 200
+        assert "# TYPE aki_stage_seconds histogram" in body
+
+        assert fetch(server, "/healthz")[0] == 200
+        assert fetch(server, "/readyz")[0] == 200
+        ready["value"] = False
+        assert fetch(server, "/readyz")[0] == 503
+        assert fetch(server, "/nope")[0] == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_processor_counts_received_and_deduped(tmp_path):
+    state = State(db_path=str(tmp_path / "test_metrics.db"))
+    processor = Processor(state, None, None)
+    message = b"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||20240102135300||ADT^A03|metrics-1|P|2.5\rPID|1||497030"
+
+    received = metrics.MESSAGES_RECEIVED.value(type="ADT^A03")
+    deduped = metrics.MESSAGES_DEDUPED.value(type="ADT^A03")
+    parses = metrics.STAGE_SECONDS.count(stage="parse")
+
+    processor.process(message)
+    processor.process(message)
+
+    assert metrics.MESSAGES_RECEIVED.value(type="ADT^A03") == received + 1
+    assert metrics.MESSAGES_DEDUPED.value(type="ADT^A03") == deduped + 1
+    assert metrics.STAGE_SECONDS.count(stage="parse") == parses + 1
@@ -0,0 +1,68 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.mllp_framer import MLLPFramer  # noqa: E402
+
+
+class ChunkSocket:
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv_into(self, buffer):
+        if not self.chunks:
+            return 0
+        chunk = self.chunks.pop(0)
+        if len(chunk) > len(buffer):
+            self.chunks.insert(0, chunk[len(buffer):])
+            chunk = chunk[:len(buffer)]
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def frame(msg: bytes) -> bytes:
+    return b"\x0b" + msg + b"\x1c\x0d"
+
+
+def drain(framer, sock):
+    out = []
+    while framer.recv_into(sock):
+        out.extend(bytes(p) for p in framer.frames())
+    return out
+
+
+def test_frames_split_at_every_byte():
+    messages = [b"MSH|A\rPID|1||1\r", b"MSH|B\rPID|1||2\r", b"MSH|C\r"]
+    stream = b"".join(frame(m) for m in messages)
+
+    # One byte per recv, including splits between <FS> and <CR>
+    framer = MLLPFramer(recv_size=16)
+    assert drain(framer, ChunkSocket([stream[i:i + 1] for i in range(len(stream))])) == messages
+    assert framer.pending() == 0
+
+
+def test_frames_larger_than_buffer_grow_it():
+    big = b"OBX|" + b"9" * 5000 + b"\r"
+    framer = MLLPFramer(recv_size=64)
+
+    stream = frame(b"MSH|1\r") + frame(big) + frame(b"MSH|2\r")
+    assert drain(framer, ChunkSocket([stream])) == [b"MSH|1\r", big, b"MSH|2\r"]
+
+
+def test_feed_and_garbage_between_frames():
+    framer = MLLPFramer(recv_size=32)
+    framer.feed(b"junk" + frame(b"MSH|1\r") + b"\x1c\x0d")
+    framer.feed(frame(b"MSH|2\r")[:4])
+    assert [bytes(p) for p in framer.frames()] == [b"MSH|1\r"]
+
+    framer.feed(frame(b"MSH|2\r")[4:])
+    assert [bytes(p) for p in framer.frames()] == [b"MSH|2\r"]
+
+
+def test_reset_drops_partial_frame():
+    framer = MLLPFramer(recv_size=32)
+    framer.feed(b"\x0bMSH|partial")
+    framer.reset()
+    framer.feed(frame(b"MSH|new\r"))
+
+    assert [bytes(p) for p in framer.frames()] == [b"MSH|new\r"]
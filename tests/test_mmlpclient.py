@@ -3,6 +3,7 @@ import os
 import pytest
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import metrics  # noqa: E402
 from src.mllp_client import MMLPClient  # noqa: E402
 
 
@@ -10,8 +11,12 @@ class FakeProcessor:
     def __init__(self):
         self.seen = []
 
-    def process(self, hl7_message: str):
-        self.seen.append(hl7_message)
+    def process(self, hl7_message):
+        # Clients hand over raw payload bytes (a view only valid for the call)
+        self.seen.append(bytes(hl7_message).decode("ascii"))
+
+    def wait_durable(self):
+        pass
 
 
 class FakeSocket:
@@ -23,7 +28,15 @@ class FakeSocket:
     def recv(self, size):
         if not self.chunks:
             return b""
-        return self.chunks.pop(0)
+        chunk = self.chunks.pop(0)
+        if len(chunk) > size:
+            self.chunks.insert(0, chunk[size:])
+        return chunk[:size]
+
+    def recv_into(self, buffer):
+        data = self.recv(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
 
     def send(self, data):
         self.sent_data.append(data)
@@ -101,10 +114,39 @@ def test_send_ack_format():
     fake_socket = FakeSocket([])
     client.sock = fake_socket
 
-    client._send_ack()
+    acked = metrics.MESSAGES_ACKED.value(type="ADT^A01")
+    client._send_ack("ADT^A01")
 
     sent = fake_socket.sent_data[0]
+    assert metrics.MESSAGES_ACKED.value(type="ADT^A01") == acked + 1
 
     assert sent.startswith(b"\x0b")
     assert sent.endswith(b"\x1c\x0d")
     assert b"MSA|AA" in sent
+
+
+class FakePipeline:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, hl7_message, on_done=None):
+        self.submitted.append((hl7_message, on_done))
+
+
+def test_pipeline_mode_acks_when_message_is_recorded():
+    pipeline = FakePipeline()
+    client = MMLPClient(FakeProcessor(), pipeline=pipeline)
+
+    hl7_msg = "MSH|QUEUED\rPID|1||9\r"
+    fake_socket = FakeSocket([frame(hl7_msg)])
+    client.sock = fake_socket
+
+    with pytest.raises(Exception):
+        client._listen()
+
+    # Nothing is ACKed until the pipeline reports the message recorded
+    assert [m.decode("ascii") for m, _ in pipeline.submitted] == [hl7_msg]
+    assert fake_socket.sent_data == []
+
+    pipeline.submitted[0][1](None)
+    assert len(fake_socket.sent_data) == 1
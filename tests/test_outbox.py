@@ -0,0 +1,154 @@
+import sys
+import os
+import threading
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.batch_scheduler import BatchScheduler  # noqa: E402
+from src.outbox import PagerOutbox  # noqa: E402
+from src.processor import Processor  # noqa: E402
+from src.state import State  # noqa: E402
+
+
+class RecordingPager:
+    """Stands in for HttpHandler.deliver; can be held or made to fail."""
+
+    def __init__(self):
+        self.delivered = []
+        self.release = threading.Event()
+        self.release.set()
+        self.fail = False
+
+    def deliver(self, payload):
+        self.release.wait()
+        if self.fail:
+            raise ConnectionError("pager down")
+        self.delivered.append(payload)
+        return True
+
+
+class AKIDetector:
+    def predict(self, lab_entry):
+        return True
+
+
+class BatchedAKIDetector:
+    def feature_vector(self, lab_entry):
+        return [lab_entry["mean"]]
+
+    def predict_features(self, X):
+        return [True] * len(X)
+
+
+def lab(mrn, time):
+    return {"type": "ORU^R01", "mrn": mrn, "is_creatinine": True, "result": 200.0, "time": time}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "test_outbox.db")
+
+
+def test_page_commits_with_the_lab_and_is_delivered(db_path):
+    state = State(db_path=db_path)
+    pager = RecordingPager()
+    outbox = PagerOutbox(state, pager, poll_interval=0.01)
+    processor = Processor(state, AKIDetector(), outbox)
+
+    processor._handle_message({"type": "ADT^A01", "mrn": "1", "sex": "F"})
+    with state.transaction():
+        processor._handle_message(lab("1", "T1"))
+        assert state.outbox_depth() == 1
+    outbox.join()
+
+    assert pager.delivered == ["1,T1"]
+    assert outbox.depth() == 0
+    assert state.outbox_stats() == {"delivered": 1, "undelivered": 0}
+
+
+def test_rolled_back_lab_leaves_no_page(db_path):
+    state = State(db_path=db_path)
+    pager = RecordingPager()
+    outbox = PagerOutbox(state, pager, poll_interval=0.01)
+    processor = Processor(state, AKIDetector(), outbox)
+    processor._handle_message({"type": "ADT^A01", "mrn": "1", "sex": "F"})
+
+    with pytest.raises(RuntimeError):
+        with state.transaction():
+            processor._handle_message(lab("1", "T1"))
+            raise RuntimeError("crash before commit")
+    outbox.join()
+
+    assert pager.delivered == []
+    assert not state.has_paged_patient("1")
+
+
+def test_undelivered_pages_are_replayed_on_restart(db_path):
+    state = State(db_path=db_path)
+    pager = RecordingPager()
+    pager.fail = True
+    outbox = PagerOutbox(state, pager, poll_interval=0.01)
+    state.admit("1", "F")
+    state.enqueue_page("1", "1,T1")
+    outbox.close()
+    state.close()
+
+    restarted = State(db_path=db_path)
+    pager = RecordingPager()
+    outbox = PagerOutbox(restarted, pager, poll_interval=0.01)
+    outbox.join()
+
+    assert pager.delivered == ["1,T1"]
+
+
+def test_one_page_per_admission(db_path):
+    state = State(db_path=db_path)
+    pager = RecordingPager()
+    pager.release.clear()
+    outbox = PagerOutbox(state, pager, poll_interval=0.01)
+
+    state.admit("1", "F")
+    outbox.send("1,T1")
+    outbox.send("1,T2")
+    state.admit("1", "F")
+    outbox.send("1,T3")
+    pager.release.set()
+    outbox.join()
+
+    assert pager.delivered == ["1,T1", "1,T3"]
+    assert outbox.stats()["duplicates"] == 1
+
+
+def test_batched_page_commits_with_the_lab(db_path):
+    state = State(db_path=db_path)
+    pager = RecordingPager()
+    outbox = PagerOutbox(state, pager, poll_interval=0.01)
+    scheduler = BatchScheduler(BatchedAKIDetector(), max_wait_ms=1000)
+    processor = Processor(state, None, outbox, scheduler=scheduler)
+    for mrn in ("1", "2"):
+        processor.apply({"msg_id": f"a{mrn}", "type": "ADT^A01", "mrn": mrn, "sex": "F"})
+    processor.apply({"msg_id": "m1", **lab("1", "T1")})
+
+    def crash(message_id):
+        raise RuntimeError("crash before commit")
+
+    state.mark_processed = crash
+    with pytest.raises(RuntimeError):
+        processor.apply({"msg_id": "m2", **lab("2", "T2")})
+    outbox.join()
+
+    # m1's page was written before apply() returned (so before its ACK);
+    # m2's went with the unit of work that failed
+    assert pager.delivered == ["1,T1"]
+    assert state.outbox_stats() == {"delivered": 1, "undelivered": 0}
+
+
+def test_outbox_keys_pages_by_the_given_admission(db_path):
+    state = State(db_path=db_path)
+    state.admit("1", "F")
+    state.discharge("1")
+    state.admit("1", "F")
+
+    assert state.enqueue_page("1", "1,T1", admission=1)
+    assert not state.enqueue_page("1", "1,T2", admission=1)
+    assert state.enqueue_page("1", "1,T3")  # current admission: 2
@@ -0,0 +1,89 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.patient_store import PatientRecord, PatientStore, mrn_key  # noqa: E402
+from src.state import State  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "test_patient_store.db")
+
+
+def test_numeric_mrns_are_int_keys():
+    assert mrn_key("478237423") == 478237423
+    assert mrn_key("0") == 0
+    assert mrn_key("007") == "007"
+    assert mrn_key("A12") == "A12"
+
+
+def test_only_discharged_patients_are_evicted():
+    loads = []
+
+    def load(mrn):
+        loads.append(mrn)
+        return PatientRecord(admitted=mrn.startswith("a"), sex=0)
+
+    store = PatientStore(load, budget_bytes=3 * PatientStore.RECORD_BYTES)
+    for mrn in ("a1", "d1", "a2", "d2", "d3"):
+        store.get(mrn)
+
+    assert len(store) == 3
+    assert store.peek("a1") is not None and store.peek("a2") is not None
+    assert store.peek("d1") is None
+    assert store.stats()["evictions"] == 2
+
+    # Evicted records come back from the loader on the next lookup
+    store.get("d1")
+    assert loads.count("d1") == 2
+
+
+def test_series_count_against_the_budget():
+    store = PatientStore(lambda mrn: PatientRecord(sex=0), budget_bytes=10_000)
+    record = store.get("1")
+    store.set_series(record, [3.0, 1.0, 2.0])
+
+    assert list(record.series) == [1.0, 2.0, 3.0]
+    assert store.bytes == PatientStore.RECORD_BYTES + 3 * 8
+
+
+def test_state_reads_match_after_eviction(db_path):
+    # A budget of zero evicts every discharged patient immediately
+    state = State(db_path=db_path, patient_store_mb=0)
+    state.admit("1", "F")
+    state.add_creatinine("1", 100.0)
+    state.add_creatinine("1", 150.0)
+    state.paged_patient("1")
+    before = state.get_lab_history("1")
+    state.discharge("1")
+    state.has_patient("2")  # loads another record, evicting patient 1
+
+    assert state.patient_store_stats()["evictions"] >= 1
+    after = state.get_lab_history("1")
+    assert after["median"] == before["median"] == 125.0
+    assert after["count"] == 2
+    assert not state.has_patient("1") and state.has_paged_patient("1")
+
+    # Readmission resets the paged flag, in memory and on disk
+    state.admit("1", "F")
+    assert state.has_patient("1") and not state.has_paged_patient("1")
+    assert not State(db_path=db_path).has_paged_patient("1")
+
+
+def test_rolled_back_changes_leave_the_store(db_path):
+    state = State(db_path=db_path)
+    state.admit("1", "M")
+    state.add_creatinine("1", 90.0)
+    state.get_lab_history("1")
+
+    with pytest.raises(RuntimeError):
+        with state.transaction():
+            state.add_creatinine("1", 500.0)
+            state.paged_patient("1")
+            raise RuntimeError("boom")
+
+    history = state.get_lab_history("1")
+    assert history["count"] == 1 and history["max"] == 90.0
+    assert not state.has_paged_patient("1")
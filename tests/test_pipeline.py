@@ -0,0 +1,70 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import metrics  # noqa: E402
+from src.pipeline import Pipeline  # noqa: E402
+from src.processor import Processor  # noqa: E402
+from src.state import State  # noqa: E402
+
+
+class RecordingProcessor:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.applied = []
+
+    def parse(self, hl7_message):
+        return {"msg": hl7_message}
+
+    def apply(self, parsed):
+        if parsed["msg"] == self.fail_on:
+            raise RuntimeError("db error")
+        self.applied.append(parsed["msg"])
+
+    def wait_durable(self):
+        pass
+
+
+def test_messages_complete_in_order():
+    processor = RecordingProcessor()
+    pipeline = Pipeline(processor, queue_size=4)
+    done = []
+
+    for i in range(50):
+        pipeline.submit(f"m{i}", lambda error, i=i: done.append((i, error)))
+    pipeline.join()
+
+    assert processor.applied == [f"m{i}" for i in range(50)]
+    assert done == [(i, None) for i in range(50)]
+
+
+def test_failures_are_reported_not_acked():
+    processor = RecordingProcessor(fail_on="bad")
+    pipeline = Pipeline(processor)
+    done = []
+
+    pipeline.submit("good", done.append)
+    pipeline.submit("bad", done.append)
+    pipeline.join()
+
+    assert done[0] is None
+    assert isinstance(done[1], RuntimeError)
+
+
+def test_in_flight_messages_share_a_group_commit(tmp_path):
+    state = State(db_path=str(tmp_path / "test_group.db"), group_commit_ms=5)
+    pipeline = Pipeline(Processor(state, None, None))
+    acked = []
+
+    def on_done(error, i):
+        # Only ACKed once the commit holding the message is on disk
+        acked.append((i, error, State(db_path=state.db_path).is_processed(f"M{i}")))
+
+    commits = metrics.DB_COMMIT_SECONDS.count()
+    for i in range(100):
+        message = f"MSH|^~\\&|SIM|HOSP|||202401201630||ADT^A01|M{i}|P|2.5\rPID|1||{i + 1}||X||19840203|F\r"
+        pipeline.submit(message.encode(), lambda error, i=i: on_done(error, i))
+    pipeline.join()
+
+    assert acked == [(i, None, True) for i in range(100)]
+    assert metrics.DB_COMMIT_SECONDS.count() - commits < 50
@@ -0,0 +1,116 @@
+import sys
+import os
+import shutil
+import time
+import joblib
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import metrics  # noqa: E402
+from src.aki_detector import AKIDetector  # noqa: E402
+from src.batch_scheduler import BatchScheduler  # noqa: E402
+from src.prediction_cache import CachedDetector, PredictionCache  # noqa: E402
+
+MODEL = os.path.join(os.path.dirname(__file__), "..", "model", "aki_model.pkl")
+
+
+class CountingDetector:
+    """AKI when the first feature exceeds 150; counts scored rows."""
+
+    version = "v1"
+
+    def __init__(self):
+        self.rows = 0
+
+    def feature_vector(self, lab_entry):
+        return [lab_entry["mean"], lab_entry["count"]]
+
+    def predict_features(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        self.rows += len(X)
+        return X[:, 0] > 150
+
+
+def entry(mean, count=3):
+    return {"mean": mean, "count": count}
+
+
+def test_lru_eviction_and_counters():
+    cache = PredictionCache(max_size=2)
+    evictions = metrics.PREDICTION_CACHE.value(event="eviction")
+    cache.put("a", True)
+    cache.put("b", False)
+    assert cache.get("a") is True   # "b" is now least recently used
+    cache.put("c", True)
+
+    assert cache.get("b") is None
+    assert cache.get("c") is True
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+    assert cache.stats()["evictions"] == 1
+    assert metrics.PREDICTION_CACHE.value(event="eviction") == evictions + 1
+
+
+def test_entries_expire_after_ttl():
+    cache = PredictionCache(ttl=0.01)
+    cache.put("a", True)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_repeated_features_skip_the_model():
+    detector = CountingDetector()
+    cached = CachedDetector(detector, PredictionCache())
+
+    assert cached.predict(entry(200.0)) is True
+    assert cached.predict(entry(200.0)) is True
+    assert detector.rows == 1
+    # Another result changes the features (here the count): a new key
+    assert cached.predict(entry(200.0, count=4)) is True
+    assert detector.rows == 2
+
+
+def test_batches_only_score_uncached_rows():
+    detector = CountingDetector()
+    cached = CachedDetector(detector, PredictionCache())
+    cached.predict(entry(100.0))
+
+    assert cached.predict_batch([entry(100.0), entry(300.0), entry(100.0)]) == [False, True, False]
+    assert detector.rows == 2
+
+    scheduler = BatchScheduler(cached, max_batch=8, max_wait_ms=1)
+    assert scheduler.submit(entry(300.0)).result(timeout=5) is True
+    assert detector.rows == 2
+
+
+def test_model_version_is_part_of_the_key():
+    detector = CountingDetector()
+    cached = CachedDetector(detector, PredictionCache())
+    cached.predict(entry(200.0))
+    detector.version = "v2"
+    cached.predict(entry(200.0))
+
+    assert detector.rows == 2
+
+
+def test_reload_changes_version_only_for_a_new_file(tmp_path):
+    path = str(tmp_path / "model.pkl")
+    shutil.copy(MODEL, path)
+    detector = AKIDetector(model_path=path)
+    cached = CachedDetector(detector, PredictionCache())
+    lab = {"sex": 0, "mean": 120.0, "min": 90.0, "max": 150.0, "median": 118.0, "std": 20.0, "count": 4}
+    before = cached.predict(lab)
+    version = detector.version
+
+    assert cached.reload() is False
+    assert len(cached.cache) == 1
+
+    # Same model, different bytes: a new version
+    joblib.dump(joblib.load(path), path, compress=3)
+    assert cached.reload() is True
+    assert detector.version != version
+    assert len(cached.cache) == 0
+    assert cached.predict(lab) == before
@@ -0,0 +1,107 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import metrics  # noqa: E402
+from src.cascade import RuleCascade  # noqa: E402
+from src.prefetch import Prefetcher  # noqa: E402
+from src.processor import Processor  # noqa: E402
+from src.state import State  # noqa: E402
+
+
+class NeverAKI:
+    def predict(self, lab_entry):
+        return False
+
+
+class RecordingHttp:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, payload):
+        self.sent.append(payload)
+
+
+def seeded_state(path):
+    # Patient 1 has history from before this admission
+    state = State(db_path=path)
+    state.bulk_add_creatinine(
+        [("1", 80.0, "2023-01-01 00:00:00"), ("1", 90.0, "2023-02-01 00:00:00")],
+        [("1", 2, 170.0, 80.0 ** 2 + 90.0 ** 2, 80.0, 90.0)],
+    )
+    return state
+
+
+def admission(mrn):
+    return {"msg_id": f"a{mrn}", "type": "ADT^A01", "mrn": mrn, "sex": "F"}
+
+
+def lab(msg_id, mrn, value):
+    return {"msg_id": msg_id, "type": "ORU^R01", "mrn": mrn, "is_creatinine": True, "result": value, "time": "T"}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "test_prefetch.db")
+
+
+def test_prefetch_loads_history_once(db_path):
+    state = seeded_state(db_path)
+    state.admit("1", "F")
+    assert not state.is_warm("1")
+
+    assert state.prefetch("1") is True
+    assert state.is_warm("1")
+    assert state.prefetch("1") is False
+    assert list(state.get_lab_history("1")["results"]) == [80.0, 90.0]
+
+
+def test_admission_warms_the_store_for_the_first_lab(db_path):
+    state = seeded_state(db_path)
+    prefetcher = Prefetcher(state)
+    processor = Processor(state, NeverAKI(), RecordingHttp(), prefetcher=prefetcher)
+    hits = metrics.FIRST_LAB_CACHE.value(result="hit")
+    first = metrics.LAB_SECONDS.count(lab="first")
+    later = metrics.LAB_SECONDS.count(lab="later")
+
+    processor.apply(admission("1"))
+    prefetcher.join()
+    assert state.is_warm("1")
+    assert prefetcher.stats()["loaded"] == 1
+
+    processor.apply(lab("l1", "1", 100.0))
+    processor.apply(lab("l2", "1", 110.0))
+
+    assert metrics.FIRST_LAB_CACHE.value(result="hit") == hits + 1
+    assert metrics.LAB_SECONDS.count(lab="first") == first + 1
+    assert metrics.LAB_SECONDS.count(lab="later") == later + 1
+    assert state.get_lab_history("1")["median"] == 95.0
+
+
+def test_first_lab_without_prefetch_is_a_miss(db_path):
+    state = seeded_state(db_path)
+    processor = Processor(state, NeverAKI(), RecordingHttp())
+    misses = metrics.FIRST_LAB_CACHE.value(result="miss")
+
+    processor.apply(admission("1"))
+    processor.apply(lab("l1", "1", 100.0))
+
+    assert metrics.FIRST_LAB_CACHE.value(result="miss") == misses + 1
+
+
+def test_cascade_first_lab_is_only_a_hit_with_the_timeline(db_path):
+    state = seeded_state(db_path)
+    state.prefetch("1")
+    assert not state.is_warm("1", timeline=True)
+
+    prefetcher = Prefetcher(state, timeline=True)
+    processor = Processor(state, NeverAKI(), RecordingHttp(), cascade=RuleCascade(), prefetcher=prefetcher)
+    hits = metrics.FIRST_LAB_CACHE.value(result="hit")
+
+    processor.apply(admission("1"))
+    prefetcher.join()
+    assert state.is_warm("1", timeline=True)
+
+    processor.apply(lab("l1", "1", 100.0))
+    assert metrics.FIRST_LAB_CACHE.value(result="hit") == hits + 1
@@ -1,10 +1,13 @@
 import sys
 import os
+from contextlib import nullcontext
 from datetime import datetime
 import pytest
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # noqa: E402
 from src.processor import Processor  # noqa: E402
+from src.hl7_scan import peek_message_id  # noqa: E402
+from src.state import State  # noqa: E402
 
 
 class MockHttp:
@@ -66,6 +69,12 @@ class MockState:
     def has_paged_patient(self, mrn):
         return mrn in self.data["paged_patients"]
 
+    def transaction(self):
+        return nullcontext()
+
+    def wait_durable(self):
+        pass
+
 
 @pytest.fixture
 def state():
@@ -197,3 +206,63 @@ def test_malformed_messages_return_empty_dict(state, http):
     result = processor._parse_message(bad_msg)
 
     assert result == {}
+
+
+class FailingDetector:
+    def predict(self, lab_entry):
+        raise RuntimeError("model crashed")
+
+
+def test_message_is_applied_atomically(tmp_path, http):
+    state = State(db_path=str(tmp_path / "test_atomic.db"))
+    state.admit("4567", "M")
+    processor = Processor(state, FailingDetector(), http)
+
+    msg = (
+        "MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401201800||ORU^R01|MSG005|2.5\r"
+        "PID|1||4567\r"
+        "OBR|1||||||20240201201530\r"
+        "OBX|1|SN|CREATININE||88.9\r"
+    )
+
+    with pytest.raises(RuntimeError):
+        processor.process(msg)
+
+    # Neither the lab result nor the dedup record survive the failure
+    assert state.get_lab_history("4567") is None
+    assert state.is_processed("MSG005") is False
+
+
+def test_replayed_frames_are_skipped_before_parsing(tmp_path, http, monkeypatch):
+    state = State(db_path=str(tmp_path / "test_fast_skip.db"))
+    processor = Processor(state, MockDetector(False), http)
+
+    msg = (
+        b"MSH|^~\\&|SIM|HOSP|||202402011200||ADT^A01|||2.5\r"
+        b"PID|1||81299001||NAME||19910517|M\r"
+    )
+    processor.process(memoryview(msg))
+    assert state.has_patient("81299001") is True
+
+    def fail(*args, **kwargs):
+        raise AssertionError("duplicate was parsed")
+
+    monkeypatch.setattr("hl7.parse", fail)
+
+    # Replay after a reconnect, and again after a restart
+    processor.process(msg)
+    Processor(State(db_path=state.db_path), MockDetector(False), http).process(msg)
+
+    assert processor.fast_skipped == 1
+
+
+@pytest.mark.parametrize("msg", [
+    "MSH|^~\\&|SIM|HOSP|||202402011200||ADT^A01|MSG001|2.5\rPID|1||81299001||NAME||19910517|M\r",
+    "MSH|^~\\&|SIM|HOSP|||202402011300||ADT^A03|||2.5\rPID|1||77788\r",
+    "MSH|^~\\&|SIM|HOSP|||202401201800||ORU^R01|A^B|2.5\rPID|1||4567\r"
+    "OBR|1||||||20240201201530\rOBX|1|SN|CREATININE||88.9\r",
+])
+def test_peeked_id_matches_parsed_id(msg):
+    parsed = Processor(None, None, None)._parse_message(msg)
+    assert peek_message_id(msg) == parsed["msg_id"]
+    assert peek_message_id(msg.encode()) == parsed["msg_id"]
@@ -0,0 +1,138 @@
+import sys
+import os
+import time
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.batch_scheduler import BatchScheduler  # noqa: E402
+from src.processor import Processor  # noqa: E402
+from src.replay import FilePager, Replayer  # noqa: E402
+from src.state import State  # noqa: E402
+
+
+class ThresholdDetector:
+    """AKI when the mean creatinine exceeds 150."""
+
+    def feature_vector(self, lab_entry):
+        return [lab_entry["mean"]]
+
+    def predict_features(self, X):
+        return np.asarray(X)[:, 0] > 150
+
+    def predict(self, lab_entry):
+        return lab_entry["mean"] > 150
+
+
+def frame(msg_id, message_type, mrn, *segments):
+    text = "\r".join((
+        f"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401201630||{message_type}|{msg_id}|P|2.5",
+        f"PID|1||{mrn}||JANE DOE||19840203|F",
+        *segments,
+    )) + "\r"
+    return b"\x0b" + text.encode("ascii") + b"\x1c\r"
+
+
+def lab(msg_id, mrn, value, time):
+    return frame(msg_id, "ORU^R01", mrn, f"OBR|1||||||{time}", f"OBX|1|SN|CREATININE||{value}")
+
+
+@pytest.fixture
+def messages(tmp_path):
+    path = tmp_path / "messages.mllp"
+    path.write_bytes(b"".join((
+        frame("m1", "ADT^A01", "100", ""),
+        frame("m2", "ADT^A01", "200", ""),
+        lab("m3", "100", 90.0, "202401201800"),
+        lab("m4", "200", 300.0, "202401201805"),
+        lab("m5", "100", 95.0, "202401201900"),
+        lab("m6", "300", 400.0, "202401201905"),  # not admitted
+        frame("m7", "ADT^A03", "100", ""),
+        b"\x0bMSH|trailing",
+    )))
+    return str(path)
+
+
+def replayer(tmp_path, batch_size=2):
+    state = State(db_path=str(tmp_path / "replay.db"))
+    pager = FilePager(str(tmp_path / "pages.txt"))
+    detector = ThresholdDetector()
+    scheduler = BatchScheduler(detector, max_batch=16, max_wait_ms=1)
+    processor = Processor(state, detector, pager, scheduler=scheduler)
+    return Replayer(processor, batch_size=batch_size), state, pager
+
+
+def test_replay_applies_every_message_and_writes_pages(tmp_path, messages):
+    replay, state, pager = replayer(tmp_path)
+    summary = replay.run(messages)
+    pager.join()
+
+    assert summary["messages"] == 7
+    assert summary["failed"] == 0
+    assert state.get_lab_history("100")["count"] == 2
+    assert not state.has_patient("100")
+    assert state.has_paged_patient("200")
+    assert not state.has_patient("300")
+    assert (tmp_path / "pages.txt").read_text() == "200,202401201805\n"
+    assert all(state.is_processed(f"m{i}") for i in range(1, 8) if i != 6)
+
+
+def test_second_replay_skips_everything(tmp_path, messages):
+    replay, state, pager = replayer(tmp_path)
+    replay.run(messages)
+    summary = replay.run(messages)
+    pager.join()
+
+    # Only the lab for a patient never admitted is looked at again
+    assert summary["skipped"] == summary["messages"] - 1
+    assert state.get_lab_history("200")["count"] == 1
+    assert pager.sent == 1
+
+
+def test_failing_message_is_rolled_back_alone(tmp_path, messages):
+    replay, state, pager = replayer(tmp_path, batch_size=100)
+    handle = replay.processor._handle_message
+
+    def flaky(message):
+        if message["msg_id"] == "m5":
+            state.add_creatinine(message["mrn"], message["result"])
+            raise RuntimeError("boom")
+        return handle(message)
+
+    replay.processor._handle_message = flaky
+    summary = replay.run(messages)
+
+    assert summary["failed"] == 1
+    assert state.get_lab_history("100")["count"] == 1
+    assert not state.is_processed("m5")
+    assert state.is_processed("m7")
+
+
+class SlowDetector(ThresholdDetector):
+    def predict_features(self, X):
+        time.sleep(0.05)
+        return super().predict_features(X)
+
+
+def test_readmission_in_a_batch_pages_like_one_at_a_time(tmp_path):
+    path = tmp_path / "readmission.mllp"
+    path.write_bytes(b"".join((
+        frame("r1", "ADT^A01", "100", ""),
+        lab("r2", "100", 100.0, "202401201800"),
+        lab("r3", "100", 300.0, "202401201900"),  # AKI, first admission
+        frame("r4", "ADT^A03", "100", ""),
+        frame("r5", "ADT^A01", "100", ""),
+        lab("r6", "100", 400.0, "202401211900"),  # AKI, second admission
+    )))
+
+    def replay(name, scheduler=None):
+        state = State(db_path=str(tmp_path / f"{name}.db"))
+        pager = FilePager(str(tmp_path / f"{name}.txt"))
+        Replayer(Processor(state, SlowDetector(), pager, scheduler=scheduler), batch_size=100).run(str(path))
+        pager.close()
+        return (tmp_path / f"{name}.txt").read_text()
+
+    # Both admissions page, as they do when scored inline
+    expected = "100,202401201900\n100,202401211900\n"
+    assert replay("inline") == expected
+    assert replay("batched", BatchScheduler(SlowDetector(), max_wait_ms=1000)) == expected
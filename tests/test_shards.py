@@ -0,0 +1,153 @@
+import sys
+import os
+import threading
+import time
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import metrics  # noqa: E402
+from src.hl7_scan import peek_mrn  # noqa: E402
+from src.shards import ShardRouter, check_layout, serve, shard_db_path, shard_of  # noqa: E402
+from src.state import State  # noqa: E402
+
+
+def frame(msg_id, message_type, mrn, *segments):
+    return "\r".join((
+        f"MSH|^~\\&|SIMULATION|SOUTH RIVERSIDE|||202401201630||{message_type}|{msg_id}|P|2.5",
+        f"PID|1||{mrn}||JANE DOE||19840203|F",
+        *segments,
+    )).encode("ascii") + b"\r"
+
+
+class ShardLog:
+    """Processor stand-in for the workers: logs (shard, frame) per line."""
+
+    def __init__(self, index, delay=0.0):
+        self.index = index
+        self.delay = delay
+
+    def process(self, message):
+        time.sleep(self.delay)
+        if b"FAIL" in message:
+            raise ValueError("bad frame")
+        with open(os.environ["SHARD_LOG"], "a") as f:
+            f.write(f"{self.index} {peek_mrn(message)} {message.split(b'|')[9].decode()}\n")
+
+    def wait_durable(self):
+        pass
+
+
+def logging_shard(index, shards, inbox, results):
+    serve(ShardLog(index), inbox, results, index)
+
+
+def slow_first_shard(index, shards, inbox, results):
+    serve(ShardLog(index, delay=1.0 if index == 0 else 0.0), inbox, results, index)
+
+
+def test_shard_of_is_stable_and_spread():
+    assert shard_of("478237423", 4) == shard_of("478237423", 4)
+    counts = [0] * 4
+    for mrn in range(1000):
+        counts[shard_of(str(mrn), 4)] += 1
+    assert min(counts) > 150
+
+
+def test_peek_mrn():
+    assert peek_mrn(frame("1", "ADT^A01", "12345")) == "12345"
+    assert peek_mrn(b"MSH|^~\\&|X\r") is None
+
+
+def test_layout_is_recorded_and_checked(tmp_path):
+    check_layout(str(tmp_path), 4)
+    check_layout(str(tmp_path), 4)
+    with pytest.raises(RuntimeError):
+        check_layout(str(tmp_path), 2)
+
+    unsharded = tmp_path / "old"
+    unsharded.mkdir()
+    (unsharded / "state.db").write_bytes(b"")
+    with pytest.raises(RuntimeError):
+        check_layout(str(unsharded), 2)
+
+
+def test_router_keeps_each_patient_on_one_shard_in_order(tmp_path, monkeypatch):
+    log = tmp_path / "log.txt"
+    monkeypatch.setenv("SHARD_LOG", str(log))
+    router = ShardRouter(3, logging_shard)
+    errors = []
+    lock = threading.Lock()
+
+    def on_done(error):
+        with lock:
+            errors.append(error)
+
+    try:
+        for i in range(60):
+            router.submit(frame(f"m{i}", "ORU^R01", str(i % 6)), on_done)
+        router.submit(frame("bad", "ORU^R01", "1", "FAIL"), on_done)
+        router.join()
+    finally:
+        router.close()
+
+    assert len(errors) == 61
+    assert sum(error is not None for error in errors) == 1
+
+    seen = {}
+    for line in log.read_text().splitlines():
+        index, mrn, msg_id = line.split()
+        assert int(index) == shard_of(mrn, 3)
+        seen.setdefault(mrn, []).append(int(msg_id[1:]))
+    assert all(ids == sorted(ids) and len(ids) == 10 for ids in seen.values())
+
+
+def test_callbacks_follow_submission_order_across_shards(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARD_LOG", str(tmp_path / "log.txt"))
+    slow = next(str(mrn) for mrn in range(100) if shard_of(str(mrn), 2) == 0)
+    fast = next(str(mrn) for mrn in range(100) if shard_of(str(mrn), 2) == 1)
+    router = ShardRouter(2, slow_first_shard)
+    done = []
+
+    try:
+        router.submit(frame("m0", "ORU^R01", slow, "FAIL"), lambda error: done.append(("m0", error)))
+        router.submit(frame("m1", "ORU^R01", fast), lambda error: done.append(("m1", error)))
+        router.join()
+    finally:
+        router.close()
+
+    # Shard 1 finished m1 first, but its ACK must not overtake m0's NAK
+    assert [msg_id for msg_id, _ in done] == ["m0", "m1"]
+    assert done[0][1] is not None and done[1][1] is None
+
+
+def test_sharded_service_splits_state(tmp_path, monkeypatch):
+    from src.main import run_shard
+
+    monkeypatch.setenv("STATE_DIR", str(tmp_path))
+    monkeypatch.setenv("HISTORY_PATH", str(tmp_path / "missing.csv"))
+    monkeypatch.setenv("PAGER_ADDRESS", "http://127.0.0.1:9/page")
+    monkeypatch.setenv("PREFETCH", "0")
+    monkeypatch.chdir(tmp_path)  # no data/history.csv to fall back to
+    router = ShardRouter(2, run_shard)
+    try:
+        mrns = [str(100 + i) for i in range(8)]
+        for mrn in mrns:
+            router.submit(frame(f"a{mrn}", "ADT^A01", mrn))
+            router.submit(frame(f"l{mrn}", "ORU^R01", mrn, "OBR|1||||||202401202243", "OBX|1|SN|CREATININE||90.0"))
+        router.join()
+
+        # The workers' metrics reach this process's /metrics
+        expected = f'aki_lab_seconds_count{{lab="first"}} {metrics.LAB_SECONDS.count(lab="first") + 8}'
+        deadline = time.monotonic() + 10
+        while expected not in metrics.REGISTRY.render():
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+    finally:
+        router.close()
+
+    for mrn in mrns:
+        index = shard_of(mrn, 2)
+        owner = State(db_path=shard_db_path(str(tmp_path), index))
+        other = State(db_path=shard_db_path(str(tmp_path), 1 - index))
+        assert owner.has_patient(mrn) and owner.get_lab_history(mrn)["count"] == 1
+        assert not other.has_patient(mrn)
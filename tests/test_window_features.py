@@ -0,0 +1,141 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.cascade import RuleCascade  # noqa: E402
+from src.processor import Processor  # noqa: E402
+from src.state import State  # noqa: E402
+from src.window_features import DAY, HOUR, Timeline, db_timestamp, hl7_timestamp  # noqa: E402
+
+T0 = hl7_timestamp("202401200000")
+
+
+class CountingDetector:
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, lab_entry):
+        self.calls += 1
+        return False
+
+
+class MockHttp:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, payload):
+        self.sent.append(payload)
+
+
+def test_hl7_timestamps():
+    assert db_timestamp(hl7_timestamp("202401202243")) == "2024-01-20 22:43:00"
+    assert hl7_timestamp("20240120224359") - hl7_timestamp("202401202243") == 59
+    assert hl7_timestamp("20240120224359.123+0100") == hl7_timestamp("20240120224359")
+    assert hl7_timestamp("T1") is None
+    assert hl7_timestamp("") is None
+
+
+def test_windows():
+    timeline = Timeline([
+        (T0 - 400 * DAY, 10.0),   # outside both windows
+        (T0 - 100 * DAY, 100.0),
+        (T0 - 30 * DAY, 120.0),
+        (T0 - 3 * DAY, 50.0),     # between the windows
+        (T0 - 10 * HOUR, 130.0),
+    ])
+    features = timeline.features(T0, 260.0)
+
+    assert features["min_48h"] == 130.0
+    assert features["median_7_365d"] == 110.0
+    assert features["baseline"] == 110.0
+    assert features["ratio"] == pytest.approx(260.0 / 110.0)
+
+
+def test_no_reference_values():
+    assert Timeline([(T0 - 3 * DAY, 50.0)]).features(T0, 80.0)["ratio"] is None
+
+
+def test_out_of_order_results_land_in_time_order():
+    timeline = Timeline()
+    for offset, value in [(0, 1.0), (2 * HOUR, 3.0), (HOUR, 2.0)]:
+        timeline.add(T0 + offset, value)
+
+    assert list(timeline.values) == [1.0, 2.0, 3.0]
+    # A late result only sees what came before it in clinical time
+    assert timeline.features(T0 + 30 * 60, 4.0)["min_48h"] == 1.0
+
+
+def test_state_stores_clinical_time(tmp_path):
+    state = State(db_path=str(tmp_path / "test_window.db"))
+    state.admit("1", "F")
+    state.add_creatinine("1", 100.0, hl7_timestamp("202401202243"))
+
+    with state._get_connection() as conn:
+        assert conn.execute("SELECT timestamp FROM lab_results").fetchone()[0] == "2024-01-20 22:43:00"
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT timestamp, value FROM lab_results WHERE mrn = ? AND timestamp >= ?",
+            ("1", "2024-01-01"),
+        ).fetchall()
+    assert "idx_lab_results_mrn_ts" in str(plan)
+
+
+def test_state_windows_match_after_reload(tmp_path):
+    state = State(db_path=str(tmp_path / "test_window.db"))
+    state.admit("1", "F")
+    state.add_creatinine("1", 100.0, T0 - 30 * DAY)
+    first = state.window_features("1", T0, 150.0)
+    # Kept up to date in memory...
+    state.add_creatinine("1", 90.0, T0 - HOUR)
+    second = state.window_features("1", T0, 150.0)
+    # ...and the same when rebuilt from the table
+    reloaded = State(db_path=str(tmp_path / "test_window.db")).window_features("1", T0, 150.0)
+
+    assert first["baseline"] == 100.0
+    assert second == reloaded
+    assert second["baseline"] == 90.0
+
+
+def test_cascade_ignores_results_outside_the_windows(tmp_path):
+    state = State(db_path=str(tmp_path / "test_window.db"))
+    detector = CountingDetector()
+    http = MockHttp()
+    processor = Processor(state, detector, http, cascade=RuleCascade(low=1.0, high=1.5))
+
+    processor._handle_message({"type": "ADT^A01", "mrn": "1", "sex": "M"})
+    for value, time in [(60.0, "202201010000"), (100.0, "202401010000"), (160.0, "202401200000")]:
+        processor._handle_message({
+            "type": "ORU^R01", "mrn": "1", "is_creatinine": True, "result": value, "time": time,
+        })
+
+    # 60 is over a year old: 160 is compared with 100 (lifetime: with 60)
+    # and pages on the rule without the model
+    assert http.sent == ["1,202401200000"]
+    assert detector.calls == 2
+
+
+def test_sliding_baseline_matches_a_fresh_sort():
+    timeline = Timeline()
+    reference = Timeline()
+    values = [float(50 + (i * 37) % 91) for i in range(400)]
+    for i, value in enumerate(values):
+        # Mostly in order; some results arrive days late, some inside the
+        # previous baseline window
+        at = T0 + i * DAY - (3 * DAY if i % 5 == 4 else 0) - (20 * DAY if i % 7 == 6 else 0)
+        expected = Timeline(zip(reference.times, reference.values)).features(at, value)
+        assert timeline.features(at, value) == expected
+        timeline.add(at, value)
+        reference.add(at, value)
+
+
+def test_result_added_inside_the_cached_baseline_window():
+    timeline = Timeline([(T0 - d * DAY, float(d)) for d in (400, 40, 30, 20, 10)])
+    assert timeline.features(T0, 100.0)["median_7_365d"] == 25.0
+
+    # Before the window, inside it and after it
+    timeline.add(T0 - 500 * DAY, 1.0)
+    timeline.add(T0 - 15 * DAY, 2.0)
+    timeline.add(T0 - 2 * DAY, 3.0)
+
+    assert timeline.features(T0 + HOUR, 100.0)["median_7_365d"] == 20.0
+    assert timeline.features(T0 + 25 * DAY, 100.0)["median_7_365d"] == 15.0